@@ -0,0 +1,107 @@
+# coding=utf-8
+"""
+Simulation of concurrency limits in front of a synthetic slow backend
+
+The backend serves up to ``CAPACITY`` calls in ``LATENCY`` seconds and
+queues the rest, so its latency grows with the number of concurrent calls
+like an overloaded service. ``CLIENTS`` threads call it through a tolerant
+function for ``DURATION`` seconds; it compares no limit, static bulkheads,
+and adaptive limits by the throughput, the latency of served calls, and the
+number of shed calls.
+
+Usage::
+
+    $ python benchmarks/bench_adaptive.py
+
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import time
+import threading
+from tolerance import tolerate
+from tolerance.bulkheads import Bulkhead
+from tolerance.bulkheads import AdaptiveLimit
+
+
+CAPACITY = 8
+LATENCY = 0.005
+CLIENTS = 64
+DURATION = 2.0
+
+
+class Backend(object):
+    def __init__(self):
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.active += 1
+            active = self.active
+        try:
+            time.sleep(LATENCY * max(1.0, float(active) / CAPACITY))
+        finally:
+            with self._lock:
+                self.active -= 1
+        return True
+
+
+CASES = (
+    ('no limit', lambda: None),
+    ('bulkhead (8)', lambda: Bulkhead(8)),
+    ('bulkhead (32)', lambda: Bulkhead(32)),
+    ('adaptive limit (gradient)',
+        lambda: AdaptiveLimit(initial=4, algorithm='gradient')),
+    ('adaptive limit (aimd)',
+        lambda: AdaptiveLimit(initial=4, algorithm='aimd')),
+)
+
+
+def simulate(limit):
+    fn = tolerate(False, max_concurrency=limit)(Backend())
+    latencies = []
+    shed = [0]
+    stop = time.time() + DURATION
+
+    def client():
+        served = []
+        rejected = 0
+        while time.time() < stop:
+            start = time.time()
+            if fn():
+                served.append(time.time() - start)
+            else:
+                rejected += 1
+                # back off a little as a real client would
+                time.sleep(LATENCY / 10)
+        latencies.extend(served)
+        shed[0] += rejected
+    threads = [threading.Thread(target=client) for i in range(CLIENTS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    return latencies, shed[0]
+
+
+def percentile(values, q):
+    if not values:
+        return float('nan')
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def main():
+    print('%-28s %10s %10s %10s %10s %6s' % (
+        'case', 'served/s', 'shed/s', 'p50', 'p99', 'limit'))
+    for name, factory in CASES:
+        limit = factory()
+        latencies, shed = simulate(limit)
+        print('%-28s %10.0f %10.0f %7.1f ms %7.1f ms %6s' % (
+            name, len(latencies) / DURATION, shed / DURATION,
+            percentile(latencies, 0.5) * 1e3,
+            percentile(latencies, 0.99) * 1e3,
+            getattr(limit, 'limit', getattr(limit, 'max_concurrency', '-'))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# coding=utf-8
+"""
+Benchmark of applying a tolerant function to a large iterable
+
+It compares a list comprehension over a tolerant function with
+``tolerate.map`` and ``tolerate.imap`` which resolve the configuration once
+for the whole batch.
+
+Usage::
+
+    $ python benchmarks/bench_batch.py
+
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import timeit
+from tolerance import tolerate
+
+
+SIZE = 100000
+REPEAT = 5
+# 10% of cells are not integers
+CELLS = [str(i) if i % 10 else 'cell%d' % i for i in range(SIZE)]
+
+prefer_int = tolerate(lambda x: x)(int)
+
+
+def hand_written(cells):
+    results = []
+    for x in cells:
+        try:
+            results.append(int(x))
+        except:
+            results.append(x)
+    return results
+
+
+CASES = (
+    ('hand-written loop', lambda: hand_written(CELLS)),
+    ('list comprehension', lambda: [prefer_int(x) for x in CELLS]),
+    ('tolerate.map', lambda: tolerate.map(prefer_int, CELLS)),
+    ('tolerate.map (mask)',
+        lambda: tolerate.map(prefer_int, CELLS, failures='mask')),
+    ('tolerate.imap', lambda: list(tolerate.imap(prefer_int, CELLS))),
+)
+
+
+def main():
+    print('%-32s %12s' % ('case', 'per item'))
+    for name, fn in CASES:
+        best = min(timeit.repeat(fn, repeat=REPEAT, number=1))
+        print('%-32s %9.1f ns' % (name, best / SIZE * 1e9))
+
+
+if __name__ == '__main__':
+    main()
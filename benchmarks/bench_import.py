@@ -0,0 +1,54 @@
+# coding=utf-8
+"""
+Benchmark of the time required to ``import tolerance``
+
+The import is executed in fresh interpreters with ``-X importtime`` (Python
+3.7 or later) and the cumulative time of ``tolerance`` package is reported.
+
+Usage::
+
+    $ python benchmarks/bench_import.py
+
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import os
+import sys
+import subprocess
+
+
+REPEAT = 10
+STATEMENTS = (
+    'import tolerance',
+    'from tolerance import tolerate',
+    'import tolerance; tolerance.__version__',
+)
+
+
+def import_time(statement):
+    """
+    Return cumulative import time of ``tolerance`` package in microseconds
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(sys.path)
+    process = subprocess.Popen([sys.executable, '-X', 'importtime',
+                                '-c', statement],
+                               stderr=subprocess.PIPE, env=env)
+    stderr = process.communicate()[1].decode('utf-8')
+    total = 0
+    for line in stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        columns = [x.strip() for x in line.split('|')]
+        if len(columns) == 3 and columns[2] == 'tolerance':
+            total += int(columns[1])
+    return total
+
+
+def main():
+    print('%-44s %12s' % ('statement', 'cumulative'))
+    for statement in STATEMENTS:
+        best = min(import_time(statement) for i in range(REPEAT))
+        print('%-44s %9d us' % (statement, best))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# coding=utf-8
+"""
+Benchmark of the memory of tolerant functions
+
+It decorates many functions and reports the memory allocated for each
+wrapper (the decorated functions are created beforehand) by closures of
+``tolerate`` and by slotted objects of ``tolerate.slotted`` with settings
+shared by the functions or made for each function.
+
+Usage::
+
+    $ python benchmarks/bench_memory.py
+
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import gc
+import tracemalloc
+from tolerance import tolerate
+
+
+SIZE = 10000
+
+
+def build_functions():
+    functions = []
+    for i in range(SIZE):
+        def fn(x):
+            return int(x)
+        functions.append(fn)
+    return functions
+
+
+def measure(decorate):
+    """
+    Return bytes allocated for each wrapper and the wrappers
+    """
+    functions = build_functions()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        wrappers = [decorate(fn) for fn in functions]
+        size = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    return float(size) / SIZE, wrappers
+
+
+def shared():
+    settings = tolerate.slotted(-1)
+    return lambda fn: settings(fn)
+
+
+CASES = (
+    ('tolerate() closure', lambda: lambda fn: tolerate(-1)(fn)),
+    ('tolerate.slotted() per function',
+        lambda: lambda fn: tolerate.slotted(-1)(fn)),
+    ('tolerate.slotted() shared', shared),
+)
+
+
+def main():
+    print('%-36s %12s' % ('case', 'per wrapper'))
+    for name, factory in CASES:
+        size, wrappers = measure(factory())
+        # the list of wrappers is included; 8 bytes for each
+        print('%-36s %9.0f B' % (name, size - 8))
+
+
+if __name__ == '__main__':
+    main()
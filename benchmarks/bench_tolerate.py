@@ -0,0 +1,102 @@
+# coding=utf-8
+"""
+Benchmark of the per-call overhead of functions decorated by ``tolerate``
+
+It compares a tolerant function against a bare call, a hand-written
+``try/except``, and a hand-written generic ``*args, **kwargs`` wrapper on both
+of the success and the failure path.
+
+Usage::
+
+    $ python benchmarks/bench_tolerate.py
+
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import timeit
+from tolerance import tolerate
+from tolerance.caches import FailureCache
+from tolerance.breakers import CircuitBreaker
+from tolerance.metrics import Metrics
+from tolerance.limiters import TokenBucket
+from tolerance.utils import signature_switch_generator
+
+
+NUMBER = 200000
+REPEAT = 5
+
+
+def parse(x):
+    return int(x)
+
+
+def hand_written(x):
+    try:
+        return int(x)
+    except:
+        return x
+
+
+def hand_written_wrapper(fn):
+    # the floor of any generic decorator; packing *args and **kwargs
+    def inner(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except:
+            return args[0]
+    return inner
+
+
+def parse_with_switch(x, fail_silently=True):
+    return int(x)
+
+
+def custom_switch(*args, **kwargs):
+    return True, args, kwargs
+
+
+CASES = (
+    ('bare call', parse),
+    ('hand-written try/except', hand_written),
+    ('hand-written wrapper', hand_written_wrapper(parse)),
+    ('tolerate() default switch', tolerate()(parse)),
+    ('tolerate() no switch', tolerate(switch=None)(parse)),
+    ('tolerate() custom switch', tolerate(switch=custom_switch)(parse)),
+    ('tolerate() signature switch',
+        tolerate(switch=signature_switch_generator())(parse_with_switch)),
+    ('tolerate() callable substitute',
+        tolerate(lambda x: x, switch=None)(parse)),
+    ('tolerate() exceptions filter',
+        tolerate(exceptions=(ValueError,), switch=None)(parse)),
+    ('tolerate() subclass match',
+        tolerate(exceptions=(Exception,), match='subclass',
+                 switch=None)(parse)),
+    ('tolerate() failure cache',
+        tolerate(lambda x: x, cache=FailureCache())(parse)),
+    ('tolerate() circuit breaker',
+        tolerate(lambda x: x, breaker=CircuitBreaker(cooldown=3600))(parse)),
+    ('tolerate() metrics',
+        tolerate(lambda x: x, metrics=Metrics())(parse)),
+    ('tolerate() token bucket',
+        tolerate(lambda x: x, rate_limit=TokenBucket(1e12))(parse)),
+)
+
+
+def measure(fn, value):
+    timer = timeit.Timer(lambda: fn(value))
+    best = min(timer.repeat(repeat=REPEAT, number=NUMBER))
+    return best / NUMBER * 1e9
+
+
+def main():
+    print('%-32s %12s %12s' % ('case', 'success', 'failure'))
+    for name, fn in CASES:
+        success = measure(fn, '0')
+        if fn is parse:
+            failure = float('nan')
+        else:
+            failure = measure(fn, 'zero')
+        print('%-32s %9.1f ns %9.1f ns' % (name, success, failure))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+# coding=utf-8
+"""
+Benchmark of tolerant conversion of a NumPy array
+
+It compares ``tolerate.vectorize`` which convert the whole array at once with
+a per-element loop by ``tolerate.map`` on an object array of strings (e.g. a
+column of a CSV file). NumPy is required.
+
+Usage::
+
+    $ python benchmarks/bench_vectorize.py
+
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import timeit
+import numpy as np
+from tolerance import tolerate
+
+
+SIZE = 1000000
+REPEAT = 3
+
+prefer_int = tolerate(lambda x: x)(int)
+prefer_int_array = tolerate(lambda x: x)(lambda x: x.astype(int))
+
+
+def make_cells(ratio):
+    cells = np.arange(SIZE).astype(str).astype(object)
+    if ratio:
+        cells[::int(1 / ratio)] = 'x'
+    return cells
+
+
+def main():
+    print('%-16s %16s %20s %20s' % ('failure ratio', 'tolerate.map',
+                                    'tolerate.vectorize', '(elementwise)'))
+    for ratio in (0, 0.00001, 0.0001, 0.001, 0.01):
+        cells = make_cells(ratio)
+        items = cells.tolist()
+        loop = min(timeit.repeat(lambda: tolerate.map(prefer_int, items),
+                                 repeat=REPEAT, number=1))
+        vectorized = min(timeit.repeat(
+            lambda: tolerate.vectorize(prefer_int_array, cells),
+            repeat=REPEAT, number=1))
+        elementwise = min(timeit.repeat(
+            lambda: tolerate.vectorize(prefer_int_array, cells,
+                                       elementwise=int),
+            repeat=REPEAT, number=1))
+        print('%-16s %13.1f ms %17.1f ms %17.1f ms' % (
+            ratio, loop * 1e3, vectorized * 1e3, elementwise * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+# coding=utf-8
+"""
+Runner of the benchmark suite with stored baselines
+
+Each benchmark is calibrated to run at least ``--min-time`` seconds per
+sample, and the median and the standard deviation of ``--samples`` samples
+(after a warm-up sample) are reported in nanoseconds per call. Statements
+are executed by :mod:`timeit` directly in the namespace of the benchmark so
+no extra function call is measured (Python 3.5 or later).
+
+Results can be saved as a baseline (a JSON file in
+``benchmarks/baselines``) and compared with it; benchmarks slower than the
+baseline by more than ``--threshold`` are reported as regressions and the
+exit status becomes 1. Baselines depend on the machine and the interpreter
+so compare results measured on the same machine.
+
+Usage::
+
+    $ python benchmarks/run.py                      # run and print
+    $ python benchmarks/run.py --save               # save the baseline
+    $ python benchmarks/run.py --compare            # compare with it
+    $ python benchmarks/run.py --filter switch/     # run matched ones
+
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import os
+import re
+import sys
+import json
+import math
+import timeit
+import platform
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from suite import get_benchmarks
+
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'baselines')
+
+
+def get_default_baseline():
+    """
+    Return a name of the baseline of the running interpreter
+    """
+    return '%s-%d.%d' % ((platform.python_implementation().lower(),) +
+                         sys.version_info[:2])
+
+
+def build_timer(statement, namespace):
+    try:
+        return timeit.Timer(statement, globals=namespace)
+    except TypeError:
+        # `globals` was introduced from Python 3.5
+        code = compile(statement, '<benchmark>', 'eval')
+        return timeit.Timer(lambda: eval(code, namespace))
+
+
+def calibrate(timer, min_time):
+    """
+    Return a number of loops which take at least :attr:`min_time` seconds
+    """
+    number = 1
+    while True:
+        if timer.timeit(number) >= min_time:
+            return number
+        number *= 10
+
+
+def measure(statement, namespace, samples, min_time):
+    """
+    Return the median and the standard deviation in nanoseconds per call
+    """
+    timer = build_timer(statement, namespace)
+    number = calibrate(timer, min_time)
+    # the first sample is a warm-up
+    values = [x / number * 1e9 for x in timer.repeat(samples + 1, number)]
+    values = sorted(values[1:])
+    middle = len(values) // 2
+    if len(values) % 2:
+        median = values[middle]
+    else:
+        median = (values[middle - 1] + values[middle]) / 2
+    mean = sum(values) / len(values)
+    stdev = math.sqrt(sum((x - mean) ** 2 for x in values) / len(values))
+    return median, stdev
+
+
+def load_baseline(name):
+    filename = os.path.join(BASELINES, '%s.json' % name)
+    with open(filename) as fi:
+        return json.load(fi)
+
+
+def save_baseline(name, results):
+    filename = os.path.join(BASELINES, '%s.json' % name)
+    if not os.path.exists(BASELINES):
+        os.makedirs(BASELINES)
+    baseline = {
+        'metadata': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+        },
+        'benchmarks': dict(
+            (name, {'median': round(median, 1), 'stdev': round(stdev, 1)})
+            for name, median, stdev in results),
+    }
+    with open(filename, 'w') as fo:
+        json.dump(baseline, fo, indent=2, sort_keys=True)
+        fo.write('\n')
+    return filename
+
+
+def compare(results, baseline, threshold):
+    """
+    Print the results with the ratio to the baseline and return a list of
+    names of regressions
+    """
+    regressions = []
+    stored = baseline['benchmarks']
+    print('%-48s %10s %10s %7s' % ('benchmark', 'baseline', 'current',
+                                   'ratio'))
+    for name, median, stdev in results:
+        if name not in stored:
+            print('%-48s %10s %7.1f ns %7s' % (name, '-', median, '-'))
+            continue
+        base = stored[name]['median']
+        ratio = median / base
+        mark = ''
+        if ratio > 1 + threshold:
+            mark = ' slower'
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            mark = ' faster'
+        print('%-48s %7.1f ns %7.1f ns %6.2fx%s' % (name, base, median,
+                                                    ratio, mark))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Run the benchmark suite of tolerance')
+    parser.add_argument('--filter', default=None,
+                        help='a regular expression of benchmarks to run')
+    parser.add_argument('--samples', type=int, default=7,
+                        help='a number of samples of each benchmark')
+    parser.add_argument('--min-time', type=float, default=0.02,
+                        help='a minimum number of seconds of a sample')
+    parser.add_argument('--baseline', default=get_default_baseline(),
+                        help='a name of the baseline (default: %(default)s)')
+    parser.add_argument('--save', action='store_true',
+                        help='save the results as the baseline')
+    parser.add_argument('--compare', action='store_true',
+                        help='compare the results with the baseline')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='a ratio of slowdown reported as a regression')
+    args = parser.parse_args(argv)
+
+    benchmarks = get_benchmarks()
+    if args.filter:
+        pattern = re.compile(args.filter)
+        benchmarks = [x for x in benchmarks if pattern.search(x[0])]
+    results = []
+    for name, statement, namespace in benchmarks:
+        median, stdev = measure(statement, namespace, args.samples,
+                                args.min_time)
+        results.append((name, median, stdev))
+        if not args.compare:
+            print('%-48s %7.1f ns +- %5.1f ns' % (name, median, stdev))
+    if args.save:
+        print('saved to %s' % save_baseline(args.baseline, results))
+    if args.compare:
+        regressions = compare(results, load_baseline(args.baseline),
+                              args.threshold)
+        if regressions:
+            print('%d regression(s) over %d%%' % (len(regressions),
+                                                  args.threshold * 100))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
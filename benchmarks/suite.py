@@ -0,0 +1,109 @@
+# coding=utf-8
+"""
+A suite of micro benchmarks of the hot paths of ``tolerate``
+
+Each benchmark is a statement executed in a namespace; the cost of a call is
+measured by :mod:`benchmarks.run` and reported in nanoseconds per call.
+Names are ``<group>/<case>/<path>`` where path is ``success`` or
+``failure`` so results can be compared with stored baselines.
+
+Run the suite with ``benchmarks/run.py``.
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+from tolerance import tolerate
+from tolerance.utils import argument_switch_generator
+from tolerance.registries import PolicyRegistry
+
+
+def parse(x):
+    return int(x)
+
+
+def hand_written(x):
+    try:
+        return int(x)
+    except:
+        return x
+
+
+def hand_written_wrapper(fn):
+    # the floor of any generic decorator; packing *args and **kwargs
+    def inner(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except:
+            return args[0]
+    return inner
+
+
+def parse_with_kwargs(x, **kwargs):
+    # receive the switch argument kept by `keep=True`
+    return int(x)
+
+
+def custom_switch(*args, **kwargs):
+    return True, args, kwargs
+
+
+def substitute(x):
+    return x
+
+
+REGISTRY = PolicyRegistry()
+REGISTRY.register('benchmarks.parse', substitute=0)
+
+SUCCESS = '0'
+FAILURE = 'zero'
+
+# (group, case, function, statement)
+DEFINITIONS = (
+    ('reference', 'bare call', parse, 'fn(value)'),
+    ('reference', 'hand-written try/except', hand_written, 'fn(value)'),
+    ('reference', 'hand-written wrapper', hand_written_wrapper(parse),
+     'fn(value)'),
+    ('switch', 'default', tolerate()(parse), 'fn(value)'),
+    ('switch', 'string', tolerate(switch='fail_silently')(parse),
+     'fn(value)'),
+    ('switch', 'string (specified)', tolerate(switch='fail_silently')(parse),
+     'fn(value, fail_silently=True)'),
+    ('switch', 'list', tolerate(switch=['fail_silently', True])(parse),
+     'fn(value)'),
+    ('switch', 'dict', tolerate(switch={'default': True})(parse),
+     'fn(value)'),
+    ('switch', 'callable', tolerate(switch=custom_switch)(parse),
+     'fn(value)'),
+    ('switch', 'None', tolerate(switch=None)(parse), 'fn(value)'),
+    ('generator', 'default',
+     tolerate(switch=argument_switch_generator('fail_silently'))(parse),
+     'fn(value)'),
+    ('generator', 'keep',
+     tolerate(switch=argument_switch_generator(
+         'fail_silently', keep=True))(parse_with_kwargs),
+     'fn(value, fail_silently=True)'),
+    ('generator', 'reverse',
+     tolerate(switch=argument_switch_generator(
+         'fail_silently', reverse=True))(parse),
+     'fn(value, fail_silently=False)'),
+    ('substitute', 'constant', tolerate(0, switch=None)(parse), 'fn(value)'),
+    ('substitute', 'callable', tolerate(substitute, switch=None)(parse),
+     'fn(value)'),
+    ('slotted', 'default', tolerate.slotted()(parse), 'fn(value)'),
+    ('slotted', 'None', tolerate.slotted(switch=None)(parse), 'fn(value)'),
+    ('policy', 'named',
+     tolerate(policy=REGISTRY.get('benchmarks.parse'))(parse), 'fn(value)'),
+)
+
+
+def get_benchmarks():
+    """
+    Return a list of (name, statement, namespace) of the benchmarks
+    """
+    benchmarks = []
+    for group, case, fn, statement in DEFINITIONS:
+        for path, value in (('success', SUCCESS), ('failure', FAILURE)):
+            if fn is parse and path == 'failure':
+                # a bare call cannot fail silently
+                continue
+            name = '%s/%s/%s' % (group, case, path)
+            benchmarks.append((name, statement, {'fn': fn, 'value': value}))
+    return benchmarks
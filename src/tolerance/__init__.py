@@ -9,27 +9,106 @@ of code described in Usage section.
 
 """
 __author__ = 'Alisue <lambdalisue@hashnote.net>'
-__all__ = ('__version__', 'tolerate', 'argument_switch_generator')
+__all__ = ('__version__', 'tolerate', 'tolerate_all',
+           'argument_switch_generator')
 import os.path
-from pkg_resources import get_distribution
-from pkg_resources import DistributionNotFound
+import sys
 
 DISTRIBUTION_NAME = 'tolerance'
 
-# get version information from setup.py
-try: 
-    _dist = get_distribution(DISTRIBUTION_NAME)
-    if not __file__.startswith(os.path.join(_dist.location,
-                                            DISTRIBUTION_NAME)):
-        # not installed, but there is another version that *is*
-        raise DistributionNotFound
-except DistributionNotFound:
-    __version__ = 'Please install this project with setup.py'
-else:
-    __version__ = _dist.version
-
-# shortcut
-from tolerance.decorators import tolerate
-from tolerance.utils import argument_switch_generator
-
-VERSION = tuple(map(tolerate(lambda x: x)(int), __version__.split('.')))
+# shortcuts and submodules are imported at the first access to keep
+# `import tolerance` cheap
+_SHORTCUTS = {
+    'tolerate': 'tolerance.decorators',
+    'tolerate_all': 'tolerance.wrappers',
+    'argument_switch_generator': 'tolerance.utils',
+}
+_SUBMODULES = (
+    'batch',
+    'breakers',
+    'bulkheads',
+    'caches',
+    'coroutines',
+    'decorators',
+    'errors',
+    'functional',
+    'hedges',
+    'limiters',
+    'metrics',
+    'policies',
+    'registries',
+    'retries',
+    'scopes',
+    'timeouts',
+    'utils',
+    'vectorize',
+    'wrappers',
+)
+
+
+def __getattr__(name):
+    if name in _SHORTCUTS:
+        value = getattr(_import_module(_SHORTCUTS[name]), name)
+    elif name in _SUBMODULES:
+        value = _import_module('%s.%s' % (__name__, name))
+    elif name == '__version__':
+        value = _get_version()
+    elif name == 'VERSION':
+        value = _parse_version(__getattr__('__version__'))
+    else:
+        raise AttributeError('module %r has no attribute %r' % (__name__,
+                                                                name))
+    globals()[name] = value
+    return value
+
+
+def _import_module(name):
+    # importlib was introduced from Python 2.7
+    __import__(name)
+    return sys.modules[name]
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_SHORTCUTS) | set(_SUBMODULES) |
+                  set(('__version__', 'VERSION')))
+
+
+def _get_version():
+    # get version information from the installed distribution
+    try:
+        from importlib.metadata import distribution
+        from importlib.metadata import PackageNotFoundError
+    except ImportError:
+        # importlib.metadata was introduced from Python 3.8
+        from pkg_resources import get_distribution as distribution
+        from pkg_resources import DistributionNotFound as PackageNotFoundError
+    try:
+        _dist = distribution(DISTRIBUTION_NAME)
+        if hasattr(_dist, 'locate_file'):
+            location = str(_dist.locate_file(DISTRIBUTION_NAME))
+        else:
+            location = os.path.join(_dist.location, DISTRIBUTION_NAME)
+        if not __file__.startswith(location):
+            # not installed, but there is another version that *is*
+            raise PackageNotFoundError(DISTRIBUTION_NAME)
+    except PackageNotFoundError:
+        return 'Please install this project with setup.py'
+    return _dist.version
+
+
+def _parse_version(version):
+    def prefer_int(x):
+        try:
+            return int(x)
+        except ValueError:
+            return x
+    return tuple(map(prefer_int, version.split('.')))
+
+
+if sys.version_info < (3, 7):
+    # module level __getattr__ (PEP 562) is not available
+    from tolerance.decorators import tolerate
+    from tolerance.wrappers import tolerate_all
+    from tolerance.utils import argument_switch_generator
+    __version__ = _get_version()
+    VERSION = _parse_version(__version__)
@@ -0,0 +1,164 @@
+# coding=utf-8
+"""
+tolerance batch module
+
+Functions which apply a tolerant function to each item of a (large)
+iterable. The configuration of the tolerant function (``tolerate.disabled``,
+switch, substitute, and exceptions) is resolved once for the whole batch
+instead of every item.
+These functions are available as ``tolerate.map`` and ``tolerate.imap``.
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+
+FAILURES_FORMATS = (None, 'mask', 'index')
+"""Available formats of failures returned by :func:`tolerant_map`"""
+
+
+def tolerant_map(fn, iterable, failures=None):
+    """
+    Apply a tolerant function to each item of the iterable and return a list
+
+    The switch of the tolerant function is called once for the whole batch
+    without any arguments (e.g. a default value of an argument switch is
+    used).
+
+    Parameters
+    ----------
+    fn : function
+        A tolerant function decorated by
+        :func:`tolerance.decorators.tolerate`.
+        A non tolerant function is decorated by ``tolerate()``.
+    iterable : iterable
+        An iterable (or sequence) whose items are passed to :attr:`fn`.
+    failures : None, 'mask', or 'index'
+        If ``'mask'`` is specified, a list of booleans which indicate failed
+        items is returned as well.
+        If ``'index'`` is specified, a list of indexes of failed items is
+        returned as well.
+
+    Returns
+    -------
+    list or tuple
+        A list of results or a tuple of a list of results and failures.
+
+    Examples
+    --------
+    >>> from tolerance.decorators import tolerate
+    >>> prefer_int = tolerate(lambda x: x)(int)
+    >>> tolerant_map(prefer_int, ['0', 'one', '2'])
+    [0, 'one', 2]
+    >>> tolerant_map(prefer_int, ['0', 'one', '2'], failures='mask')
+    ([0, 'one', 2], [False, True, False])
+    >>> tolerant_map(prefer_int, ['0', 'one', '2'], failures='index')
+    ([0, 'one', 2], [1])
+    >>> tolerant_map(int, ['0', 'one', '2'])
+    [0, None, 2]
+    """
+    if failures not in FAILURES_FORMATS:
+        raise ValueError('failures should be one of %s but %r is specified'
+                         % (', '.join(map(repr, FAILURES_FORMATS)), failures))
+    from tolerance.decorators import get_configuration
+    configuration = get_configuration(fn)
+    fn = configuration.fn
+    handle = configuration.handle
+    results = []
+    append = results.append
+    indexes = []
+    if configuration.is_tolerant():
+        index = 0
+        for item in iterable:
+            try:
+                append(fn(item))
+            except:
+                append(handle((item,), {}))
+                indexes.append(index)
+            index += 1
+    else:
+        # the tolerance is turned off so call normally.
+        for item in iterable:
+            append(fn(item))
+    if failures is None:
+        return results
+    elif failures == 'index':
+        return results, indexes
+    mask = [False] * len(results)
+    for index in indexes:
+        mask[index] = True
+    return results, mask
+
+
+def tolerant_imap(fn, iterable, failures=False):
+    """
+    Lazily apply a tolerant function to each item of the iterable
+
+    It is a generator version of :func:`tolerant_map` for iterables which
+    do not fit in memory.
+
+    Parameters
+    ----------
+    fn : function
+        A tolerant function decorated by
+        :func:`tolerance.decorators.tolerate`.
+        A non tolerant function is decorated by ``tolerate()``.
+    iterable : iterable
+        An iterable whose items are passed to :attr:`fn`.
+    failures : boolean
+        If it is ``True``, yield a tuple of a result and a boolean which
+        indicate that the item has failed.
+
+    Returns
+    -------
+    generator
+        A generator which yield results (or tuples of a result and failed).
+
+    Examples
+    --------
+    >>> from tolerance.decorators import tolerate
+    >>> prefer_int = tolerate(lambda x: x)(int)
+    >>> list(tolerant_imap(prefer_int, iter(['0', 'one', '2'])))
+    [0, 'one', 2]
+    >>> list(tolerant_imap(prefer_int, ['0', 'one'], failures=True))
+    [(0, False), ('one', True)]
+    """
+    from tolerance.decorators import get_configuration
+    configuration = get_configuration(fn)
+    # the configuration is resolved when the generator is created rather than
+    # the first item is requested
+    if not configuration.is_tolerant():
+        return _imap_intolerant(configuration, iterable, failures)
+    elif failures:
+        return _imap_with_failures(configuration, iterable)
+    return _imap(configuration, iterable)
+
+
+def _imap(configuration, iterable):
+    fn = configuration.fn
+    handle = configuration.handle
+    for item in iterable:
+        try:
+            result = fn(item)
+        except:
+            result = handle((item,), {})
+        yield result
+
+
+def _imap_with_failures(configuration, iterable):
+    fn = configuration.fn
+    handle = configuration.handle
+    for item in iterable:
+        failed = False
+        try:
+            result = fn(item)
+        except:
+            result = handle((item,), {})
+            failed = True
+        yield result, failed
+
+
+def _imap_intolerant(configuration, iterable, failures):
+    fn = configuration.fn
+    for item in iterable:
+        if failures:
+            yield fn(item), False
+        else:
+            yield fn(item)
@@ -0,0 +1,196 @@
+# coding=utf-8
+"""
+tolerance breaker module
+
+A circuit breaker policy which stop calling a function which has been failing
+and use the substitute instead until a cool-down period has elapsed.
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import threading
+from collections import deque
+from tolerance.policies import Policy
+from tolerance.policies import Rejected
+from tolerance.policies import Rejection
+from tolerance.utils import monotonic
+
+CLOSED = 'closed'
+"""A state which calls the function"""
+
+OPEN = 'open'
+"""A state which rejects calls"""
+
+HALF_OPEN = 'half-open'
+"""A state which calls the function to probe whether it has recovered"""
+
+
+class CircuitOpen(Rejected):
+    """
+    An exception class which represents a call rejected by an open circuit
+    """
+
+
+class CircuitBreaker(Policy):
+    """
+    A policy which stop calling a function which has been failing
+
+    The circuit is *closed* at first and calls the function. When failures
+    exceed the threshold, the circuit becomes *open* and rejects calls (the
+    substitute for :class:`CircuitOpen` is used) until :attr:`cooldown`
+    seconds has elapsed. Then the circuit becomes *half-open* and up to
+    :attr:`probes` calls are made concurrently; the circuit is closed when
+    one of them succeeds and opened again when one of them fails.
+
+    Only failures with ignored exceptions are counted.
+    The state is checked without the lock while the circuit is closed or
+    open, and successful calls in the closed state are recorded without the
+    lock as well, so the breaker does not become a contention point.
+
+    Specify an instance to ``breaker`` of
+    :func:`tolerance.decorators.tolerate`. The instance can be shared
+    between functions which call the same dependency.
+
+    Parameters
+    ----------
+    threshold : integer
+        A number of consecutive failures which open the circuit.
+        When :attr:`rate` is specified, a minimum number of failures in the
+        window to open the circuit.
+    rate : float or None
+        A failure rate (0.0 - 1.0) of the last :attr:`window` calls which
+        open the circuit.
+    window : integer
+        A number of recent calls used to compute the failure rate.
+    cooldown : number
+        A number of seconds which the circuit is kept open for.
+    probes : integer
+        A maximum number of concurrent calls in the half-open state.
+    clock : function or None
+        A function which return the current time in seconds.
+        :func:`tolerance.utils.monotonic` is used if ``None`` is specified.
+
+    Attributes
+    ----------
+    opened : integer
+        A number of times which the circuit has been opened.
+
+    Examples
+    --------
+    >>> from tolerance.decorators import tolerate
+    >>> breaker = CircuitBreaker(threshold=2, cooldown=30)
+    >>> calls = []
+    >>> @tolerate('unavailable', breaker=breaker)
+    ... def fetch():
+    ...     calls.append(None)
+    ...     raise IOError
+    >>> fetch(), fetch(), fetch(), fetch()
+    ('unavailable', 'unavailable', 'unavailable', 'unavailable')
+    >>> len(calls), breaker.state
+    (2, 'open')
+    """
+    def __init__(self, threshold=5, rate=None, window=20, cooldown=30,
+                 probes=1, clock=None):
+        if threshold < 1:
+            raise ValueError('threshold should be a positive integer but %r '
+                             'is specified' % threshold)
+        if rate is not None and not 0 < rate <= 1:
+            raise ValueError('rate should be in (0, 1] but %r is specified'
+                             % rate)
+        self.threshold = threshold
+        self.rate = rate
+        self.window = window
+        self.cooldown = cooldown
+        self.probes = probes
+        self.clock = clock or monotonic
+        self.opened = 0
+        self._state = CLOSED
+        self._opened_at = None
+        self._failures = 0
+        self._probing = 0
+        # appending to a deque is atomic so it is done without the lock
+        self._outcomes = deque(maxlen=window)
+        self._rejection = Rejection(CircuitOpen)
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """
+        The current state; 'closed', 'open', or 'half-open'
+        """
+        return self._state
+
+    def before(self, args, kwargs):
+        state = self._state
+        if state is CLOSED:
+            return CLOSED
+        if state is OPEN:
+            if self.clock() < self._opened_at + self.cooldown:
+                return self._rejection
+        with self._lock:
+            state = self._state
+            if state is OPEN and \
+                    self.clock() >= self._opened_at + self.cooldown:
+                state = self._state = HALF_OPEN
+                self._probing = 0
+            if state is CLOSED:
+                return CLOSED
+            elif state is HALF_OPEN and self._probing < self.probes:
+                self._probing += 1
+                return HALF_OPEN
+        return self._rejection
+
+    def success(self, token, result):
+        if token is CLOSED:
+            if self.rate is not None:
+                self._outcomes.append(False)
+            elif self._failures:
+                self._failures = 0
+            return
+        with self._lock:
+            self._probing -= 1
+            if self._state is HALF_OPEN:
+                self._close()
+
+    def failure(self, token, exc_type):
+        with self._lock:
+            if token is HALF_OPEN:
+                self._probing -= 1
+                if self._state is HALF_OPEN:
+                    self._open()
+                return
+            elif self._state is not CLOSED:
+                # the call has started before the circuit is opened
+                return
+            if self.rate is None:
+                self._failures += 1
+                if self._failures >= self.threshold:
+                    self._open()
+                return
+            self._outcomes.append(True)
+            failures = self._outcomes.count(True)
+            if failures >= self.threshold and \
+                    failures >= self.rate * len(self._outcomes):
+                self._open()
+
+    def release(self, token):
+        if token is HALF_OPEN:
+            with self._lock:
+                self._probing -= 1
+
+    def reset(self):
+        """
+        Close the circuit and forget recorded failures
+        """
+        with self._lock:
+            self._close()
+
+    def _open(self):
+        self._opened_at = self.clock()
+        self._state = OPEN
+        self._failures = 0
+        self._outcomes.clear()
+        self.opened += 1
+
+    def _close(self):
+        self._state = CLOSED
+        self._failures = 0
+        self._outcomes.clear()
@@ -0,0 +1,457 @@
+# coding=utf-8
+"""
+tolerance bulkhead module
+
+A bulkhead which limit the number of concurrent calls and use the substitute
+immediately (load shedding) when the limit and the wait queue are full.
+A bulkhead is shared by threads and asynchronous tasks; threads wait in the
+queue with ``threading.Event`` and tasks with futures of their event loop.
+An adaptive limit adjusts the limit from the observed latency instead.
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import math
+import threading
+from collections import deque
+from tolerance.policies import Policy
+from tolerance.policies import Rejected
+from tolerance.policies import Rejection
+from tolerance.utils import monotonic
+
+ALGORITHMS = ('gradient', 'aimd')
+"""Algorithms of :class:`AdaptiveLimit`"""
+
+
+class BulkheadFull(Rejected):
+    """
+    An exception class which represents a call rejected by a full bulkhead
+    """
+
+
+class Waiter(object):
+    """
+    A call which waits in the queue of :class:`Bulkhead` for a slot
+
+    ``granted`` is set under the lock of the bulkhead when a finished call
+    hands its slot over to the waiter.
+    """
+    __slots__ = ('granted', 'event', 'loop', 'future')
+
+    def __init__(self, loop=None):
+        self.granted = False
+        self.loop = loop
+        if loop is None:
+            self.event = threading.Event()
+            self.future = None
+        else:
+            self.event = None
+            self.future = loop.create_future()
+
+    def wake(self):
+        """
+        Wake the waiter and return ``False`` if its event loop is closed
+        """
+        if self.loop is None:
+            self.event.set()
+            return True
+        try:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+        except RuntimeError:
+            return False
+        return True
+
+
+def _resolve(future):
+    # the future is cancelled when the waiting task has been cancelled
+    if not future.done():
+        future.set_result(None)
+
+
+class Bulkhead(object):
+    """
+    A policy which limit the number of concurrent calls
+
+    Calls over :attr:`max_concurrency` wait in the queue up to
+    :attr:`max_queue` calls for :attr:`queue_timeout` seconds. Calls which
+    cannot enter the queue (or time out in it) are rejected with
+    :class:`BulkheadFull` and the substitute is returned immediately
+    without calling the function, so a slow dependency cannot hold every
+    thread of the process.
+    A finished call hands its slot over to the first waiter in the queue.
+
+    Specify an instance or a maximum number of concurrent calls to
+    ``max_concurrency`` of :func:`tolerance.decorators.tolerate`. The
+    instance can be shared between functions (and between threads and
+    asynchronous tasks) to limit calls of a dependency as a whole.
+    The bulkhead is applied inside ``timeout`` so a timed-out call keeps its
+    slot until it actually returns, and outside ``retry`` and ``hedge`` so
+    retries and hedged calls share the slot of the call.
+
+    Parameters
+    ----------
+    max_concurrency : integer
+        A maximum number of calls which run concurrently.
+    max_queue : integer
+        A maximum number of calls which wait for a slot. Calls are rejected
+        immediately if 0 is specified (default).
+    queue_timeout : number or None
+        A number of seconds which a call waits in the queue. It waits until
+        a slot is available if ``None`` is specified.
+
+    Attributes
+    ----------
+    in_flight : integer
+        A number of calls which are running.
+    rejected : integer
+        A number of calls which have been rejected.
+
+    Examples
+    --------
+    >>> import threading
+    >>> from tolerance.decorators import tolerate
+    >>> bulkhead = Bulkhead(max_concurrency=1)
+    >>> started, event = threading.Event(), threading.Event()
+    >>> @tolerate('busy', max_concurrency=bulkhead)
+    ... def fetch(url):
+    ...     started.set()
+    ...     event.wait(5)
+    ...     return 'content'
+    >>> thread = threading.Thread(target=fetch, args=('http://example.com',))
+    >>> thread.start()
+    >>> started.wait(5)
+    True
+    >>> fetch('http://example.com')
+    'busy'
+    >>> bulkhead.in_flight, bulkhead.rejected
+    (1, 1)
+    >>> event.set()
+    >>> thread.join()
+    >>> fetch('http://example.com')
+    'content'
+    """
+    def __init__(self, max_concurrency, max_queue=0, queue_timeout=None):
+        if max_concurrency < 1:
+            raise ValueError('max_concurrency should be a positive integer '
+                             'but %r is specified' % max_concurrency)
+        if max_queue < 0:
+            raise ValueError('max_queue should not be a negative integer but '
+                             '%r is specified' % max_queue)
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.rejected = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<Bulkhead: %d/%d in flight, %d queued>' % (
+            self.in_flight, self.max_concurrency, len(self._waiters))
+
+    @property
+    def queued(self):
+        """
+        A number of calls which wait in the queue
+        """
+        return len(self._waiters)
+
+    def reserve(self, loop=None):
+        """
+        Reserve a slot for a call
+
+        Return ``True`` when a slot is reserved, ``False`` when the call is
+        rejected, or a :class:`Waiter` which waits in the queue (a future of
+        :attr:`loop` is used if it is specified). The waiter has to be passed
+        to :meth:`settle` after waiting.
+        """
+        with self._lock:
+            if self.in_flight < self.max_concurrency:
+                self.in_flight += 1
+                return True
+            if len(self._waiters) < self.max_queue:
+                waiter = Waiter(loop)
+                self._waiters.append(waiter)
+                return waiter
+            self.rejected += 1
+            return False
+
+    def settle(self, waiter):
+        """
+        Return whether a slot has been handed over to the waiter
+
+        The waiter is removed from the queue and counted as a rejected call
+        when it has not got a slot (e.g. the queue timeout is exceeded).
+        """
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            self.rejected += 1
+            return False
+
+    def release(self):
+        """
+        Release the slot of a finished call or hand it over to the waiter
+        """
+        with self._lock:
+            if not self._waiters:
+                self.in_flight -= 1
+                return
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+        if not waiter.wake():
+            # the waiter never runs so the slot is released again
+            self.release()
+
+    def acquire(self):
+        """
+        Reserve a slot and wait in the queue when it is required
+
+        Return ``False`` when the call is rejected.
+        """
+        waiter = self.reserve()
+        if waiter is True or waiter is False:
+            return waiter
+        waiter.event.wait(self.queue_timeout)
+        return self.settle(waiter)
+
+    def wrap(self, fn, resolve=None):
+        """
+        Return a function which call :attr:`fn` in a slot of the bulkhead
+        """
+        def inner(*args, **kwargs):
+            if not self.acquire():
+                raise BulkheadFull('the bulkhead is full')
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.release()
+        return inner
+
+    def wrap_async(self, fn, resolve=None):
+        """
+        Return a coroutine function which await :attr:`fn` in a slot of the
+        bulkhead
+        """
+        from tolerance.coroutines import build_async_bulkhead
+        return build_async_bulkhead(self, fn)
+
+
+class AdaptiveLimit(Policy):
+    """
+    A policy which limit the number of concurrent calls with a limit adjusted
+    from the observed latency
+
+    The limit is adjusted on each finished call from the rolling minimum
+    latency of the last :attr:`window` seconds (the latency without load)
+    and the current latency (an exponentially weighted moving average).
+    Calls over the limit are rejected with :class:`BulkheadFull` and the
+    substitute is returned immediately without calling the function.
+
+    ``'gradient'`` algorithm adds ``sqrt(limit)`` as a headroom to the limit
+    and multiplies it by ``tolerance * min_latency / latency`` (clamped to
+    [0.5, 1]), then smooths the change by :attr:`smoothing`; the limit
+    shrinks while the latency grows and grows while it is close to the
+    minimum.
+    ``'aimd'`` algorithm (additive-increase/multiplicative-decrease)
+    multiplies the limit by :attr:`backoff` when the latency exceeds
+    ``tolerance * min_latency`` and adds ``1 / limit`` otherwise (about 1
+    for each round trip of the limit).
+    Calls rejected by executors (e.g. :class:`tolerance.timeouts.TimedOut`)
+    always shrink the limit. Multiplicative decreases are applied once for
+    calls which started before the last decrease (like TCP) so a burst of
+    slow calls does not collapse the limit. The limit is not increased
+    while less than a half of it is used.
+
+    Specify an instance to ``max_concurrency`` of
+    :func:`tolerance.decorators.tolerate`. Unlike :class:`Bulkhead`, it is
+    applied as a policy so the latency includes ``retry`` and ``timeout``
+    and calls never wait in a queue.
+
+    Parameters
+    ----------
+    initial : integer
+        An initial limit.
+    min_limit : integer
+        A minimum limit.
+    max_limit : integer
+        A maximum limit.
+    algorithm : 'gradient' or 'aimd'
+        An algorithm which adjust the limit.
+    tolerance : number
+        A ratio of the current latency to the minimum latency which is
+        regarded as no load.
+    window : number
+        A number of seconds which the rolling minimum latency covers. The
+        minimum follows a backend whose latency without load has changed
+        after it.
+    smoothing : float
+        A weight (0.0 - 1.0) of a new sample in the moving average of the
+        latency and a new limit of ``'gradient'`` algorithm.
+    backoff : float
+        A ratio which ``'aimd'`` algorithm multiplies the limit by.
+    history : integer
+        A maximum number of changes of the limit which are kept.
+    clock : function or None
+        A function which return the current time in seconds.
+        :func:`tolerance.utils.monotonic` is used if ``None`` is specified.
+
+    Attributes
+    ----------
+    in_flight : integer
+        A number of calls which are running.
+    rejected : integer
+        A number of calls which have been rejected.
+
+    Examples
+    --------
+    >>> from tolerance.decorators import tolerate
+    >>> now = [0]
+    >>> limit = AdaptiveLimit(initial=10, algorithm='aimd',
+    ...                       clock=lambda: now[0])
+    >>> @tolerate('busy', max_concurrency=limit)
+    ... def fetch(url, latency):
+    ...     now[0] += latency
+    ...     return 'content'
+    >>> fetch('http://example.com', 0.1)
+    'content'
+    >>> fetch('http://example.com', 0.5)    # 5 times slower
+    'content'
+    >>> limit.limit
+    9
+    >>> [x[1] for x in limit.get_history()]
+    [10, 9]
+    """
+    def __init__(self, initial=20, min_limit=1, max_limit=1000,
+                 algorithm='gradient', tolerance=2.0, window=60,
+                 smoothing=0.2, backoff=0.9, history=1000, clock=None):
+        if algorithm not in ALGORITHMS:
+            raise ValueError('algorithm should be one of %s but %r is '
+                             'specified' % (', '.join(ALGORITHMS), algorithm))
+        if not 1 <= min_limit <= initial <= max_limit:
+            raise ValueError('min_limit <= initial <= max_limit should be '
+                             'satisfied but %r, %r, %r are specified'
+                             % (min_limit, initial, max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.algorithm = algorithm
+        self.tolerance = tolerance
+        self.window = window
+        self.smoothing = smoothing
+        self.backoff = backoff
+        self.clock = clock or monotonic
+        self.in_flight = 0
+        self.rejected = 0
+        self.latency = None
+        self.limit = initial
+        self._limit = float(initial)
+        self._decreased_at = float('-inf')
+        # a monotonic deque of (time, latency) for the rolling minimum; the
+        # length is bounded so the memory is constant even if the latency
+        # keeps growing for the window
+        self._minimums = deque(maxlen=1024)
+        self._history = deque([(self.clock(), initial)], maxlen=history)
+        self._rejection = Rejection(BulkheadFull)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<AdaptiveLimit: %d/%d in flight>' % (self.in_flight,
+                                                     self.limit)
+
+    @property
+    def min_latency(self):
+        """
+        The rolling minimum latency of the last :attr:`window` seconds
+        """
+        minimums = self._minimums
+        return minimums[0][1] if minimums else None
+
+    def get_history(self):
+        """
+        Return a list of (time, limit) of recent changes of the limit
+        """
+        with self._lock:
+            return list(self._history)
+
+    def snapshot(self):
+        """
+        Return a dict of the current limit and statistics for dashboards
+        """
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'in_flight': self.in_flight,
+                'rejected': self.rejected,
+                'latency': self.latency,
+                'min_latency': self.min_latency,
+            }
+
+    def before(self, args, kwargs):
+        with self._lock:
+            if self.in_flight >= self.limit:
+                self.rejected += 1
+                return self._rejection
+            self.in_flight += 1
+        return self.clock()
+
+    def success(self, token, result):
+        latency = self.clock() - token
+        with self._lock:
+            self._update(token, latency, False)
+            self.in_flight -= 1
+
+    def failure(self, token, exc_type):
+        latency = self.clock() - token
+        with self._lock:
+            # rejections by executors (e.g. timeouts) are overload signals
+            self._update(token, latency, issubclass(exc_type, Rejected))
+            self.in_flight -= 1
+
+    def release(self, token):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _update(self, start, latency, dropped):
+        # the rolling minimum of the last `window` seconds
+        now = start + latency
+        minimums = self._minimums
+        while minimums and minimums[-1][1] >= latency:
+            minimums.pop()
+        minimums.append((now, latency))
+        while minimums[0][0] <= now - self.window:
+            minimums.popleft()
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self.smoothing * (latency - self.latency)
+        limit = self._limit
+        saturated = self.in_flight * 2 >= limit
+        threshold = self.tolerance * minimums[0][1]
+        # calls which started before the last decrease have seen the old
+        # limit so the limit is decreased once for them (like TCP)
+        decrease = start >= self._decreased_at
+        if dropped:
+            if decrease:
+                limit *= self.backoff
+        elif self.algorithm == 'aimd':
+            if latency > threshold:
+                if decrease:
+                    limit *= self.backoff
+            elif saturated:
+                # about 1 for each round trip of the limit
+                limit += 1.0 / limit
+        else:
+            if self.latency > 0:
+                gradient = max(0.5, min(1.0, threshold / self.latency))
+            else:
+                gradient = 1.0
+            if gradient < 1.0 or saturated:
+                # the gradient is applied to the headroom as well, otherwise
+                # small limits (limit <= 4) never shrink
+                target = gradient * (limit + math.sqrt(limit))
+                limit += self.smoothing * (target - limit)
+        if limit < self._limit:
+            self._decreased_at = now
+        self._limit = limit = max(self.min_limit, min(self.max_limit, limit))
+        if int(limit) != self.limit:
+            self.limit = int(limit)
+            self._history.append((now, self.limit))
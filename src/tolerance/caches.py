@@ -0,0 +1,281 @@
+# coding=utf-8
+"""
+tolerance cache module
+
+Policies which remember the outcome of calls of a tolerant function.
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import threading
+from collections import OrderedDict
+from tolerance.policies import Policy
+from tolerance.policies import Rejection
+from tolerance.policies import Fallback
+from tolerance.utils import monotonic
+from tolerance.utils import move_to_end
+
+# a marker which separate positional and keyword arguments in keys
+_KWARGS_MARK = object()
+
+
+class FailureCache(Policy):
+    """
+    A policy which remember arguments of failed calls (negative cache)
+
+    Calls with arguments which have failed recently are rejected and the
+    substitute for the exception raised in the failed call is returned
+    without calling the function, so the cost of raising and catching the
+    exception is paid once for repeated bad inputs.
+    Entries are keyed on the call arguments (which should be hashable, calls
+    with unhashable arguments are not cached) and evicted in LRU order when
+    the number exceeds :attr:`maxsize` or when :attr:`ttl` has elapsed.
+    It is thread-safe.
+
+    Specify an instance to ``cache`` of
+    :func:`tolerance.decorators.tolerate`. The instance should not be shared
+    between functions because the function is not a part of the key.
+
+    Parameters
+    ----------
+    maxsize : integer
+        A maximum number of remembered arguments.
+    ttl : number or None
+        A number of seconds which the failure is remembered for. ``None``
+        to remember until the entry is evicted.
+    clock : function or None
+        A function which return the current time in seconds.
+        :func:`tolerance.utils.monotonic` is used if ``None`` is specified.
+
+    Attributes
+    ----------
+    hits : integer
+        A number of calls rejected by the cache.
+    misses : integer
+        A number of calls (with hashable arguments) not found in the cache.
+
+    Examples
+    --------
+    >>> from tolerance.decorators import tolerate
+    >>> calls = []
+    >>> cache = FailureCache(maxsize=128, ttl=60)
+    >>> @tolerate(lambda x: x, cache=cache)
+    ... def prefer_int(x):
+    ...     calls.append(x)
+    ...     return int(x)
+    >>> prefer_int('zero'), prefer_int('zero'), prefer_int('0')
+    ('zero', 'zero', 0)
+    >>> calls
+    ['zero', '0']
+    >>> cache.hits, cache.misses, len(cache)
+    (1, 2, 1)
+    >>> cache.clear()
+    >>> cache.hits, cache.misses, len(cache)
+    (0, 0, 0)
+    """
+    def __init__(self, maxsize=1024, ttl=60, clock=None):
+        if maxsize < 1:
+            raise ValueError('maxsize should be a positive integer but %r is '
+                             'specified' % maxsize)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock or monotonic
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def before(self, args, kwargs):
+        key = make_key(args, kwargs)
+        try:
+            entry = self._entries.get(key)
+        except TypeError:
+            # unhashable arguments are not cached
+            return None
+        if entry is not None:
+            rejection, expires = entry
+            if expires is None or expires > self.clock():
+                with self._lock:
+                    move_to_end(self._entries, key)
+                    self.hits += 1
+                return rejection
+        with self._lock:
+            self.misses += 1
+        return key
+
+    def failure(self, key, exc_type):
+        if key is None:
+            return
+        expires = None if self.ttl is None else self.clock() + self.ttl
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (Rejection(exc_type), expires)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove all entries and reset counters
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+class StaleCache(Policy):
+    """
+    A policy which return the last known good result on failures
+    (stale-on-error)
+
+    Results of successful calls are remembered for each arguments and the
+    last result for the same arguments is returned instead of the
+    substitute when the call fails or is rejected by a following policy
+    (e.g. :class:`tolerance.breakers.CircuitBreaker`). The substitute is
+    used only when there is no result or it is older than :attr:`max_age`.
+    Entries are keyed on the call arguments (which should be hashable, calls
+    with unhashable arguments are not cached) and evicted in LRU order when
+    the number exceeds :attr:`maxsize`.
+    It is thread-safe.
+
+    Specify an instance to ``stale`` of
+    :func:`tolerance.decorators.tolerate`. The instance should not be shared
+    between functions because the function is not a part of the key.
+
+    Parameters
+    ----------
+    maxsize : integer
+        A maximum number of remembered results.
+    max_age : number or None
+        A maximum number of seconds since the result was stored which the
+        result can be used for. ``None`` to use it until it is evicted.
+    clock : function or None
+        A function which return the current time in seconds.
+        :func:`tolerance.utils.monotonic` is used if ``None`` is specified.
+
+    Attributes
+    ----------
+    hits : integer
+        A number of failed calls which returned the stored result.
+    misses : integer
+        A number of failed calls which used the substitute because there is
+        no result (or it is too old).
+
+    Examples
+    --------
+    >>> from tolerance.decorators import tolerate
+    >>> prices = {'apple': 100}
+    >>> cache = StaleCache(maxsize=128, max_age=3600)
+    >>> @tolerate('unavailable', stale=cache)
+    ... def get_price(name):
+    ...     return prices[name]
+    >>> get_price('apple')
+    100
+    >>> prices.clear()      # the backend is down
+    >>> get_price('apple'), get_price('orange')
+    (100, 'unavailable')
+    >>> cache.hits, cache.misses
+    (1, 1)
+    >>> cache.get_age(('apple',), {}) < 1
+    True
+    """
+    def __init__(self, maxsize=1024, max_age=300, clock=None):
+        if maxsize < 1:
+            raise ValueError('maxsize should be a positive integer but %r is '
+                             'specified' % maxsize)
+        self.maxsize = maxsize
+        self.max_age = max_age
+        self.clock = clock or monotonic
+        self.hits = 0
+        self.misses = 0
+        # key -> (Fallback(result), stored)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def before(self, args, kwargs):
+        key = make_key(args, kwargs)
+        try:
+            hash(key)
+        except TypeError:
+            # unhashable arguments are not cached
+            return None
+        return key
+
+    def success(self, key, result):
+        if key is None:
+            return
+        entry = (Fallback(result), self.clock())
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def failure(self, key, exc_type):
+        entry = None if key is None else self._entries.get(key)
+        if entry is not None:
+            fallback, stored = entry
+            if self.max_age is None or \
+                    self.clock() - stored <= self.max_age:
+                with self._lock:
+                    self.hits += 1
+                return fallback
+        with self._lock:
+            self.misses += 1
+
+    # calls rejected by following policies use the result as well
+    rejected = failure
+
+    def get_age(self, args, kwargs):
+        """
+        Return the age (in seconds) of the result of the arguments or
+        ``None``
+        """
+        entry = self._entries.get(make_key(args, kwargs))
+        if entry is None:
+            return None
+        return self.clock() - entry[1]
+
+    def get_ages(self):
+        """
+        Return a list of ages (in seconds) of all results in LRU order
+        """
+        now = self.clock()
+        with self._lock:
+            return [now - stored for fallback, stored
+                    in self._entries.values()]
+
+    def clear(self):
+        """
+        Remove all entries and reset counters
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+def make_key(args, kwargs):
+    """
+    Make a key of the call arguments
+
+    Examples
+    --------
+    >>> make_key((1, 2), {})
+    (1, 2)
+    >>> make_key((1,), {'b': 2, 'a': 1}) == make_key((1,), {'a': 1, 'b': 2})
+    True
+    """
+    if not kwargs:
+        return args
+    return args + (_KWARGS_MARK,) + tuple(sorted(kwargs.items()))
@@ -0,0 +1,345 @@
+# coding=utf-8
+"""
+tolerance coroutine module
+
+Native asynchronous wrappers used by :func:`tolerance.decorators.tolerate`
+for coroutine functions and asynchronous generator functions.
+This module requires Python 3.5 or later (3.6 or later for asynchronous
+generators) and is imported only when such functions are decorated.
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import sys
+import asyncio
+from tolerance.decorators import SCOPE
+from tolerance.decorators import get_scope
+from tolerance.policies import Rejection
+from tolerance.policies import build_bypass_hook
+from tolerance.policies import _fail
+from tolerance.policies import _reject
+from tolerance.policies import _release
+
+
+def build_coroutine_wrapper(fn, handle, switch):
+    """
+    Build a coroutine function which wraps the coroutine function
+
+    The wrapper awaits :attr:`fn` directly so no task is created and the
+    overhead to the event loop is limited to a single extra frame.
+    Failures are delegated to :attr:`handle` and the substitute is awaited
+    when it returns an awaitable (e.g. the substitute is a coroutine
+    function).
+    Exceptions which are not subclass of :class:`Exception` (e.g.
+    cancellation of the task) are never ignored.
+    """
+    async def inner(*args, **kwargs):
+        if get_scope().disabled:
+            # the function has disabled so call normally.
+            return await fn(*args, **kwargs)
+        if switch is not None:
+            status, args, kwargs = switch(*args, **kwargs)
+            if not status:
+                # the switch function return `False` so call noramlly.
+                return await fn(*args, **kwargs)
+        try:
+            return await fn(*args, **kwargs)
+        except Exception:
+            result = handle(args, kwargs)
+        if _is_awaitable(result):
+            result = await result
+        return result
+    return inner
+
+
+def build_async_generator_wrapper(fn, handle, switch, skip, resume):
+    """
+    Build an asynchronous generator function which wraps the one
+
+    The substitute is yielded instead of the failed item (or the item is
+    skipped if :attr:`skip` is ``True``) and the iteration is resumed
+    according to :attr:`resume` (see ``iteration`` and ``resume`` of
+    :func:`tolerance.decorators.tolerate`).
+    Note that an asynchronous generator cannot be resumed once it raised so
+    the iteration of the generator stops after a failure.
+    Exceptions which are not subclass of :class:`Exception` are never
+    ignored.
+    """
+    # True is an instance of int so check it first
+    limit = None if resume is True else int(resume)
+
+    async def inner(*args, **kwargs):
+        if get_scope().disabled:
+            # the function has disabled so iterate normally.
+            async for item in fn(*args, **kwargs):
+                yield item
+            return
+        if switch is not None:
+            status, args, kwargs = switch(*args, **kwargs)
+            if not status:
+                # the switch function return `False` so iterate noramlly.
+                async for item in fn(*args, **kwargs):
+                    yield item
+                return
+        iterator = fn(*args, **kwargs).__aiter__()
+        failures = 0
+        while True:
+            # only exceptions raised from the generator are handled, not
+            # the ones thrown in at `yield` (e.g. GeneratorExit on aclose)
+            try:
+                item = await iterator.__anext__()
+            except StopAsyncIteration:
+                return
+            except Exception:
+                item = handle(args, kwargs)
+                failures += 1
+            else:
+                failures = 0
+                yield item
+                continue
+            if _is_awaitable(item):
+                item = await item
+            if not skip:
+                yield item
+            if limit is not None and failures > limit:
+                return
+    return inner
+
+
+def build_coroutine_policy_wrapper(fn, executed, policies, resolve, default,
+                                   switch):
+    """
+    Build a coroutine function which wraps the coroutine function with the
+    policies
+
+    It is an asynchronous version of
+    :func:`tolerance.policies.build_policy_caller`; the policies are
+    consulted synchronously and :attr:`executed` (:attr:`fn` wrapped by
+    executors like retry) is awaited between them. :attr:`fn` is awaited
+    directly when the tolerance is turned off.
+    """
+    policies = tuple(policies)
+    bypassed = build_bypass_hook(policies)
+    if bypassed is None:
+        direct = fn
+    else:
+        async def direct(*args, **kwargs):
+            bypassed()
+            return await fn(*args, **kwargs)
+
+    async def call(args, kwargs):
+        tokens = []
+        for policy in policies:
+            token = policy.before(args, kwargs)
+            if token.__class__ is Rejection:
+                fallback = _reject(policies, tokens, token.type)
+                if fallback is not None:
+                    return fallback.value
+                substitute = resolve(token.type) or default
+                result = substitute(*args, **kwargs)
+                if _is_awaitable(result):
+                    result = await result
+                return result
+            tokens.append(token)
+        try:
+            result = await executed(*args, **kwargs)
+        except Exception:
+            exc_type = sys.exc_info()[0]
+            substitute = resolve(exc_type)
+            if substitute is None:
+                _release(policies, tokens)
+                raise
+            fallback = _fail(policies, tokens, exc_type)
+            if fallback is not None:
+                return fallback.value
+            result = substitute(*args, **kwargs)
+        except BaseException:
+            # e.g. cancellation of the task
+            _release(policies, tokens)
+            raise
+        else:
+            for policy, token in zip(policies, tokens):
+                policy.success(token, result)
+            return result
+        if _is_awaitable(result):
+            result = await result
+        return result
+
+    async def inner(*args, **kwargs):
+        if get_scope().disabled:
+            # the function has disabled so call normally.
+            return await direct(*args, **kwargs)
+        if switch is not None:
+            status, args, kwargs = switch(*args, **kwargs)
+            if not status:
+                # the switch function return `False` so call noramlly.
+                return await direct(*args, **kwargs)
+        return await call(args, kwargs)
+    return inner
+
+
+def build_async_retry(retry, fn, resolve):
+    """
+    Build a coroutine function which await the coroutine function with
+    retries of :class:`tolerance.retries.Retry`
+    """
+    sleep = retry.sleep or asyncio.sleep
+
+    async def inner(*args, **kwargs):
+        start = None if retry.deadline is None else retry.clock()
+        attempt = 0
+        while True:
+            try:
+                return await fn(*args, **kwargs)
+            except Exception:
+                attempt += 1
+                delay = retry.next_delay(attempt, sys.exc_info()[0], start,
+                                         resolve)
+                if delay is None:
+                    raise
+            result = sleep(delay)
+            if _is_awaitable(result):
+                await result
+    return inner
+
+
+def build_async_timeout(timeout, fn):
+    """
+    Build a coroutine function which await the coroutine function with the
+    timeout of :class:`tolerance.timeouts.Timeout`
+
+    The call is cancelled when it exceeds the timeout.
+    """
+    from tolerance.timeouts import TimedOut
+    seconds = timeout.seconds
+
+    if hasattr(asyncio, 'timeout'):
+        async def inner(*args, **kwargs):
+            try:
+                async with asyncio.timeout(seconds) as scope:
+                    return await fn(*args, **kwargs)
+            except TimeoutError:
+                # TimeoutError raised in the call is not a timeout
+                if not scope.expired():
+                    raise
+            timeout.abandon()
+            raise TimedOut('the call exceeded %s seconds' % seconds)
+    else:
+        # asyncio.timeout was introduced from Python 3.11
+        async def inner(*args, **kwargs):
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            try:
+                done, pending = await asyncio.wait((task,), timeout=seconds)
+            except asyncio.CancelledError:
+                # asyncio.wait does not cancel the task with the caller
+                task.cancel()
+                raise
+            if done:
+                return task.result()
+            task.cancel()
+            timeout.abandon()
+            raise TimedOut('the call exceeded %s seconds' % seconds)
+    return inner
+
+
+def build_async_hedge(hedge, fn):
+    """
+    Build a coroutine function which await the coroutine function with a
+    hedge of :class:`tolerance.hedges.Hedge`
+
+    The calls are run in tasks and the slower one is cancelled.
+    """
+    clock = hedge.clock
+
+    async def timed(*args, **kwargs):
+        start = clock()
+        result = await fn(*args, **kwargs)
+        hedge.record(clock() - start)
+        return result
+
+    async def inner(*args, **kwargs):
+        delay = hedge.get_delay()
+        if delay is None:
+            return await timed(*args, **kwargs)
+        primary = asyncio.ensure_future(timed(*args, **kwargs))
+        tasks = [primary]
+        try:
+            done, pending = await asyncio.wait(tasks, timeout=delay)
+            if done or not hedge.acquire():
+                return await primary
+            try:
+                second = asyncio.ensure_future(timed(*args, **kwargs))
+                tasks.append(second)
+                pending = set(tasks)
+                while pending:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.exception() is None:
+                            if task is second:
+                                hedge.win()
+                            return task.result()
+                # both have failed
+                return primary.result()
+            finally:
+                hedge.release()
+        finally:
+            # cancel the slower call (or both if the caller is cancelled)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    return inner
+
+
+def build_coroutine_scope_wrapper(scope, fn):
+    """
+    Build a coroutine function which await :attr:`fn` in the scope
+
+    See :class:`tolerance.scopes.Scope`.
+    """
+    async def inner(*args, **kwargs):
+        token = SCOPE.set(scope)
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            SCOPE.reset(token)
+    return inner
+
+
+def _is_awaitable(x):
+    return hasattr(x, '__await__')
+
+
+def build_async_bulkhead(bulkhead, fn):
+    """
+    Build a coroutine function which await the coroutine function in a slot
+    of :class:`tolerance.bulkheads.Bulkhead`
+
+    Tasks wait in the queue with a future of the running event loop.
+    """
+    from tolerance.bulkheads import BulkheadFull
+    queue_timeout = bulkhead.queue_timeout
+    if hasattr(asyncio, 'get_running_loop'):
+        get_running_loop = asyncio.get_running_loop
+    else:
+        # asyncio.get_running_loop was introduced from Python 3.7
+        get_running_loop = asyncio.get_event_loop
+
+    async def inner(*args, **kwargs):
+        waiter = bulkhead.reserve(get_running_loop())
+        if waiter is False:
+            raise BulkheadFull('the bulkhead is full')
+        elif waiter is not True:
+            try:
+                await asyncio.wait((waiter.future,), timeout=queue_timeout)
+            except BaseException:
+                # cancelled while waiting; release the slot if it has been
+                # handed over already
+                if bulkhead.settle(waiter):
+                    bulkhead.release()
+                raise
+            if not bulkhead.settle(waiter):
+                raise BulkheadFull('the bulkhead is full')
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            bulkhead.release()
+    return inner
@@ -5,15 +5,34 @@ tolerance decorator module
 __author__ = 'Alisue <lambdalisue@hashnote.net>'
 import sys
 from tolerance.utils import argument_switch_generator
+from tolerance.utils import is_argument_switch
+from tolerance.utils import is_signature_switch
+from tolerance.utils import bind_switch
+from tolerance.utils import ExceptionDispatcher
+from tolerance.utils import MATCH_MODES
+from tolerance.utils import is_coroutine_function
+from tolerance.utils import is_async_generator_function
+from tolerance.utils import as_substitute_function
+from tolerance.utils import ContextVar
+from tolerance.policies import build_policy_caller
+from tolerance.policies import build_bypass_hook
+from tolerance.policies import Rejected
 from tolerance.functional import wraps
 
 
 DEFAULT_TOLERATE_SWITCH = argument_switch_generator('fail_silently')
 """Default tolerate switch function"""
 
+ITERATION_POLICIES = (None, 'skip', 'substitute')
+"""Available policies for exceptions raised while iterating"""
+
 
 def tolerate(substitute=None, exceptions=None,
-             switch=DEFAULT_TOLERATE_SWITCH):
+             switch=DEFAULT_TOLERATE_SWITCH, match='exact',
+             iteration=None, resume=True, cache=None,
+             breaker=None, retry=None, timeout=None, hedge=None,
+             metrics=None, on_error=None, stale=None, max_concurrency=None,
+             rate_limit=None, policy=None):
     """
     A function decorator which makes a function fail silently
 
@@ -21,6 +40,8 @@ def tolerate(substitute=None, exceptions=None,
     ``fail_silently=False``.
     To disable fail silenlty in decorated functions globally, specify
     ``tolerate.disabled``.
+    To enable or disable it in the current context (thread or asynchronous
+    task) only, use ``tolerate.scope`` (:class:`tolerance.scopes.Scope`).
 
     Parameters
     ----------
@@ -29,10 +50,14 @@ def tolerate(substitute=None, exceptions=None,
     substitute : function or returning value
         A function used instead of :attr:`fn` or returning value
         when :attr:`fn` failed.
-    exceptions : list of exceptions or None
+    exceptions : list of exceptions, dict, or None
         A list of exception classes or None.
         If exceptions is specified, ignore exceptions only listed in this
         parameter and raise exception if the exception is not listed.
+
+        **From Version 0.2.0**, a dict which map an exception class to a
+        substitute (function or returning value) can be specified to use a
+        different substitute for each exception class.
     switch : string, list/tuple, dict, function or None
         A switch function which determine whether silent the function failar.
         The function receive ``*args`` and ``**kwargs`` which will specified
@@ -55,6 +80,124 @@ def tolerate(substitute=None, exceptions=None,
         If dict is specified, the switch generator will be called as
         ``argument_switch_generator(**switch)``.
 
+        **From Version 0.2.0**, a switch function made by
+        :func:`tolerance.utils.signature_switch_generator` is bound to the
+        signature of :attr:`fn` so the argument which is a parameter of
+        :attr:`fn` can be specified positionally or as a keyword-only
+        argument.
+
+        **From Version 0.2.0**, coroutine functions and asynchronous
+        generator functions (Python 3.5 or later) are decorated with native
+        asynchronous wrappers. The substitute function of them can be a
+        coroutine function as well.
+        An asynchronous generator cannot be resumed once it raised so the
+        substitute is yielded instead of the failed item and the iteration
+        stops.
+    match : string
+        A mode used to find exceptions in :attr:`exceptions`.
+        If ``'exact'`` is specified (default), only exceptions whose class is
+        exactly listed are ignored.
+        If ``'subclass'`` is specified, instances of subclasses of the listed
+        classes are ignored as well and the substitute of the nearest class in
+        the MRO is used.
+        The result is cached for each exception class so the matching cost a
+        single dict lookup after the first failure.
+    iteration : None, 'skip', or 'substitute'
+        A policy for exceptions raised while iterating the iterable (e.g. a
+        generator) returned from :attr:`fn`.
+        If ``None`` is specified (default), the returned iterable is not
+        touched (asynchronous generators yield the substitute and stop).
+        If ``'skip'`` is specified, failed items are skipped.
+        If ``'substitute'`` is specified, the substitute is yielded instead
+        of failed items. The substitute function receives the arguments of
+        :attr:`fn`.
+        The returned iterable is wrapped lazily so it is iterated item by
+        item with constant memory.
+    resume : boolean or integer
+        Whether the iteration is resumed after failed items when
+        :attr:`iteration` is specified.
+        If an integer is specified, the iteration stops when the number of
+        consecutive failures exceeds it.
+        Note that a generator cannot be resumed once it raised so the
+        iteration of a generator always stops after a failure; iterators like
+        ``csv.reader`` can be resumed.
+    cache : :class:`tolerance.caches.FailureCache` or None
+        A cache which remember arguments of failed calls to return the
+        substitute without calling :attr:`fn` for them while they are
+        remembered (see :class:`tolerance.caches.FailureCache`).
+    breaker : :class:`tolerance.breakers.CircuitBreaker` or None
+        A circuit breaker which stop calling :attr:`fn` and use the
+        substitute while :attr:`fn` has been failing (see
+        :class:`tolerance.breakers.CircuitBreaker`).
+    retry : :class:`tolerance.retries.Retry` or None
+        A retry policy which call :attr:`fn` again with backoff when it
+        failed with an ignored exception. The substitute is used when
+        retries are exhausted (see :class:`tolerance.retries.Retry`).
+    timeout : number, :class:`tolerance.timeouts.Timeout`, or None
+        A number of seconds (or a timeout policy) after which the substitute
+        is returned when :attr:`fn` has not returned yet. Synchronous
+        functions are called in a reusable thread pool and coroutine
+        functions are cancelled (see :class:`tolerance.timeouts.Timeout`).
+    hedge : :class:`tolerance.hedges.Hedge` or None
+        A hedging policy which start a backup call when :attr:`fn` has not
+        returned within a delay or a latency percentile and take whichever
+        succeeds first (see :class:`tolerance.hedges.Hedge`).
+    metrics : ``True``, :class:`tolerance.metrics.Registry`, or None
+        Metrics which record calls, successes, substitutions, and latencies
+        of :attr:`fn`. If ``True`` or a registry is specified, the metrics
+        are registered to :data:`tolerance.metrics.REGISTRY` or the registry
+        with the dotted name of :attr:`fn`. An instance of
+        :class:`tolerance.metrics.Metrics` can be specified as well.
+    on_error : function or None
+        A function called with ``exc_type``, ``exc_value``, and
+        ``traceback`` (like ``sys.excepthook``) when the substitute is used
+        for an exception raised from :attr:`fn`. Use
+        :class:`tolerance.errors.ErrorSampler` to record swallowed
+        exceptions de-duplicated by the type and the location with sampled
+        tracebacks. The exception info keeps frames of the failed call
+        alive so keep :func:`tolerance.errors.capture_failure` of it
+        instead of the exception info.
+    stale : :class:`tolerance.caches.StaleCache` or None
+        A cache which remember the last result of successful calls for each
+        arguments and return it instead of the substitute when :attr:`fn`
+        failed (or the call is rejected by policies like :attr:`breaker`)
+        with the same arguments (see :class:`tolerance.caches.StaleCache`).
+    max_concurrency : integer, :class:`tolerance.bulkheads.Bulkhead`, or None
+        A maximum number of concurrent calls (or a bulkhead) over which the
+        substitute is returned immediately without calling :attr:`fn`.
+        Use :class:`tolerance.bulkheads.Bulkhead` to let calls wait in a
+        bounded queue or to share the limit between functions, or
+        :class:`tolerance.bulkheads.AdaptiveLimit` to adjust the limit from
+        the observed latency. Threads and asynchronous tasks are supported
+        (see :class:`tolerance.bulkheads.Bulkhead`).
+    rate_limit : number, :class:`tolerance.limiters.TokenBucket`, or None
+        A number of calls per second (or a token bucket) over which the
+        substitute is returned without calling :attr:`fn` instead of
+        queuing the call (see :class:`tolerance.limiters.TokenBucket`).
+    policy : string, :class:`tolerance.registries.NamedPolicy`, or None
+        A name of a policy in :data:`tolerance.registries.REGISTRY` (or a
+        named policy of another registry) which provide the substitute, the
+        exceptions, the match mode, and whether failures are ignored instead
+        of :attr:`substitute`, :attr:`exceptions`, and :attr:`match`. They
+        can be changed without a redeploy by reloading the registry from a
+        JSON, TOML, or INI file which is checked by the modification time on
+        failures (see :class:`tolerance.registries.PolicyRegistry`).
+
+        Policies (:attr:`cache`, :attr:`breaker`, :attr:`retry`,
+        :attr:`timeout`, and :attr:`hedge`) are applied in the order above
+        except that each attempt of :attr:`retry` is hedged, :attr:`metrics`
+        and :attr:`stale` are the outermost, :attr:`rate_limit` is applied
+        after :attr:`breaker`, :attr:`max_concurrency` is applied between
+        :attr:`timeout` and :attr:`retry` (an adaptive limit is applied
+        after :attr:`rate_limit`), and
+        :attr:`on_error` is called once after :attr:`retry` has exhausted;
+        e.g. a circuit breaker counts a call whose retries are exhausted as a
+        single failure and the timeout limits the call including retries.
+        The substitute of ``tolerate`` is used for calls rejected by
+        policies (e.g. :class:`tolerance.timeouts.TimedOut`) unless they are
+        listed in :attr:`exceptions`.
+        They cannot be used with :attr:`iteration` or asynchronous generator
+        functions and are not used by ``tolerate.map`` and ``tolerate.imap``.
 
     Returns
     -------
@@ -168,28 +311,132 @@ def tolerate(substitute=None, exceptions=None,
     Traceback (most recent call last):
         ...
     ValueError: ...
+    >>> #
+    >>> # Features from Version 0.2.0
+    >>> #
+    >>> # use a different substitute for each exception (and subclasses)
+    >>> @tolerate(exceptions={LookupError: 'missing', TypeError: 'invalid'},
+    ...           match='subclass')
+    ... def get(x, key):
+    ...     return x[key]
+    >>> get({}, 'foo'), get([], 0), get(None, 'foo')
+    ('missing', 'missing', 'invalid')
+    >>> # policies are specified as arguments, see the modules of them
+    >>> from tolerance.breakers import CircuitBreaker
+    >>> @tolerate('unavailable', breaker=CircuitBreaker(), rate_limit=100)
+    ... def fetch(url):
+    ...     raise IOError
+    >>> fetch('http://example.com/')
+    'unavailable'
     """
+    if policy is not None:
+        if substitute is not None or exceptions is not None or \
+                match != 'exact':
+            raise ValueError('substitute, exceptions, and match cannot be '
+                             'used with policy')
+        if isinstance(policy, basestring):
+            from tolerance.registries import REGISTRY
+            policy = REGISTRY.get(policy)
+    if timeout is not None and not hasattr(timeout, 'wrap'):
+        from tolerance.timeouts import Timeout
+        timeout = Timeout(timeout)
+    limit = None
+    if hasattr(max_concurrency, 'before'):
+        # adaptive limits are policies which measure the whole call
+        limit, max_concurrency = max_concurrency, None
+    elif max_concurrency is not None and \
+            not hasattr(max_concurrency, 'wrap'):
+        from tolerance.bulkheads import Bulkhead
+        max_concurrency = Bulkhead(max_concurrency)
+    if rate_limit is not None and not hasattr(rate_limit, 'before'):
+        from tolerance.limiters import TokenBucket
+        rate_limit = TokenBucket(rate_limit)
+    policies = [x for x in (stale, cache, breaker, rate_limit, limit)
+                if x is not None]
+    if on_error is not None:
+        from tolerance.errors import ErrorHook
+        policies.append(ErrorHook(on_error))
+    # executors are listed from the innermost
+    executors = [x for x in (hedge, retry, max_concurrency, timeout)
+                 if x is not None]
+
+    if metrics is False:
+        metrics = None
+
     def decorator(fn):
-        @wraps(fn)
-        def inner(*args, **kwargs):
-            if getattr(tolerate, 'disabled', False):
-                # the function has disabled so call normally.
-                return fn(*args, **kwargs)
-            if switch is not None:
-                status, args, kwargs = switch(*args, **kwargs)
-                if not status:
-                    # the switch function return `False` so call noramlly.
-                    return fn(*args, **kwargs)
-            try:
-                return fn(*args, **kwargs)
-            except:
-                e = sys.exc_info()[1]
-                if exceptions is None or e.__class__ in exceptions:
-                    if _is_callable(substitute):
-                        return substitute(*args, **kwargs)
-                    return substitute
-                raise e
+        # a switch made by `signature_switch_generator` is bound to the
+        # signature of the function
+        bound = bind_switch(switch, fn)
+        if metrics is not None:
+            from tolerance.metrics import get_metrics
+            # metrics are the outermost to count rejections by policies
+            return _decorate_with_policies(
+                fn, substitute, exceptions, match, bound,
+                [get_metrics(metrics, fn)] + policies, executors, policy)
+        if policies or executors:
+            return _decorate_with_policies(fn, substitute, exceptions, match,
+                                           bound, policies, executors, policy)
+        if policy is not None:
+            # the configuration is resolved on each failure
+            handle = policy.handle
+        elif iteration == 'skip':
+            # substitutes are never used so only exceptions are matched
+            if isinstance(exceptions, dict):
+                handle = _build_failure_handler(None, list(exceptions), match)
+            else:
+                handle = _build_failure_handler(None, exceptions, match)
+        else:
+            handle = _build_failure_handler(substitute, exceptions, match)
+        if is_coroutine_function(fn):
+            from tolerance.coroutines import build_coroutine_wrapper
+            return _wraps(fn, build_coroutine_wrapper(fn, handle, bound))
+        elif is_async_generator_function(fn):
+            from tolerance.coroutines import build_async_generator_wrapper
+            if iteration is None:
+                return _wraps(fn, build_async_generator_wrapper(
+                    fn, handle, bound, False, False))
+            return _wraps(fn, build_async_generator_wrapper(
+                fn, handle, bound, iteration == 'skip', resume))
+        elif iteration is not None:
+            return _wraps(fn, _build_iteration_wrapper(
+                fn, handle, bound, iteration == 'skip', resume))
+        inner = wraps(fn)(_build_wrapper(fn, handle, bound))
+        inner.__tolerance__ = Configuration(fn, handle, bound)
         return inner
+    if match not in MATCH_MODES:
+        raise ValueError('match should be one of %s but %r is specified'
+                         % (', '.join(MATCH_MODES), match))
+    if iteration not in ITERATION_POLICIES:
+        raise ValueError('iteration should be one of %s but %r is specified'
+                         % (', '.join(map(repr, ITERATION_POLICIES)),
+                            iteration))
+    if (policies or executors or metrics is not None) and \
+            iteration is not None:
+        raise ValueError('iteration cannot be used with policies (e.g. '
+                         'cache)')
+    switch = normalize_switch(switch)
+    return decorator
+tolerate.disabled = False
+
+SCOPE = ContextVar('tolerance.scope', default=tolerate)
+"""A context variable of the current :class:`tolerance.scopes.Scope`"""
+
+get_scope = SCOPE.get
+"""
+Return the current scope; an object which has ``disabled`` attribute
+
+``tolerate`` itself is returned out of scopes so ``tolerate.disabled`` is
+used. Tolerant functions check ``get_scope().disabled`` on each call.
+"""
+
+
+def normalize_switch(switch):
+    """
+    Return a switch function of the switch specified to ``tolerate``
+
+    An argument switch is created if a string, a list, or a dict is
+    specified.
+    """
     if switch:
         # create argument switch if switch is string or list or dict
         if isinstance(switch, basestring):
@@ -198,7 +445,412 @@ def tolerate(substitute=None, exceptions=None,
             switch = argument_switch_generator(*switch)
         elif isinstance(switch, dict):
             switch = argument_switch_generator(**switch)
-    return decorator
+    return switch
+
+
+def _wraps(fn, inner):
+    """
+    Update :attr:`inner` to look like :attr:`fn` without ``__tolerance__``
+
+    ``wraps`` copies ``__dict__`` of :attr:`fn` so a wrapper of a tolerant
+    function would have the configuration of the inner wrapper and APIs
+    like ``tolerate.map`` would skip the outer one.
+    """
+    inner = wraps(fn)(inner)
+    inner.__dict__.pop('__tolerance__', None)
+    return inner
+
+
+def _decorate_with_policies(fn, substitute, exceptions, match, switch,
+                            policies, executors, policy=None):
+    """
+    Decorate :attr:`fn` with a wrapper which apply the policies
+
+    :attr:`executors` are policies which wrap the call of :attr:`fn` (e.g.
+    retry) with ``wrap`` or ``wrap_async`` method.
+    Substitutes are resolved by :attr:`policy`
+    (:class:`tolerance.registries.NamedPolicy`) if it is specified.
+    """
+    if policy is not None:
+        resolve, default = policy.resolve, policy.default
+    else:
+        resolve, default = _build_resolver(substitute, exceptions, match)
+    if is_coroutine_function(fn):
+        from tolerance.coroutines import build_coroutine_policy_wrapper
+        executed = fn
+        for executor in executors:
+            executed = executor.wrap_async(executed, resolve)
+        return _wraps(fn, build_coroutine_policy_wrapper(
+            fn, executed, policies, resolve, default, switch))
+    elif is_async_generator_function(fn):
+        raise ValueError('policies (e.g. cache) cannot be used with '
+                         'asynchronous generator functions')
+    executed = fn
+    for executor in executors:
+        executed = executor.wrap(executed, resolve)
+    if policy is not None:
+        handle = policy.handle
+    elif exceptions is None:
+        handle = _build_failure_handler(substitute, exceptions, match)
+    else:
+        def handle(args, kwargs):
+            substitute = resolve(sys.exc_info()[0])
+            if substitute is None:
+                raise
+            return substitute(*args, **kwargs)
+    if policies:
+        call = build_policy_caller(executed, policies, resolve, default)
+        inner = wraps(fn)(_build_policy_wrapper(
+            fn, call, switch, build_bypass_hook(policies)))
+    else:
+        inner = wraps(fn)(_build_wrapper(fn, handle, switch, executed))
+    inner.__tolerance__ = Configuration(fn, handle, switch, policies)
+    return inner
+
+
+class Configuration(object):
+    """
+    A configuration of a tolerant function settled at decoration time
+
+    It is available as ``__tolerance__`` attribute of (synchronous) tolerant
+    functions and used by APIs which call the function in bulk, like
+    :func:`tolerance.batch.tolerant_map`, to resolve the configuration once.
+
+    Attributes
+    ----------
+    fn : function
+        A decorated function.
+    handle : function
+        A function which receives ``args`` and ``kwargs`` of the failed call
+        in ``except`` clause and return the substitute or re-raise the
+        exception.
+    switch : function or None
+        A switch function.
+    policies : tuple of :class:`tolerance.policies.Policy`
+        Policies applied to each call (e.g. ``cache``). APIs which call the
+        function in bulk do not apply them.
+    """
+    __slots__ = ('fn', 'handle', 'switch', 'policies')
+
+    def __init__(self, fn, handle, switch, policies=()):
+        self.fn = fn
+        self.handle = handle
+        self.switch = switch
+        self.policies = tuple(policies)
+
+    def is_tolerant(self, *args, **kwargs):
+        """
+        Return whether the call with the arguments is tolerant or not
+        """
+        if get_scope().disabled:
+            return False
+        if self.switch is None:
+            return True
+        return self.switch(*args, **kwargs)[0]
+
+
+def get_configuration(fn):
+    """
+    Return :class:`Configuration` of the tolerant function
+
+    A non tolerant function is decorated by ``tolerate()`` first.
+    """
+    configuration = getattr(fn, '__tolerance__', None)
+    if configuration is None:
+        configuration = getattr(tolerate()(fn), '__tolerance__', None)
+    if configuration is None:
+        raise TypeError('%r is not a synchronous function' % fn)
+    return configuration
+
+
+def _build_wrapper(fn, handle, switch, executed=None):
+    """
+    Build a wrapper function of :attr:`fn` specialized for the configuration
+
+    What kind of switch is used never change after decoration so it is
+    settled here and the returned wrapper only does the work required by
+    the configuration in each call.
+    Failures are delegated to :attr:`handle` built by
+    :func:`_build_failure_handler`.
+    :attr:`executed` (:attr:`fn` wrapped by executors like retry) is called
+    instead of :attr:`fn` when the call is tolerant.
+    """
+    if executed is None:
+        executed = fn
+    if switch is None:
+        def inner(*args, **kwargs):
+            if get_scope().disabled:
+                # the function has disabled so call normally.
+                return fn(*args, **kwargs)
+            try:
+                return executed(*args, **kwargs)
+            except:
+                return handle(args, kwargs)
+    elif is_argument_switch(switch):
+        # inline the switch function made by `argument_switch_generator`
+        argument_name = switch.argument_name
+        default = switch.default
+        reverse = switch.reverse
+        keep = switch.keep
+
+        def inner(*args, **kwargs):
+            if get_scope().disabled:
+                # the function has disabled so call normally.
+                return fn(*args, **kwargs)
+            if argument_name in kwargs:
+                if keep:
+                    status = kwargs[argument_name]
+                else:
+                    status = kwargs.pop(argument_name)
+                if bool(status) is reverse:
+                    # the switch is turned off so call normally.
+                    return fn(*args, **kwargs)
+            elif not default:
+                # the switch is turned off so call normally.
+                return fn(*args, **kwargs)
+            try:
+                return executed(*args, **kwargs)
+            except:
+                return handle(args, kwargs)
+    elif is_signature_switch(switch):
+        # inline the switch function bound by `signature_switch_generator`
+        argument_name = switch.argument_name
+        index = switch.position
+        if index is None:
+            # keyword-only arguments are never found in args
+            index = sys.maxsize
+        default = switch.default
+        reverse = switch.reverse
+
+        def inner(*args, **kwargs):
+            if get_scope().disabled:
+                # the function has disabled so call normally.
+                return fn(*args, **kwargs)
+            if len(args) > index:
+                if bool(args[index]) is reverse:
+                    # the switch is turned off so call normally.
+                    return fn(*args, **kwargs)
+            elif argument_name in kwargs:
+                if bool(kwargs[argument_name]) is reverse:
+                    # the switch is turned off so call normally.
+                    return fn(*args, **kwargs)
+            elif not default:
+                # the switch is turned off so call normally.
+                return fn(*args, **kwargs)
+            try:
+                return executed(*args, **kwargs)
+            except:
+                return handle(args, kwargs)
+    else:
+        def inner(*args, **kwargs):
+            if get_scope().disabled:
+                # the function has disabled so call normally.
+                return fn(*args, **kwargs)
+            status, args, kwargs = switch(*args, **kwargs)
+            if not status:
+                # the switch function return `False` so call noramlly.
+                return fn(*args, **kwargs)
+            try:
+                return executed(*args, **kwargs)
+            except:
+                return handle(args, kwargs)
+    return inner
+
+
+def _build_policy_wrapper(fn, call, switch, bypassed=None):
+    """
+    Build a wrapper function which call :attr:`fn` with policies
+
+    :attr:`call` is built by :func:`tolerance.policies.build_policy_caller`
+    and used only when the call is tolerant. Otherwise :attr:`bypassed`
+    built by :func:`tolerance.policies.build_bypass_hook` is called.
+    """
+    if bypassed is None:
+        direct = fn
+    else:
+        def direct(*args, **kwargs):
+            bypassed()
+            return fn(*args, **kwargs)
+    if is_argument_switch(switch):
+        # inline the switch function as well as `_build_wrapper`
+        argument_name = switch.argument_name
+        default = switch.default
+        reverse = switch.reverse
+        keep = switch.keep
+
+        def inner(*args, **kwargs):
+            if get_scope().disabled:
+                # the function has disabled so call normally.
+                return direct(*args, **kwargs)
+            if argument_name in kwargs:
+                if keep:
+                    status = kwargs[argument_name]
+                else:
+                    status = kwargs.pop(argument_name)
+                if bool(status) is reverse:
+                    # the switch is turned off so call normally.
+                    return direct(*args, **kwargs)
+            elif not default:
+                # the switch is turned off so call normally.
+                return direct(*args, **kwargs)
+            return call(args, kwargs)
+    elif is_signature_switch(switch):
+        # inline the switch function as well as `_build_wrapper`
+        argument_name = switch.argument_name
+        index = switch.position
+        if index is None:
+            index = sys.maxsize
+        default = switch.default
+        reverse = switch.reverse
+
+        def inner(*args, **kwargs):
+            if get_scope().disabled:
+                # the function has disabled so call normally.
+                return direct(*args, **kwargs)
+            if len(args) > index:
+                if bool(args[index]) is reverse:
+                    # the switch is turned off so call normally.
+                    return direct(*args, **kwargs)
+            elif argument_name in kwargs:
+                if bool(kwargs[argument_name]) is reverse:
+                    # the switch is turned off so call normally.
+                    return direct(*args, **kwargs)
+            elif not default:
+                # the switch is turned off so call normally.
+                return direct(*args, **kwargs)
+            return call(args, kwargs)
+    else:
+        def inner(*args, **kwargs):
+            if get_scope().disabled:
+                # the function has disabled so call normally.
+                return direct(*args, **kwargs)
+            if switch is not None:
+                status, args, kwargs = switch(*args, **kwargs)
+                if not status:
+                    # the switch function return `False` so call noramlly.
+                    return direct(*args, **kwargs)
+            return call(args, kwargs)
+    return inner
+
+
+def _build_iteration_wrapper(fn, handle, switch, skip, resume):
+    """
+    Build a wrapper function which wraps the iterable returned from :attr:`fn`
+
+    Failures in the call of :attr:`fn` are treated as a failure of the first
+    item.
+    """
+    def inner(*args, **kwargs):
+        if get_scope().disabled:
+            # the function has disabled so call normally.
+            return fn(*args, **kwargs)
+        if switch is not None:
+            status, args, kwargs = switch(*args, **kwargs)
+            if not status:
+                # the switch function return `False` so call noramlly.
+                return fn(*args, **kwargs)
+        try:
+            iterator = iter(fn(*args, **kwargs))
+        except:
+            if skip:
+                handle(args, kwargs)
+                return iter(())
+            return iter((handle(args, kwargs),))
+        return _iterate(iterator, handle, args, kwargs, skip, resume)
+    return inner
+
+
+def _iterate(iterator, handle, args, kwargs, skip, resume):
+    # True is an instance of int so check it first
+    limit = None if resume is True else int(resume)
+    failures = 0
+    try:
+        while True:
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            except:
+                item = handle(args, kwargs)
+                failures += 1
+            else:
+                failures = 0
+                yield item
+                continue
+            if not skip:
+                yield item
+            if limit is not None and failures > limit:
+                return
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            close()
+
+
+def _build_failure_handler(substitute, exceptions, match):
+    """
+    Build a function called in ``except`` clause of the wrapper function
+
+    The function receives ``args`` and ``kwargs`` of the failed call and
+    return the substitute or re-raise the exception currently handled.
+    Whether the substitute is callable and which exceptions are ignored are
+    settled here.
+    """
+    if exceptions is not None:
+        dispatch = ExceptionDispatcher(exceptions, substitute, match)
+
+        def handle(args, kwargs):
+            substitute = dispatch[sys.exc_info()[0]]
+            if substitute is None:
+                raise
+            return substitute(*args, **kwargs)
+    elif _is_callable(substitute):
+        def handle(args, kwargs):
+            return substitute(*args, **kwargs)
+    else:
+        def handle(args, kwargs):
+            return substitute
+    return handle
+
+
+def _build_resolver(substitute, exceptions, match):
+    """
+    Build a function which resolve a substitute function of an exception
+
+    The function receives an exception class and return a substitute
+    function or ``None`` if the exception should not be ignored. Rejections
+    by policies which are not listed in :attr:`exceptions` are resolved to
+    the default substitute function returned as well.
+    """
+    default = as_substitute_function(substitute)
+    if exceptions is None:
+        def resolve(cls):
+            return default
+    else:
+        dispatch = ExceptionDispatcher(exceptions, substitute, match)
+
+        def resolve(cls):
+            substitute = dispatch[cls]
+            if substitute is None and issubclass(cls, Rejected):
+                # rejections by policies which are not listed
+                return default
+            return substitute
+    return resolve, default
+
+
+def _import_lazily(module, name):
+    """
+    Return a function which call the function of the module
+
+    The module is imported at the first call.
+    """
+    def inner(*args, **kwargs):
+        # importlib was introduced from Python 2.7
+        __import__(module)
+        return getattr(sys.modules[module], name)(*args, **kwargs)
+    inner.__name__ = name
+    inner.__doc__ = 'See :func:`%s.%s`.' % (module, name)
+    return inner
 
 
 # callable alternative because callable is removed in python 3
@@ -206,6 +858,21 @@ def _is_callable(x):
     return hasattr(x, '__call__')
 
 
+# batch APIs which use the configuration above
+from tolerance.batch import tolerant_map
+from tolerance.batch import tolerant_imap
+tolerate.map = tolerant_map
+tolerate.imap = tolerant_imap
+from tolerance.vectorize import tolerant_vectorize
+tolerate.vectorize = tolerant_vectorize
+from tolerance.scopes import Scope
+tolerate.scope = Scope
+# tolerance.wrappers is imported at the first call to keep `import tolerance`
+# cheap
+tolerate.slotted = _import_lazily('tolerance.wrappers', 'slotted')
+tolerate.all = _import_lazily('tolerance.wrappers', 'tolerate_all')
+
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod()
@@ -0,0 +1,272 @@
+# coding=utf-8
+"""
+tolerance error module
+
+Hooks which record exceptions swallowed by tolerant functions (see
+``on_error`` of :func:`tolerance.decorators.tolerate`) and a memory-safe
+representation of failures.
+
+An exception instance refers to its traceback which refers to every frame
+between the wrapper and the raising code and all their local variables, so
+keeping swallowed exceptions (or ``sys.exc_info()``) keeps them alive.
+Keep :class:`Failure` instead.
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import sys
+import threading
+import traceback
+from collections import OrderedDict
+from tolerance.policies import Policy
+from tolerance.utils import get_class_name
+from tolerance.utils import move_to_end
+
+
+class Failure(object):
+    """
+    A memory-safe representation of a failure
+
+    It keeps the exception class, the message, and the location which
+    raised the exception (see :func:`get_fingerprint`) but neither the
+    exception instance nor the traceback, so it does not keep frames and
+    their local variables alive. Use :func:`capture_failure` to create it.
+
+    Attributes
+    ----------
+    type : class
+        An exception class.
+    message : string
+        A message of the exception (``str`` of the instance).
+    filename : string or None
+        A filename of the code which raised the exception.
+    lineno : integer or None
+        A line number which raised the exception.
+    name : string or None
+        A name of the function which raised the exception.
+    """
+    __slots__ = ('type', 'message', 'filename', 'lineno', 'name')
+
+    def __init__(self, type, message='', filename=None, lineno=None,
+                 name=None):
+        self.type = type
+        self.message = message
+        self.filename = filename
+        self.lineno = lineno
+        self.name = name
+
+    @property
+    def fingerprint(self):
+        """
+        A fingerprint of the failure (see :func:`get_fingerprint`)
+        """
+        return (self.type, self.filename, self.lineno, self.name)
+
+    def __repr__(self):
+        return '<Failure: %s>' % self
+
+    def __str__(self):
+        text = get_class_name(self.type)
+        if self.message:
+            text = '%s: %s' % (text, self.message)
+        if self.filename is not None:
+            text = '%s (%s:%s in %s)' % (text, self.filename, self.lineno,
+                                         self.name)
+        return text
+
+
+def capture_failure(exc_info=None):
+    """
+    Return :class:`Failure` of the exception info
+
+    ``sys.exc_info()`` (the exception currently handled) is used if
+    :attr:`exc_info` is not specified.
+
+    Examples
+    --------
+    >>> def fail():
+    ...     raise KeyError('foo')
+    >>> try:
+    ...     fail()
+    ... except KeyError:
+    ...     failure = capture_failure()
+    >>> failure.type is KeyError, failure.message, failure.name
+    (True, "'foo'", 'fail')
+    """
+    exc_type, exc_value, tb = exc_info or sys.exc_info()
+    fingerprint = get_fingerprint(exc_type, tb)
+    return Failure(exc_type, _get_message(exc_value), *fingerprint[1:])
+
+
+def _get_message(exc_value):
+    if exc_value is None:
+        return ''
+    try:
+        return str(exc_value)
+    except Exception:
+        return '<unprintable %s object>' % type(exc_value).__name__
+
+
+def get_fingerprint(exc_type, tb):
+    """
+    Return a fingerprint of the failure; the exception class and the location
+
+    The location is a tuple of the filename, the line number, and the name
+    of the function which raised the exception (the innermost frame of the
+    traceback).
+
+    Examples
+    --------
+    >>> import sys
+    >>> def fail():
+    ...     raise KeyError
+    >>> try:
+    ...     fail()
+    ... except KeyError:
+    ...     exc_type, exc_value, tb = sys.exc_info()
+    >>> fingerprint = get_fingerprint(exc_type, tb)
+    >>> fingerprint[0] is KeyError, fingerprint[3]
+    (True, 'fail')
+    """
+    if tb is None:
+        return (exc_type, None, None, None)
+    while tb.tb_next is not None:
+        tb = tb.tb_next
+    code = tb.tb_frame.f_code
+    return (exc_type, code.co_filename, tb.tb_lineno, code.co_name)
+
+
+class ErrorSampler(object):
+    """
+    A hook which record swallowed exceptions de-duplicated by fingerprints
+
+    Failures are grouped by the fingerprint (see :func:`get_fingerprint`)
+    and counted. The traceback is formatted only for the first occurrence of
+    each fingerprint and every ``round(1 / sample)``-th occurrence after
+    that, and passed to :attr:`report` if specified. Only the formatted
+    traceback and :class:`Failure` of the last captured occurrence are
+    kept so exceptions and frames are not kept alive. Fingerprints are
+    evicted in LRU order when the number exceeds :attr:`maxsize`.
+    It is thread-safe.
+
+    Specify an instance to ``on_error`` of
+    :func:`tolerance.decorators.tolerate`. The instance can be shared
+    between functions.
+
+    Parameters
+    ----------
+    sample : float
+        A rate (0.0 - 1.0) of following occurrences whose traceback is
+        formatted. ``0`` to format only the first occurrence.
+    maxsize : integer
+        A maximum number of remembered fingerprints.
+    report : function or None
+        A function which receive the fingerprint, the number of occurrences,
+        and the formatted traceback (string) when the traceback is captured
+        (e.g. to log it).
+
+    Examples
+    --------
+    >>> from tolerance.decorators import tolerate
+    >>> reports = []
+    >>> sampler = ErrorSampler(sample=0.5,
+    ...                        report=lambda *x: reports.append(x))
+    >>> parse_int = tolerate(on_error=sampler)(int)
+    >>> for i in range(5):
+    ...     parse_int('zero')
+    >>> [count for fingerprint, count, text in reports]
+    [1, 3, 5]
+    >>> error, = sampler.snapshot()
+    >>> error['type'], error['count']
+    ('ValueError', 5)
+    >>> error['failure']
+    <Failure: ValueError: invalid literal for int() with base 10: 'zero'...>
+    >>> print(error['traceback'])
+    Traceback (most recent call last):
+    ...
+    ValueError: invalid literal for int() with base 10: 'zero'
+    """
+    def __init__(self, sample=0.01, maxsize=1024, report=None):
+        if not 0 <= sample <= 1:
+            raise ValueError('sample should be in [0, 1] but %r is specified'
+                             % sample)
+        if maxsize < 1:
+            raise ValueError('maxsize should be a positive integer but %r is '
+                             'specified' % maxsize)
+        self.sample = sample
+        self.maxsize = maxsize
+        self.report = report
+        self._period = max(1, int(round(1.0 / sample))) if sample else None
+        # fingerprint -> [count, the last captured failure and traceback]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __call__(self, exc_type, exc_value, tb):
+        fingerprint = get_fingerprint(exc_type, tb)
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                entry = self._entries[fingerprint] = [0, None, None]
+                if len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+            else:
+                move_to_end(self._entries, fingerprint)
+            entry[0] += 1
+            count = entry[0]
+        if count > 1 and (self._period is None or
+                          (count - 1) % self._period):
+            return
+        # the traceback is formatted to a string so it does not keep frames
+        text = ''.join(traceback.format_exception(exc_type, exc_value, tb))
+        entry[1] = Failure(exc_type, _get_message(exc_value),
+                           *fingerprint[1:])
+        entry[2] = text
+        if self.report is not None:
+            self.report(fingerprint, count, text)
+
+    def snapshot(self):
+        """
+        Return a list of dicts of recorded failures in LRU order
+
+        Each dict has ``type`` (the qualified class name), ``filename``,
+        ``lineno``, ``name`` (of the function raised), ``count``, and
+        ``failure`` (:class:`Failure`) and ``traceback`` of the last
+        captured occurrence.
+        """
+        with self._lock:
+            entries = [(k, v[0], v[1], v[2])
+                       for k, v in self._entries.items()]
+        return [{
+            'type': get_class_name(fingerprint[0]),
+            'filename': fingerprint[1],
+            'lineno': fingerprint[2],
+            'name': fingerprint[3],
+            'count': count,
+            'failure': failure,
+            'traceback': text,
+        } for fingerprint, count, failure, text in entries]
+
+    def clear(self):
+        """
+        Forget all recorded failures
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+class ErrorHook(Policy):
+    """
+    A policy which call :attr:`hook` with ``sys.exc_info()`` of failures
+
+    It is used for ``on_error`` of :func:`tolerance.decorators.tolerate` and
+    called only when the substitute is used for an exception raised from
+    the function (not for calls rejected by policies).
+    The hook should not keep the exception info; keep
+    :func:`capture_failure` of it instead.
+    """
+    def __init__(self, hook):
+        self.hook = hook
+
+    def failure(self, token, exc_type):
+        self.hook(*sys.exc_info())
@@ -0,0 +1,230 @@
+# coding=utf-8
+"""
+tolerance hedge module
+
+A hedging policy which start a backup call when the first call is slow and
+take whichever succeeds first.
+Synchronous functions are called in a reusable thread pool
+(``concurrent.futures``, use ``futures`` package in Python 2) and coroutine
+functions are called in tasks.
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import threading
+from collections import deque
+from tolerance.utils import monotonic
+from tolerance.utils import get_thread_pool
+
+
+class Hedge(object):
+    """
+    A policy which start a backup call when the call is slow
+
+    When the call has not returned within the hedging delay, a second
+    concurrent call (a hedge) is started with the same arguments and the
+    result of whichever succeeds first is returned; the other is cancelled
+    if possible (threads cannot be cancelled once started). The exception of
+    the first call is raised (thus the substitute is used) when both fail.
+
+    The delay is :attr:`delay` or, when :attr:`percentile` is specified, the
+    percentile of the latencies of recent successful calls (:attr:`delay`
+    is used until :attr:`minimum` latencies are recorded). The number of
+    hedges in flight is capped by :attr:`max_in_flight` so hedging does not
+    double the load on an outage where every call is slow.
+
+    Specify an instance to ``hedge`` of
+    :func:`tolerance.decorators.tolerate`. The instance can be shared
+    between functions which call the same dependency.
+
+    Parameters
+    ----------
+    delay : number or None
+        A number of seconds after which a hedge is started.
+        ``None`` not to hedge until latencies are recorded.
+    percentile : number or None
+        A percentile (0 - 100) of recent latencies used as the delay.
+    window : integer
+        A number of recent latencies used to compute the percentile.
+    minimum : integer
+        A minimum number of recorded latencies to use the percentile.
+    max_in_flight : integer
+        A maximum number of hedges running concurrently.
+    max_workers : integer or None
+        A maximum number of threads of the pool. The thread pool shared by
+        instances without :attr:`max_workers` and :attr:`executor` is used
+        if ``None`` is specified.
+    executor : ``concurrent.futures.Executor`` or None
+        An executor used instead of the thread pool.
+    clock : function or None
+        A function which return the current time in seconds.
+        :func:`tolerance.utils.monotonic` is used if ``None`` is specified.
+
+    Attributes
+    ----------
+    hedges : integer
+        A number of hedges started.
+    wins : integer
+        A number of calls whose result came from the hedge.
+    capped : integer
+        A number of hedges which were not started because of
+        :attr:`max_in_flight`.
+    in_flight : integer
+        A number of hedges running.
+
+    Examples
+    --------
+    >>> import time
+    >>> from tolerance.decorators import tolerate
+    >>> hedge = Hedge(delay=0.01)
+    >>> latencies = [0.5, 0]
+    >>> @tolerate(hedge=hedge)
+    ... def fetch():
+    ...     time.sleep(latencies.pop(0))
+    ...     return 'response'
+    >>> fetch()
+    'response'
+    >>> hedge.hedges, hedge.wins
+    (1, 1)
+    """
+    def __init__(self, delay=None, percentile=None, window=1000, minimum=100,
+                 max_in_flight=10, max_workers=None, executor=None,
+                 clock=None):
+        if delay is None and percentile is None:
+            raise ValueError('delay or percentile should be specified')
+        if percentile is not None and not 0 < percentile < 100:
+            raise ValueError('percentile should be in (0, 100) but %r is '
+                             'specified' % percentile)
+        self.delay = delay
+        self.percentile = percentile
+        self.window = window
+        self.minimum = minimum
+        self.max_in_flight = max_in_flight
+        self.max_workers = max_workers
+        self.clock = clock or monotonic
+        self.hedges = 0
+        self.wins = 0
+        self.capped = 0
+        self.in_flight = 0
+        self._executor = executor
+        # appending to a deque is atomic so latencies are recorded without
+        # the lock. the percentile is recomputed every `_refresh` records
+        self._latencies = deque(maxlen=window)
+        self._refresh = max(1, window // 10)
+        self._records = 0
+        self._percentile_delay = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        """
+        An executor which call synchronous functions (created lazily)
+        """
+        if self._executor is None:
+            if self.max_workers is None:
+                self._executor = get_thread_pool('hedges')
+            else:
+                from concurrent.futures import ThreadPoolExecutor
+                self._executor = ThreadPoolExecutor(self.max_workers)
+        return self._executor
+
+    def get_delay(self):
+        """
+        Return the current hedging delay in seconds or ``None``
+        """
+        if self.percentile is None or len(self._latencies) < self.minimum:
+            return self.delay
+        if self._percentile_delay is None or \
+                self._records >= self._refresh:
+            self._records = 0
+            latencies = sorted(self._latencies)
+            index = int(round(self.percentile / 100.0 *
+                              (len(latencies) - 1)))
+            self._percentile_delay = latencies[index]
+        return self._percentile_delay
+
+    def record(self, latency):
+        """
+        Record a latency of a successful call
+        """
+        self._latencies.append(latency)
+        # races between threads may lose counts which only delays the
+        # recomputation of the percentile
+        self._records += 1
+
+    def acquire(self):
+        """
+        Return ``True`` if a hedge can be started and count it
+        """
+        with self._lock:
+            if self.in_flight >= self.max_in_flight:
+                self.capped += 1
+                return False
+            self.in_flight += 1
+            self.hedges += 1
+        return True
+
+    def release(self, *args):
+        """
+        Count a hedge finished
+        """
+        with self._lock:
+            self.in_flight -= 1
+
+    def win(self):
+        """
+        Count a call whose result came from the hedge
+        """
+        with self._lock:
+            self.wins += 1
+
+    def wrap(self, fn, resolve=None):
+        """
+        Return a function which call :attr:`fn` in the thread pool with a
+        hedge
+        """
+        from concurrent.futures import FIRST_COMPLETED
+        from concurrent.futures import TimeoutError
+        from concurrent.futures import wait
+        clock = self.clock
+
+        def timed(*args, **kwargs):
+            start = clock()
+            result = fn(*args, **kwargs)
+            self.record(clock() - start)
+            return result
+
+        def inner(*args, **kwargs):
+            delay = self.get_delay()
+            if delay is None:
+                return timed(*args, **kwargs)
+            executor = self.executor
+            primary = executor.submit(timed, *args, **kwargs)
+            try:
+                primary.exception(delay)
+            except TimeoutError:
+                pass
+            else:
+                return primary.result()
+            if not self.acquire():
+                return primary.result()
+            second = executor.submit(timed, *args, **kwargs)
+            second.add_done_callback(self.release)
+            pending = set((primary, second))
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        for x in pending:
+                            x.cancel()
+                        if future is second:
+                            self.win()
+                        return future.result()
+            # both have failed
+            return primary.result()
+        return inner
+
+    def wrap_async(self, fn, resolve=None):
+        """
+        Return a coroutine function which await :attr:`fn` with a hedge
+        """
+        from tolerance.coroutines import build_async_hedge
+        return build_async_hedge(self, fn)
@@ -0,0 +1,112 @@
+# coding=utf-8
+"""
+tolerance limiter module
+
+A rate limiter policy which cap the number of calls per second and use the
+substitute for calls over the limit instead of queuing them.
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import threading
+from tolerance.policies import Policy
+from tolerance.policies import Rejected
+from tolerance.policies import Rejection
+from tolerance.utils import monotonic
+
+
+class RateLimited(Rejected):
+    """
+    An exception class which represents a call rejected by a rate limiter
+    """
+
+
+class TokenBucket(Policy):
+    """
+    A policy which limit the rate of calls with a token bucket
+
+    The bucket holds up to :attr:`burst` tokens and each call takes one;
+    calls are rejected (the substitute for :class:`RateLimited` is used)
+    while the bucket is empty. Tokens are refilled lazily from the elapsed
+    time of :attr:`clock` on each call so no background thread is used.
+
+    Specify an instance or a number of calls per second to ``rate_limit`` of
+    :func:`tolerance.decorators.tolerate`. The instance can be shared
+    between functions which call the same service.
+
+    Parameters
+    ----------
+    rate : number
+        A number of tokens refilled per second (calls per second).
+    burst : integer or None
+        A capacity of the bucket; a number of calls which can be made at
+        once. :attr:`rate` (but at least 1) is used if ``None`` is
+        specified. The bucket is full at first.
+    clock : function or None
+        A function which return the current time in seconds.
+        :func:`tolerance.utils.monotonic` is used if ``None`` is specified.
+
+    Attributes
+    ----------
+    rejected : integer
+        A number of calls which have been rejected.
+
+    Examples
+    --------
+    >>> from tolerance.decorators import tolerate
+    >>> now = [0]
+    >>> bucket = TokenBucket(rate=2, clock=lambda: now[0])
+    >>> @tolerate('slow down', rate_limit=bucket)
+    ... def fetch(url):
+    ...     return 'content'
+    >>> [fetch('http://example.com') for i in range(3)]
+    ['content', 'content', 'slow down']
+    >>> now[0] = 0.5    # a token is refilled in 0.5 seconds
+    >>> [fetch('http://example.com') for i in range(2)]
+    ['content', 'slow down']
+    >>> bucket.rejected
+    2
+    """
+    def __init__(self, rate, burst=None, clock=None):
+        if rate <= 0:
+            raise ValueError('rate should be a positive number but %r is '
+                             'specified' % rate)
+        if burst is None:
+            burst = max(rate, 1)
+        elif burst < 1:
+            raise ValueError('burst should be a positive integer but %r is '
+                             'specified' % burst)
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock or monotonic
+        self.rejected = 0
+        self._tokens = burst
+        self._updated = self.clock()
+        self._rejection = Rejection(RateLimited)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<TokenBucket: %s/s, burst=%s>' % (self.rate, self.burst)
+
+    @property
+    def tokens(self):
+        """
+        A number of tokens available now
+        """
+        with self._lock:
+            return self._refill()
+
+    def before(self, args, kwargs):
+        with self._lock:
+            tokens = self._refill()
+            if tokens < 1:
+                self.rejected += 1
+                return self._rejection
+            self._tokens = tokens - 1
+
+    def _refill(self):
+        now = self.clock()
+        tokens = self._tokens + (now - self._updated) * self.rate
+        if tokens > self.burst:
+            tokens = self.burst
+        self._tokens = tokens
+        self._updated = now
+        return tokens
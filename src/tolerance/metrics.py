@@ -0,0 +1,310 @@
+# coding=utf-8
+"""
+tolerance metrics module
+
+A metrics policy which count calls, successes, substitutions, and so on of a
+tolerant function and a registry which collect metrics of tolerant functions
+to export them.
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import threading
+from tolerance.policies import Policy
+from tolerance.utils import monotonic
+from tolerance.utils import get_class_name
+
+BUCKETS = tuple([2 ** k / 1000000.0 for k in range(31)] + [float('inf')])
+"""Upper bounds (in seconds) of buckets of the latency histogram"""
+
+
+class Metrics(Policy):
+    """
+    A policy which record metrics of a tolerant function
+
+    The following metrics are recorded.
+
+    calls
+        A number of completed calls including calls which are not tolerant.
+    successes
+        A number of calls which returned without exceptions.
+    substitutions
+        A dict which map an exception class name to a number of calls whose
+        substitute is used (including calls rejected by policies like
+        :class:`tolerance.breakers.CircuitBreaker`).
+    errors
+        A number of calls which raised an exception which is not ignored.
+    bypassed
+        A number of calls which are not tolerant; the tolerance is disabled
+        or turned off by the switch.
+    latency
+        A list of numbers of calls in each bucket of :data:`BUCKETS`; the
+        k-th bucket counts latencies shorter than ``2 ** k`` microseconds.
+        Only sampled calls are timed.
+
+    Counters are kept for each thread so the hot path takes no lock and they
+    are aggregated in :meth:`snapshot`.
+
+    Specify an instance, a :class:`Registry`, or ``True`` (the default
+    registry) to ``metrics`` of :func:`tolerance.decorators.tolerate`.
+
+    Parameters
+    ----------
+    sample : float
+        A rate (0.0 - 1.0) of calls which are timed for the latency
+        histogram. Every ``round(1 / sample)``-th call of each thread is
+        timed and ``0`` disables the histogram.
+    clock : function or None
+        A function which return the current time in seconds.
+        :func:`tolerance.utils.monotonic` is used if ``None`` is specified.
+
+    Examples
+    --------
+    >>> from tolerance.decorators import tolerate
+    >>> metrics = Metrics()
+    >>> parse_int = tolerate(metrics=metrics)(int)
+    >>> parse_int('0'), parse_int('zero'), parse_int('zero')
+    (0, None, None)
+    >>> parse_int('zero', fail_silently=False)
+    Traceback (most recent call last):
+        ...
+    ValueError: ...
+    >>> snapshot = metrics.snapshot()
+    >>> snapshot['calls'], snapshot['successes'], snapshot['substitutions']
+    (4, 1, {'ValueError': 2})
+    >>> snapshot['errors'], snapshot['bypassed']
+    (0, 1)
+    """
+    def __init__(self, sample=0.1, clock=None):
+        if not 0 <= sample <= 1:
+            raise ValueError('sample should be in [0, 1] but %r is specified'
+                             % sample)
+        self.sample = sample
+        self.clock = clock or monotonic
+        if sample:
+            self._period = max(1, int(round(1.0 / sample)))
+        else:
+            # the countdown starts from -1 and never reaches 0
+            self._period = -1
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._local = threading.local()
+        # a list of (thread, counters) and counters of finished threads
+        self._counters = []
+        self._retired = _Counters(self._period)
+
+    def _register(self):
+        local = self._local
+        counters = local.counters = _Counters(self._period)
+        with self._lock:
+            if local is self._local:
+                self._retire()
+                self._counters.append((threading.current_thread(),
+                                       counters))
+        return counters
+
+    def _retire(self):
+        # fold counters of finished threads into the retired counters
+        alive = []
+        for thread, counters in self._counters:
+            if thread.is_alive():
+                alive.append((thread, counters))
+            else:
+                self._retired.merge(counters)
+        self._counters = alive
+
+    def before(self, args, kwargs):
+        try:
+            counters = self._local.counters
+        except AttributeError:
+            counters = self._register()
+        counters.countdown -= 1
+        if counters.countdown:
+            return counters
+        counters.countdown = self._period
+        return (counters, self.clock())
+
+    def success(self, token, result):
+        if token.__class__ is tuple:
+            token[0].record(self.clock() - token[1])
+            token = token[0]
+        token.successes += 1
+
+    def failure(self, token, exc_type):
+        if token.__class__ is tuple:
+            token[0].record(self.clock() - token[1])
+            token = token[0]
+        substitutions = token.substitutions
+        substitutions[exc_type] = substitutions.get(exc_type, 0) + 1
+
+    # calls rejected by following policies use the substitute as well
+    rejected = failure
+
+    def release(self, token):
+        if token.__class__ is tuple:
+            token[0].record(self.clock() - token[1])
+            token = token[0]
+        token.errors += 1
+
+    def bypassed(self):
+        try:
+            counters = self._local.counters
+        except AttributeError:
+            counters = self._register()
+        counters.bypassed += 1
+
+    def snapshot(self):
+        """
+        Return a dict of metrics aggregated over threads
+        """
+        total = _Counters(self._period)
+        with self._lock:
+            self._retire()
+            total.merge(self._retired)
+            for thread, counters in self._counters:
+                total.merge(counters)
+        # calls in progress are not counted
+        substitutions = sum(total.substitutions.values())
+        return {
+            'calls': total.successes + substitutions + total.errors +
+            total.bypassed,
+            'successes': total.successes,
+            'substitutions': dict((get_class_name(k), v) for k, v
+                                  in total.substitutions.items()),
+            'errors': total.errors,
+            'bypassed': total.bypassed,
+            'latency': total.latencies,
+        }
+
+    def reset(self):
+        """
+        Reset all metrics to zero
+        """
+        with self._lock:
+            self._reset()
+
+
+class _Counters(object):
+    # counters of a thread; only the thread updates them
+    __slots__ = ('successes', 'substitutions', 'errors',
+                 'bypassed', 'latencies', 'countdown')
+
+    def __init__(self, period):
+        self.successes = 0
+        self.substitutions = {}
+        self.errors = 0
+        self.bypassed = 0
+        self.latencies = [0] * len(BUCKETS)
+        self.countdown = period
+
+    def record(self, latency):
+        index = int(latency * 1000000).bit_length()
+        if index >= len(BUCKETS):
+            index = len(BUCKETS) - 1
+        self.latencies[index] += 1
+
+    def merge(self, other):
+        self.successes += other.successes
+        # copying a dict or a list is atomic while the thread updates them
+        for key, value in other.substitutions.copy().items():
+            self.substitutions[key] = self.substitutions.get(key, 0) + value
+        self.errors += other.errors
+        self.bypassed += other.bypassed
+        for index, value in enumerate(list(other.latencies)):
+            self.latencies[index] += value
+
+
+class Registry(object):
+    """
+    A registry of metrics of tolerant functions
+
+    Metrics are registered with the name of the function (a dotted path like
+    ``'package.module.function'``) and functions which have the same name
+    share the metrics.
+
+    Parameters
+    ----------
+    sample : float
+        A sample rate of metrics created by the registry (see
+        :class:`Metrics`).
+
+    Examples
+    --------
+    >>> from tolerance.decorators import tolerate
+    >>> registry = Registry()
+    >>> @tolerate(metrics=registry)
+    ... def parse_int(x):
+    ...     return int(x)
+    >>> parse_int('zero')
+    >>> list(registry)
+    ['tolerance.metrics.parse_int']
+    >>> registry.snapshot()['tolerance.metrics.parse_int']['substitutions']
+    {'ValueError': 1}
+    >>> registry.reset()
+    >>> registry['tolerance.metrics.parse_int'].snapshot()['calls']
+    0
+    """
+    def __init__(self, sample=0.1):
+        self.sample = sample
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """
+        Return metrics of the name (created if it does not exist)
+        """
+        metrics = self._metrics.get(name)
+        if metrics is None:
+            with self._lock:
+                metrics = self._metrics.get(name)
+                if metrics is None:
+                    metrics = self._metrics[name] = Metrics(self.sample)
+        return metrics
+
+    def __getitem__(self, name):
+        return self._metrics[name]
+
+    def __contains__(self, name):
+        return name in self._metrics
+
+    def __iter__(self):
+        return iter(sorted(self._metrics))
+
+    def __len__(self):
+        return len(self._metrics)
+
+    def snapshot(self):
+        """
+        Return a dict which map a name to a snapshot of the metrics
+        """
+        return dict((name, metrics.snapshot()) for name, metrics
+                    in list(self._metrics.items()))
+
+    def reset(self):
+        """
+        Reset all metrics to zero
+        """
+        for metrics in list(self._metrics.values()):
+            metrics.reset()
+
+
+REGISTRY = Registry()
+"""A default registry used when ``metrics=True`` is specified"""
+
+
+def get_metrics(metrics, fn):
+    """
+    Return :class:`Metrics` of :attr:`fn` from ``metrics`` of ``tolerate``
+
+    :attr:`metrics` is ``True``, :class:`Registry`, or :class:`Metrics`.
+    """
+    if isinstance(metrics, Metrics):
+        return metrics
+    elif metrics is True:
+        metrics = REGISTRY
+    name = getattr(fn, '__qualname__', None) or \
+        getattr(fn, '__name__', None) or repr(fn)
+    module = getattr(fn, '__module__', None)
+    if module:
+        name = '%s.%s' % (module, name)
+    return metrics.get(name)
@@ -0,0 +1,280 @@
+# coding=utf-8
+"""
+tolerance policy module
+
+Policies are objects consulted before each tolerant call and informed of the
+outcome after the call (e.g. :class:`tolerance.caches.FailureCache`). A policy
+can reject the call to use the substitute without calling the function.
+Policies are applied only when the function is tolerant (see ``switch`` of
+:func:`tolerance.decorators.tolerate`).
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import sys
+
+
+class Rejected(Exception):
+    """
+    A base exception class of rejections by policies
+
+    Subclasses are used as :attr:`Rejection.type` or raised by executors
+    (e.g. timeout) so a substitute for rejections can be specified in
+    ``exceptions`` of :func:`tolerance.decorators.tolerate`. The substitute
+    of ``tolerate`` is used for them when they are not listed.
+    """
+
+
+class Rejection(object):
+    """
+    A value returned from :meth:`Policy.before` to reject the call
+
+    The call is treated as if it had failed with :attr:`type` so the
+    substitute for the exception class is used (the substitute of
+    ``tolerate`` is used when the class is not listed in ``exceptions``).
+
+    Attributes
+    ----------
+    type : class
+        An exception class which the rejected call is treated as.
+    """
+    __slots__ = ('type',)
+
+    def __init__(self, type):
+        self.type = type
+
+    def __repr__(self):
+        return '<Rejection: %s>' % self.type.__name__
+
+
+class Fallback(object):
+    """
+    A value returned from :meth:`Policy.failure` or :meth:`Policy.rejected`
+    to use :attr:`value` instead of the substitute
+
+    Attributes
+    ----------
+    value : object
+        A value returned from the call instead of the substitute.
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __repr__(self):
+        return '<Fallback: %r>' % (self.value,)
+
+
+class Policy(object):
+    """
+    A base class of policies applied to each call of a tolerant function
+
+    Subclasses override the methods below which they are interested in.
+    Policies are called in the specified order before the call and every
+    policy which accepted the call is informed of the outcome by exactly one
+    of :meth:`success`, :meth:`failure`, :meth:`rejected`, or
+    :meth:`release`.
+    """
+    def before(self, args, kwargs):
+        """
+        Called before the call and return a token or :class:`Rejection`
+
+        The token is passed to the method called after the call.
+        """
+        return None
+
+    def success(self, token, result):
+        """
+        Called when the call has succeeded
+        """
+
+    def failure(self, token, exc_type):
+        """
+        Called when the call has failed with an ignored exception
+
+        It is called in ``except`` clause before the substitute is used.
+        :class:`Fallback` can be returned to use the value instead of the
+        substitute (the first one is used and following policies are still
+        informed).
+        """
+
+    def rejected(self, token, exc_type):
+        """
+        Called when the call is rejected by a following policy
+
+        :attr:`exc_type` is :attr:`Rejection.type` of the rejection.
+        :class:`Fallback` can be returned as well as :meth:`failure`.
+        It calls :meth:`release` by default.
+        """
+        self.release(token)
+
+    def release(self, token):
+        """
+        Called when the call has not been completed by the policy
+
+        That is, the call failed with an exception which is not ignored (or
+        is rejected by a following policy, see :meth:`rejected`).
+        """
+
+    def bypassed(self):
+        """
+        Called instead of :meth:`before` when the call is not tolerant
+
+        That is, the tolerance is disabled or turned off by the switch.
+        """
+
+
+def build_policy_caller(fn, policies, resolve, default):
+    """
+    Build a function which call :attr:`fn` with the policies
+
+    The returned function receives ``args`` and ``kwargs`` and return the
+    result or the substitute.
+
+    Parameters
+    ----------
+    fn : function
+        A function which will be called.
+    policies : list of :class:`Policy`
+        Policies applied to the call.
+    resolve : function
+        A function which receive an exception class and return a substitute
+        function or ``None`` if the exception should not be ignored.
+    default : function
+        A substitute function used for rejections whose exception class is
+        not resolved by :attr:`resolve`.
+
+    Examples
+    --------
+    >>> class Reject(Policy):
+    ...     def before(self, args, kwargs):
+    ...         if args[0] < 0:
+    ...             return Rejection(ValueError)
+    >>> call = build_policy_caller(lambda x: x * 2, [Reject()],
+    ...                            lambda cls: None, lambda x: 'rejected')
+    >>> call((1,), {})
+    2
+    >>> call((-1,), {})
+    'rejected'
+    """
+    policies = tuple(policies)
+    if len(policies) == 1:
+        return _build_single_policy_caller(fn, policies[0], resolve, default)
+
+    def call(args, kwargs):
+        tokens = []
+        for policy in policies:
+            token = policy.before(args, kwargs)
+            if token.__class__ is Rejection:
+                fallback = _reject(policies, tokens, token.type)
+                if fallback is not None:
+                    return fallback.value
+                substitute = resolve(token.type) or default
+                return substitute(*args, **kwargs)
+            tokens.append(token)
+        try:
+            result = fn(*args, **kwargs)
+        except:
+            exc_type = sys.exc_info()[0]
+            substitute = resolve(exc_type)
+            if substitute is None:
+                _release(policies, tokens)
+                raise
+            fallback = _fail(policies, tokens, exc_type)
+            if fallback is not None:
+                return fallback.value
+            return substitute(*args, **kwargs)
+        for policy, token in zip(policies, tokens):
+            policy.success(token, result)
+        return result
+    return call
+
+
+def _build_single_policy_caller(fn, policy, resolve, default):
+    # the most common case; hooks which are not overridden are not called
+    before = policy.before
+    success = _get_hook(policy, 'success')
+    failure = _get_hook(policy, 'failure')
+    release = _get_hook(policy, 'release')
+
+    def call(args, kwargs):
+        token = before(args, kwargs)
+        if token.__class__ is Rejection:
+            substitute = resolve(token.type) or default
+            return substitute(*args, **kwargs)
+        try:
+            result = fn(*args, **kwargs)
+        except:
+            exc_type = sys.exc_info()[0]
+            substitute = resolve(exc_type)
+            if substitute is None:
+                if release is not None:
+                    release(token)
+                raise
+            if failure is not None:
+                fallback = failure(token, exc_type)
+                if fallback.__class__ is Fallback:
+                    return fallback.value
+            return substitute(*args, **kwargs)
+        if success is not None:
+            success(token, result)
+        return result
+    return call
+
+
+def _get_hook(policy, name):
+    # return None if the method is not overridden
+    if _get_function(type(policy), name) is _get_function(Policy, name):
+        return None
+    return getattr(policy, name)
+
+
+def _get_function(cls, name):
+    # unwrap unbound methods which Python 2 creates on each access
+    method = getattr(cls, name)
+    return getattr(method, '__func__', method)
+
+
+def build_bypass_hook(policies):
+    """
+    Build a function which call :meth:`Policy.bypassed` of the policies
+
+    ``None`` is returned when no policy overrides it.
+    """
+    hooks = [x for x in (_get_hook(x, 'bypassed') for x in policies)
+             if x is not None]
+    if not hooks:
+        return None
+    elif len(hooks) == 1:
+        return hooks[0]
+
+    def bypassed():
+        for hook in hooks:
+            hook()
+    return bypassed
+
+
+def _fail(policies, tokens, exc_type):
+    # inform policies of the failure and return the first fallback or None
+    fallback = None
+    for policy, token in zip(policies, tokens):
+        result = policy.failure(token, exc_type)
+        if fallback is None and result.__class__ is Fallback:
+            fallback = result
+    return fallback
+
+
+def _reject(policies, tokens, exc_type):
+    # inform policies which have accepted the call in reverse order and
+    # return the first fallback or None
+    fallback = None
+    for index in range(len(tokens) - 1, -1, -1):
+        result = policies[index].rejected(tokens[index], exc_type)
+        if fallback is None and result.__class__ is Fallback:
+            fallback = result
+    return fallback
+
+
+def _release(policies, tokens):
+    # release policies which have accepted the call in reverse order
+    for index in range(len(tokens) - 1, -1, -1):
+        policies[index].release(tokens[index])
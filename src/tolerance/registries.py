@@ -0,0 +1,491 @@
+# coding=utf-8
+"""
+tolerance registry module
+
+Named policies which tolerant functions refer to instead of a substitute
+and exceptions frozen at decoration time. Policies are registered in code
+and overridden by a JSON, TOML, or INI file which is reloaded when the
+modification time has changed, so they can be changed without a redeploy.
+
+Examples
+--------
+>>> from tolerance.decorators import tolerate
+>>> REGISTRY.register('examples.parse', substitute=-1)
+>>> parse_int = tolerate(policy='examples.parse')(int)
+>>> parse_int('zero')
+-1
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import os
+import sys
+import json
+import threading
+from tolerance.utils import MATCH_MODES
+from tolerance.utils import monotonic
+from tolerance.utils import as_substitute_function
+from tolerance.decorators import _build_failure_handler
+from tolerance.decorators import _build_resolver
+
+try:
+    import builtins
+except ImportError:
+    import __builtin__ as builtins
+
+try:
+    from configparser import RawConfigParser
+except ImportError:
+    from ConfigParser import RawConfigParser
+
+try:
+    import tomllib
+except ImportError:
+    # tomllib was introduced from Python 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+
+OPTIONS = ('substitute', 'exceptions', 'match', 'enabled')
+"""Available options of named policies"""
+
+
+class PolicyConfig(object):
+    """
+    An immutable configuration of a named policy
+
+    Functions used by tolerant functions (see
+    :func:`tolerance.decorators._build_failure_handler`) are built here so a
+    failure only reads :attr:`NamedPolicy.config` once and the configuration
+    cannot be observed half-applied.
+
+    Parameters
+    ----------
+    substitute : function or returning value
+        A substitute (see :func:`tolerance.decorators.tolerate`).
+    exceptions : list, dict, or None
+        Exception classes or dotted names of them (e.g. ``'KeyError'`` or
+        ``'socket.timeout'``), or a dict which map them to substitutes.
+    match : string
+        A mode used to find exceptions in :attr:`exceptions`.
+    enabled : boolean
+        Whether failures are ignored. If ``False`` is specified, exceptions
+        raised from the function are raised as if it were not tolerant
+        (calls rejected by policies like ``breaker`` still return the
+        substitute as they have no exception to raise).
+
+    Examples
+    --------
+    >>> config = PolicyConfig(-1, exceptions=['ValueError'])
+    >>> config.exceptions == [ValueError]
+    True
+    >>> config.resolve(ValueError)()
+    -1
+    >>> config.resolve(KeyError) is None
+    True
+    """
+    __slots__ = ('substitute', 'exceptions', 'match', 'enabled', 'handle',
+                 'resolve', 'default')
+
+    def __init__(self, substitute=None, exceptions=None, match='exact',
+                 enabled=True):
+        if match not in MATCH_MODES:
+            raise ValueError('match should be one of %s but %r is specified'
+                             % (', '.join(MATCH_MODES), match))
+        if isinstance(exceptions, dict):
+            exceptions = dict((get_exception_class(cls), value)
+                              for cls, value in exceptions.items())
+        elif isinstance(exceptions, basestring):
+            exceptions = [get_exception_class(exceptions)]
+        elif exceptions is not None:
+            exceptions = [get_exception_class(cls) for cls in exceptions]
+        enabled = bool(enabled)
+        setattr = super(PolicyConfig, self).__setattr__
+        setattr('substitute', substitute)
+        setattr('exceptions', exceptions)
+        setattr('match', match)
+        setattr('enabled', enabled)
+        if enabled:
+            setattr('handle', _build_failure_handler(substitute, exceptions,
+                                                     match))
+            resolve, default = _build_resolver(substitute, exceptions, match)
+        else:
+            setattr('handle', _reraise)
+            resolve = _resolve_nothing
+            default = as_substitute_function(substitute)
+        setattr('resolve', resolve)
+        setattr('default', default)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('PolicyConfig is immutable')
+
+    def __repr__(self):
+        return ('<PolicyConfig: substitute=%r, exceptions=%r, match=%r, '
+                'enabled=%r>' % (self.substitute, self.exceptions,
+                                 self.match, self.enabled))
+
+
+def _reraise(args, kwargs):
+    raise
+
+
+def _resolve_nothing(cls):
+    return None
+
+
+def get_exception_class(name):
+    """
+    Return an exception class of the name
+
+    Builtin exceptions are specified by the name and others are specified by
+    the dotted path (e.g. ``'socket.timeout'``). A class is returned as is.
+
+    Examples
+    --------
+    >>> import socket
+    >>> get_exception_class('KeyError') is KeyError
+    True
+    >>> get_exception_class('socket.timeout') is socket.timeout
+    True
+    """
+    if not isinstance(name, basestring):
+        return name
+    module, _, attr = name.strip().rpartition('.')
+    try:
+        if module:
+            # importlib was introduced from Python 2.7
+            __import__(module)
+            cls = getattr(sys.modules[module], attr)
+        else:
+            cls = getattr(builtins, attr)
+    except (ImportError, AttributeError):
+        raise ValueError('%r is not found' % name)
+    if not isinstance(cls, type) or not issubclass(cls, BaseException):
+        raise ValueError('%r is not an exception class' % name)
+    return cls
+
+
+class NamedPolicy(object):
+    """
+    A policy of a name which tolerant functions refer to
+
+    It is made by :meth:`PolicyRegistry.get` and ``tolerate(policy=name)``
+    uses :meth:`handle` (or :meth:`resolve` and :meth:`default` with
+    policies like ``breaker``) to handle failures. Calls which succeed
+    never touch it. On failures the registry is checked for a modified
+    file and then :attr:`config` is read once; reloading replaces
+    :attr:`config` with a single assignment so the switch is atomic.
+
+    Attributes
+    ----------
+    name : string
+        A name of the policy.
+    registry : :class:`PolicyRegistry`
+        A registry which the policy belongs to.
+    config : :class:`PolicyConfig`
+        The current configuration.
+    """
+    __slots__ = ('name', 'registry', 'config')
+
+    def __init__(self, name, registry, config):
+        self.name = name
+        self.registry = registry
+        self.config = config
+
+    def __repr__(self):
+        return '<NamedPolicy: %s %r>' % (self.name, self.config)
+
+    def handle(self, args, kwargs):
+        """
+        Return the substitute of the failure currently handled or re-raise
+        """
+        registry = self.registry
+        if registry._deadline <= registry.clock():
+            registry.check()
+        return self.config.handle(args, kwargs)
+
+    def resolve(self, cls):
+        """
+        Return a substitute function of the exception class or ``None``
+        """
+        registry = self.registry
+        if registry._deadline <= registry.clock():
+            registry.check()
+        return self.config.resolve(cls)
+
+    def default(self, *args, **kwargs):
+        """
+        Return the substitute of calls rejected by policies
+        """
+        return self.config.default(*args, **kwargs)
+
+
+class PolicyRegistry(object):
+    """
+    A registry of named policies reloaded from a file
+
+    Policies are registered with :meth:`register` (defaults) and options in
+    the file override them. The file is a JSON file or a TOML file whose
+    tables (or nested tables for dotted names) are policies, or an INI file
+    whose sections are policies::
+
+        # policies.toml
+        ["payments.lookup"]
+        substitute = "unavailable"
+        exceptions = ["KeyError", "socket.timeout"]
+        match = "subclass"
+        enabled = true
+
+    Values of INI files are parsed as JSON if possible and ``exceptions``
+    is a comma separated list.
+    No thread watches the file. When a tolerant function fails and
+    :attr:`interval` seconds have passed since the last check, the
+    modification time and the size of the file are compared and the file is
+    reloaded if they have changed. Configurations of all policies are built
+    before any of them is replaced so an invalid file changes nothing; the
+    error is kept in :attr:`error` and the file is read again at the next
+    check. A missing file keeps the current configurations as well. Call
+    :meth:`reload` to reload the file immediately (e.g. in a signal
+    handler).
+
+    Parameters
+    ----------
+    filename : string or None
+        A path of a JSON (``.json``), TOML (``.toml``), or INI (``.ini`` or
+        ``.cfg``) file. TOML requires Python 3.11 or ``tomli``.
+    interval : number
+        A minimum number of seconds between checks of the file.
+    clock : function or None
+        A function which return the current time in seconds. Default is
+        :func:`time.monotonic`.
+
+    Attributes
+    ----------
+    error : exception or None
+        An exception raised by the last check of the file or ``None``.
+
+    Examples
+    --------
+    >>> import os, json, tempfile
+    >>> from tolerance.decorators import tolerate
+    >>> filename = os.path.join(tempfile.mkdtemp(), 'policies.json')
+    >>> registry = PolicyRegistry(filename, interval=0)
+    >>> registry.register('payments.lookup', substitute='unavailable')
+    >>> @tolerate(policy=registry.get('payments.lookup'))
+    ... def lookup(payment_id):
+    ...     raise KeyError(payment_id)
+    >>> lookup(1)
+    'unavailable'
+    >>> with open(filename, 'w') as fo:
+    ...     json.dump({'payments.lookup': {'enabled': False}}, fo)
+    >>> lookup(1)
+    Traceback (most recent call last):
+        ...
+    KeyError: 1
+    >>> registry['payments.lookup'].config.substitute
+    'unavailable'
+    """
+    def __init__(self, filename=None, interval=1.0, clock=None):
+        self.filename = filename
+        self.interval = interval
+        self.clock = clock or monotonic
+        self.error = None
+        self._policies = {}
+        self._defaults = {}
+        self._loaded = {}
+        self._stamp = None
+        self._deadline = float('-inf')
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """
+        Return :class:`NamedPolicy` of the name (created if it does not exist)
+
+        A policy which is neither registered nor in the file ignores all
+        exceptions with ``None`` until it appears in the file.
+        """
+        policy = self._policies.get(name)
+        if policy is None:
+            with self._lock:
+                policy = self._policies.get(name)
+                if policy is None:
+                    policy = NamedPolicy(name, self, self._build(name))
+                    self._policies[name] = policy
+        return policy
+
+    def register(self, name, **options):
+        """
+        Register default options of the policy
+
+        Options are :data:`OPTIONS` (see :class:`PolicyConfig`) and the file
+        overrides them for each option.
+        """
+        unknown = set(options) - set(OPTIONS)
+        if unknown:
+            raise TypeError('unknown options: %s' % ', '.join(sorted(unknown)))
+        with self._lock:
+            self._defaults[name] = options
+            config = self._build(name)
+            policy = self._policies.get(name)
+            if policy is None:
+                self._policies[name] = NamedPolicy(name, self, config)
+            else:
+                policy.config = config
+
+    def __getitem__(self, name):
+        return self._policies[name]
+
+    def __contains__(self, name):
+        return name in self._policies
+
+    def __iter__(self):
+        return iter(sorted(self._policies))
+
+    def __len__(self):
+        return len(self._policies)
+
+    def load(self, filename):
+        """
+        Load policies from the file and reload it when it is modified
+        """
+        with self._lock:
+            self.filename = filename
+            self._stamp = None
+            return self._reload()
+
+    def reload(self):
+        """
+        Reload the file if it has been modified and return whether it has
+        been reloaded
+
+        Exceptions raised while loading the file are raised.
+        """
+        with self._lock:
+            return self._reload()
+
+    def check(self):
+        """
+        Reload the file if :attr:`interval` seconds have passed since the
+        last check and it has been modified
+
+        Tolerant functions call it on failures. Exceptions are kept in
+        :attr:`error` instead of raised and other threads do not wait while
+        a thread is reloading the file.
+        """
+        now = self.clock()
+        if now < self._deadline or not self._lock.acquire(False):
+            return False
+        try:
+            self._deadline = now + self.interval
+            try:
+                reloaded = self._reload()
+            except Exception:
+                self.error = sys.exc_info()[1]
+                return False
+            self.error = None
+            return reloaded
+        finally:
+            self._lock.release()
+
+    def _reload(self):
+        if self.filename is None:
+            return False
+        try:
+            stat = os.stat(self.filename)
+        except OSError:
+            # the file may be replaced right now
+            return False
+        stamp = (getattr(stat, 'st_mtime_ns', stat.st_mtime), stat.st_size)
+        if stamp == self._stamp:
+            return False
+        loaded = load_policies(self.filename)
+        previous = self._loaded
+        self._loaded = loaded
+        try:
+            configs = dict((name, self._build(name))
+                           for name in self._policies)
+        except:
+            self._loaded = previous
+            raise
+        for name, config in configs.items():
+            self._policies[name].config = config
+        self._stamp = stamp
+        return True
+
+    def _build(self, name):
+        options = dict(self._defaults.get(name, ()))
+        options.update(self._loaded.get(name, ()))
+        try:
+            return PolicyConfig(**options)
+        except (TypeError, ValueError):
+            raise ValueError('invalid policy %r: %s' % (name,
+                                                        sys.exc_info()[1]))
+
+
+REGISTRY = PolicyRegistry()
+"""A default registry used when a name is specified to ``policy``"""
+
+
+def load_policies(filename):
+    """
+    Load a dict which map names of policies to options from the file
+
+    The format is determined by the extension (``.json``, ``.toml``,
+    ``.ini``, or ``.cfg``).
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == '.json':
+        with open(filename) as fi:
+            data = json.load(fi)
+    elif ext == '.toml':
+        if tomllib is None:
+            raise ImportError('tomli is required to load TOML files before '
+                              'Python 3.11')
+        with open(filename, 'rb') as fi:
+            data = tomllib.load(fi)
+    elif ext in ('.ini', '.cfg'):
+        return _load_ini(filename)
+    else:
+        raise ValueError('%r is not a JSON, TOML, or INI file' % filename)
+    if not isinstance(data, dict):
+        raise ValueError('%r should contain a table of policies' % filename)
+    return dict(_flatten(data, ''))
+
+
+def _flatten(data, prefix):
+    # nested tables (`[payments.lookup]` in TOML) are dotted names
+    for name, value in data.items():
+        name = prefix + name
+        if not isinstance(value, dict):
+            raise ValueError('policy %r should be a table' % name)
+        if value and not any(key in OPTIONS for key in value):
+            for item in _flatten(value, name + '.'):
+                yield item
+        else:
+            yield name, value
+
+
+def _load_ini(filename):
+    parser = RawConfigParser()
+    parser.optionxform = str
+    with open(filename) as fi:
+        # readfp is deprecated in Python 3
+        (getattr(parser, 'read_file', None) or parser.readfp)(fi)
+    policies = {}
+    for section in parser.sections():
+        options = {}
+        for key, value in parser.items(section):
+            if key == 'exceptions':
+                options[key] = [x.strip() for x in value.split(',')
+                                if x.strip()]
+            elif key == 'enabled':
+                options[key] = parser.getboolean(section, key)
+            elif key == 'substitute':
+                try:
+                    options[key] = json.loads(value)
+                except ValueError:
+                    options[key] = value
+            else:
+                options[key] = value
+        policies[section] = options
+    return policies
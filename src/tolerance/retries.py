@@ -0,0 +1,165 @@
+# coding=utf-8
+"""
+tolerance retry module
+
+A retry policy which call a failing function again with exponential backoff
+before the substitute is used.
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import sys
+import time
+import random
+import threading
+from tolerance.utils import monotonic
+
+
+class Retry(object):
+    """
+    A policy which retry failed calls with exponential backoff
+
+    A call is retried only when it failed with an exception which is
+    ignored by ``exceptions`` of :func:`tolerance.decorators.tolerate` (and
+    is a subclass of :class:`Exception`), so the substitute is used only
+    when retries are exhausted. Other exceptions are raised immediately.
+
+    The delay before the n-th retry is ``backoff * multiplier ** (n - 1)``
+    capped by :attr:`maximum`, and a random fraction of :attr:`jitter` of it
+    is subtracted to spread retries of concurrent callers.
+
+    Specify an instance to ``retry`` of
+    :func:`tolerance.decorators.tolerate`. The instance can be shared
+    between functions.
+
+    Parameters
+    ----------
+    attempts : integer
+        A maximum number of calls including the first one.
+    backoff : number
+        A number of seconds before the first retry.
+    multiplier : number
+        A factor which the delay is multiplied by for each retry.
+    maximum : number or None
+        A maximum number of seconds of the delay.
+    jitter : float
+        A fraction (0.0 - 1.0) of the delay which is randomized.
+        ``1.0`` for the full jitter and ``0.0`` for no jitter.
+    deadline : number or None
+        A number of seconds from the first call after which no retry is
+        made. A retry is not made when the delay would exceed it.
+    sleep : function or None
+        A function which sleep for the given seconds. ``time.sleep`` is used
+        for functions and ``asyncio.sleep`` for coroutine functions if
+        ``None`` is specified. An awaitable returned from it is awaited.
+    clock : function or None
+        A function which return the current time in seconds.
+        :func:`tolerance.utils.monotonic` is used if ``None`` is specified.
+    random : function or None
+        A function which return a random float in [0.0, 1.0).
+
+    Attributes
+    ----------
+    retries : integer
+        A number of retries made.
+
+    Examples
+    --------
+    >>> from tolerance.decorators import tolerate
+    >>> delays = []
+    >>> retry = Retry(attempts=3, backoff=0.1, jitter=0, sleep=delays.append)
+    >>> responses = [IOError, IOError, 'response']
+    >>> @tolerate('unavailable', exceptions=[IOError], retry=retry)
+    ... def fetch():
+    ...     response = responses.pop(0)
+    ...     if response is IOError:
+    ...         raise IOError
+    ...     return response
+    >>> fetch()
+    'response'
+    >>> delays
+    [0.1, 0.2]
+    """
+    def __init__(self, attempts=3, backoff=0.1, multiplier=2, maximum=None,
+                 jitter=1.0, deadline=None, sleep=None, clock=None,
+                 random=None):
+        if attempts < 1:
+            raise ValueError('attempts should be a positive integer but %r '
+                             'is specified' % attempts)
+        if not 0 <= jitter <= 1:
+            raise ValueError('jitter should be in [0, 1] but %r is specified'
+                             % jitter)
+        self.attempts = attempts
+        self.backoff = backoff
+        self.multiplier = multiplier
+        self.maximum = maximum
+        self.jitter = jitter
+        self.deadline = deadline
+        self.sleep = sleep
+        self.clock = clock or monotonic
+        self.random = random or _random
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def compute_delay(self, retry):
+        """
+        Compute the delay (in seconds) before the n-th retry
+        """
+        delay = self.backoff * self.multiplier ** (retry - 1)
+        if self.maximum is not None:
+            delay = min(delay, self.maximum)
+        if self.jitter:
+            delay -= delay * self.jitter * self.random()
+        return delay
+
+    def next_delay(self, retry, exc_type, start, resolve):
+        """
+        Return the delay before the n-th retry or ``None`` to give up
+
+        :attr:`start` is the time of the first call or ``None`` if
+        :attr:`deadline` is not specified.
+        """
+        if retry >= self.attempts or not issubclass(exc_type, Exception):
+            return None
+        elif resolve is not None and resolve(exc_type) is None:
+            return None
+        delay = self.compute_delay(retry)
+        if start is not None and \
+                self.clock() + delay > start + self.deadline:
+            return None
+        with self._lock:
+            self.retries += 1
+        return delay
+
+    def wrap(self, fn, resolve=None):
+        """
+        Return a function which call :attr:`fn` with retries
+
+        :attr:`resolve` is a function which receive an exception class and
+        return ``None`` if the exception should not be ignored.
+        """
+        sleep = self.sleep or time.sleep
+
+        def inner(*args, **kwargs):
+            start = None if self.deadline is None else self.clock()
+            retry = 0
+            while True:
+                try:
+                    return fn(*args, **kwargs)
+                except:
+                    retry += 1
+                    delay = self.next_delay(retry, sys.exc_info()[0], start,
+                                            resolve)
+                    if delay is None:
+                        raise
+                sleep(delay)
+        return inner
+
+    def wrap_async(self, fn, resolve=None):
+        """
+        Return a coroutine function which await :attr:`fn` with retries
+        """
+        from tolerance.coroutines import build_async_retry
+        return build_async_retry(self, fn, resolve)
+
+
+def _random():
+    return random.random()
@@ -0,0 +1,98 @@
+# coding=utf-8
+"""
+tolerance scope module
+
+Scopes which enable or disable tolerant functions in the current context
+(a thread or an asynchronous task) only, unlike ``tolerate.disabled`` which
+affects every thread and task. ``contextvars`` is used (thread local
+variables in Python 3.6 or former).
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+from tolerance.decorators import SCOPE
+from tolerance.decorators import _wraps
+from tolerance.utils import ContextVar
+from tolerance.utils import is_coroutine_function
+
+
+TOKENS = ContextVar('tolerance.scope.tokens', default=())
+"""
+A context variable of tokens of entered scopes (innermost last)
+
+Tokens are kept in the context rather than the scope so a scope can be
+entered from threads and asynchronous tasks concurrently.
+"""
+
+
+class Scope(object):
+    """
+    A context manager and a decorator which enable or disable tolerance in
+    the current context
+
+    It overrides ``tolerate.disabled`` in the ``with`` statement or calls of
+    the decorated function. Scopes can be nested and the innermost is used.
+    Threads started in the scope are out of the scope while asynchronous
+    tasks created in the scope inherit it.
+    It is available as ``tolerate.scope``.
+
+    Parameters
+    ----------
+    disabled : boolean
+        Whether tolerant functions are disabled in the scope.
+
+    Examples
+    --------
+    >>> from tolerance.decorators import tolerate
+    >>> parse_int = tolerate()(int)
+    >>> with tolerate.scope(disabled=True):
+    ...     parse_int('zero')
+    Traceback (most recent call last):
+        ...
+    ValueError: ...
+    >>> @tolerate.scope(disabled=True)
+    ... def strict_parse_int(x):
+    ...     return parse_int(x)
+    >>> strict_parse_int('zero')
+    Traceback (most recent call last):
+        ...
+    ValueError: ...
+    >>> parse_int('zero') is None
+    True
+    >>> # enable tolerance in the scope even tolerate.disabled is True
+    >>> tolerate.disabled = True
+    >>> with tolerate.scope(disabled=False):
+    ...     parse_int('zero') is None
+    True
+    >>> tolerate.disabled = False
+    """
+    __slots__ = ('disabled',)
+
+    def __init__(self, disabled=True):
+        self.disabled = bool(disabled)
+
+    def __repr__(self):
+        return '<Scope: disabled=%r>' % self.disabled
+
+    def __enter__(self):
+        # a tuple is used as tasks created in the scope share it
+        TOKENS.set(TOKENS.get() + (SCOPE.set(self),))
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        tokens = TOKENS.get()
+        TOKENS.set(tokens[:-1])
+        SCOPE.reset(tokens[-1])
+
+    def __call__(self, fn):
+        # tokens are kept in the call rather than the instance so the
+        # decorated function can be called concurrently
+        if is_coroutine_function(fn):
+            from tolerance.coroutines import build_coroutine_scope_wrapper
+            return _wraps(fn, build_coroutine_scope_wrapper(self, fn))
+
+        def inner(*args, **kwargs):
+            token = SCOPE.set(self)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                SCOPE.reset(token)
+        return _wraps(fn, inner)
@@ -0,0 +1,138 @@
+# coding=utf-8
+"""
+tolerance timeout module
+
+A timeout policy which use the substitute when a function is too slow.
+Synchronous functions are called in a reusable thread pool
+(``concurrent.futures``, use ``futures`` package in Python 2) and coroutine
+functions are cancelled by ``asyncio``.
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import threading
+from tolerance.policies import Rejected
+from tolerance.utils import get_thread_pool
+
+
+class TimedOut(Rejected):
+    """
+    An exception class which represents a call exceeded the timeout
+    """
+
+
+class Timeout(object):
+    """
+    A policy which use the substitute when the call exceeds the timeout
+
+    A synchronous function is called in a thread of the thread pool and the
+    caller waits for the result up to :attr:`seconds`. When it exceeds, the
+    substitute for :class:`TimedOut` is returned immediately while the
+    thread (which cannot be killed) keeps running until the function
+    returns; such threads are counted as :attr:`abandoned`.
+    A call of a coroutine function is cancelled when it exceeds.
+
+    Specify an instance or a number of seconds to ``timeout`` of
+    :func:`tolerance.decorators.tolerate`. The instance can be shared
+    between functions.
+
+    Parameters
+    ----------
+    seconds : number
+        A number of seconds which the caller waits for.
+    max_workers : integer or None
+        A maximum number of threads of the pool. The thread pool shared by
+        instances without :attr:`max_workers` and :attr:`executor` is used
+        if ``None`` is specified.
+    executor : ``concurrent.futures.Executor`` or None
+        An executor used instead of the thread pool.
+
+    Attributes
+    ----------
+    timeouts : integer
+        A number of calls which exceeded the timeout.
+    abandoned : integer
+        A number of threads which are still running timed-out calls. When it
+        is close to the number of threads of the pool, the pool is saturated
+        and following calls wait in the queue of the pool.
+
+    Examples
+    --------
+    >>> import time
+    >>> from tolerance.decorators import tolerate
+    >>> timeout = Timeout(0.01)
+    >>> @tolerate('too slow', timeout=timeout)
+    ... def sleep(seconds):
+    ...     time.sleep(seconds)
+    ...     return 'done'
+    >>> sleep(0), sleep(0.5)
+    ('done', 'too slow')
+    >>> timeout.timeouts, timeout.abandoned
+    (1, 1)
+    """
+    def __init__(self, seconds, max_workers=None, executor=None):
+        if seconds <= 0:
+            raise ValueError('seconds should be a positive number but %r is '
+                             'specified' % seconds)
+        self.seconds = seconds
+        self.max_workers = max_workers
+        self.timeouts = 0
+        self.abandoned = 0
+        self._executor = executor
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        """
+        An executor which call synchronous functions (created lazily)
+        """
+        if self._executor is None:
+            if self.max_workers is None:
+                self._executor = get_thread_pool('timeouts')
+            else:
+                from concurrent.futures import ThreadPoolExecutor
+                self._executor = ThreadPoolExecutor(self.max_workers)
+        return self._executor
+
+    def wrap(self, fn, resolve=None):
+        """
+        Return a function which call :attr:`fn` in the thread pool with the
+        timeout
+        """
+        from concurrent.futures import TimeoutError
+        seconds = self.seconds
+
+        def inner(*args, **kwargs):
+            future = self.executor.submit(fn, *args, **kwargs)
+            try:
+                # unlike `result`, `exception` never raises the exception of
+                # the call so timeouts are distinguished from TimeoutError
+                # raised in the call
+                future.exception(seconds)
+            except TimeoutError:
+                self.abandon(future)
+                raise TimedOut('the call exceeded %s seconds' % seconds)
+            return future.result()
+        return inner
+
+    def wrap_async(self, fn, resolve=None):
+        """
+        Return a coroutine function which await :attr:`fn` with the timeout
+        """
+        from tolerance.coroutines import build_async_timeout
+        return build_async_timeout(self, fn)
+
+    def abandon(self, future=None):
+        """
+        Count a timed-out call and its thread which keeps running
+
+        The call is cancelled if it has not been started.
+        """
+        with self._lock:
+            self.timeouts += 1
+            if future is None or future.cancel():
+                return
+            self.abandoned += 1
+        future.add_done_callback(self._finish)
+
+    def _finish(self, future):
+        with self._lock:
+            self.abandoned -= 1
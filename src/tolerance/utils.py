@@ -3,9 +3,36 @@
 tolerance utility module
 """
 __author__ = 'Alisue <lambdalisue@hashnote.net>'
+import sys
+import time
+import threading
 
 DEFAULT_ARGUMENT_NAME = 'fail_silently'
 
+MATCH_MODES = ('exact', 'subclass')
+"""Available modes of exception matching"""
+
+# code flags found in `inspect` module. they are used directly to avoid
+# importing `inspect` module which is relatively heavy
+CO_COROUTINE = 0x0080
+CO_ASYNC_GENERATOR = 0x0200
+
+# time.monotonic was introduced from Python 3.3
+monotonic = getattr(time, 'monotonic', time.time)
+"""A clock function used by policies which depend on time"""
+
+try:
+    from contextvars import ContextVar
+except ImportError:
+    # contextvars was introduced from Python 3.7
+    ContextVar = None
+
+DEFAULT_MAX_WORKERS = 32
+"""A maximum number of threads of thread pools shared by policies"""
+
+_thread_pools = {}
+_thread_pools_lock = threading.Lock()
+
 
 def argument_switch_generator(argument_name=None,
                               default=True,
@@ -33,6 +60,9 @@ def argument_switch_generator(argument_name=None,
     -------
     function
         A switch function which return status, args, and kwargs respectively.
+        The specified parameters are available as ``argument_name``,
+        ``default``, ``reverse``, and ``keep`` attributes of the function so
+        that :func:`tolerance.decorators.tolerate` can inline the switch.
 
     Examples
     --------
@@ -76,6 +106,8 @@ def argument_switch_generator(argument_name=None,
     >>> status, args, kwargs = fn(fail_silently=True)
     >>> 'fail_silently' in kwargs
     True
+    >>> fn.argument_name, fn.default, fn.reverse, fn.keep
+    ('fail_silently', True, False, True)
     """
     def switch_function(*args, **kwargs):
         if argument_name in kwargs:
@@ -90,9 +122,399 @@ def argument_switch_generator(argument_name=None,
         return bool(status), args, kwargs
     if argument_name is None:
         argument_name = DEFAULT_ARGUMENT_NAME
+    switch_function.argument_name = argument_name
+    switch_function.default = default
+    switch_function.reverse = reverse
+    switch_function.keep = keep
     return switch_function
 
 
+def is_argument_switch(switch):
+    """
+    Return ``True`` if the switch is made by :func:`argument_switch_generator`
+
+    Examples
+    --------
+    >>> is_argument_switch(argument_switch_generator('fail_silently'))
+    True
+    >>> is_argument_switch(lambda *args, **kwargs: (True, args, kwargs))
+    False
+    """
+    for attr in ('argument_name', 'default', 'reverse', 'keep'):
+        if not hasattr(switch, attr):
+            return False
+    return True
+
+
+def signature_switch_generator(argument_name=None,
+                               default=True,
+                               reverse=False):
+    """
+    Create switch function which is bound to the signature of the decorated
+    function
+
+    Unlike :func:`argument_switch_generator`, the named argument is a
+    parameter of the decorated function so it is kept and can be specified
+    positionally or as a keyword-only argument. Where the argument sits is
+    computed once when :func:`tolerance.decorators.tolerate` decorates the
+    function (see :func:`bind_switch`) so each call only checks the length
+    of ``args`` and a key of ``kwargs`` and nothing is allocated when the
+    argument is not specified. The default value of the parameter is used
+    in that case (or :attr:`default` when the parameter has no default).
+    If the function does not have the parameter (or the signature cannot be
+    inspected, e.g. builtin functions), it works as
+    :func:`argument_switch_generator`.
+
+    Parameters
+    ----------
+    argument_name : string or None
+        An argument name which is used to judge the status.
+        If ``None`` is specified, the value of
+        ``tolerance.utils.DEFAULT_ARGUMENT_NAME`` will be used instead.
+    default : boolean
+        A status used when the argument is not specified and the parameter
+        does not have a default value.
+    reverse : boolean
+        Reverse the status (Default: ``False``)
+
+    Returns
+    -------
+    function
+        A switch function which has ``bind`` attribute.
+
+    Examples
+    --------
+    >>> def fetch(url, fail_silently=True):
+    ...     return url, fail_silently
+    >>> fn = bind_switch(signature_switch_generator('fail_silently'), fetch)
+    >>> fn.argument_name, fn.position, fn.default, fn.reverse
+    ('fail_silently', 1, True, False)
+    >>> fn('http://example.com/')
+    (True, ('http://example.com/',), {})
+    >>> fn('http://example.com/', False)
+    (False, ('http://example.com/', False), {})
+    >>> fn('http://example.com/', fail_silently=False)
+    (False, ('http://example.com/',), {'fail_silently': False})
+    >>> from tolerance.decorators import tolerate
+    >>> @tolerate(switch=signature_switch_generator('fail_silently'))
+    ... def parse(x, fail_silently=True):
+    ...     return int(x)
+    >>> parse('zero') is None
+    True
+    >>> parse('zero', False)
+    Traceback (most recent call last):
+        ...
+    ValueError: ...
+    """
+    if argument_name is None:
+        argument_name = DEFAULT_ARGUMENT_NAME
+    switch_function = argument_switch_generator(argument_name,
+                                                default=default,
+                                                reverse=reverse)
+
+    def bind(fn):
+        parameter = _find_parameter(fn, argument_name)
+        if parameter is None:
+            return switch_function
+        position, has_default, value = parameter
+        if has_default:
+            status = bool(value) is not reverse
+        else:
+            status = bool(default)
+        return _build_signature_switch(argument_name, position, status,
+                                       reverse)
+    switch_function.bind = bind
+    return switch_function
+
+
+def _build_signature_switch(argument_name, position, default, reverse):
+    # keyword-only arguments are never found in args
+    index = sys.maxsize if position is None else position
+
+    def switch_function(*args, **kwargs):
+        if len(args) > index:
+            status = args[index]
+        elif argument_name in kwargs:
+            status = kwargs[argument_name]
+        else:
+            return default, args, kwargs
+        return bool(status) is not reverse, args, kwargs
+    switch_function.argument_name = argument_name
+    switch_function.position = position
+    switch_function.default = default
+    switch_function.reverse = reverse
+    return switch_function
+
+
+def _find_parameter(fn, name):
+    # return (position or None for keyword-only, has default, default) of
+    # the parameter or None. `inspect` is not used as it is relatively heavy
+    offset = 0
+    if getattr(fn, '__self__', None) is not None:
+        # bound methods
+        offset = 1
+    fn = getattr(fn, '__func__', fn)
+    code = getattr(fn, '__code__', None)
+    if code is None:
+        return None
+    argcount = code.co_argcount
+    names = code.co_varnames
+    if name in names[:argcount]:
+        position = names.index(name)
+        defaults = fn.__defaults__ or ()
+        index = position - (argcount - len(defaults))
+        if index >= 0:
+            return position - offset, True, defaults[index]
+        return position - offset, False, None
+    kwonlyargcount = getattr(code, 'co_kwonlyargcount', 0)
+    if name in names[argcount:argcount + kwonlyargcount]:
+        defaults = getattr(fn, '__kwdefaults__', None) or {}
+        if name in defaults:
+            return None, True, defaults[name]
+        return None, False, None
+    return None
+
+
+def is_signature_switch(switch):
+    """
+    Return ``True`` if the switch is bound by :func:`bind_switch`
+
+    Examples
+    --------
+    >>> def fn(fail_silently=True):
+    ...     pass
+    >>> switch = signature_switch_generator('fail_silently')
+    >>> is_signature_switch(switch)
+    False
+    >>> is_signature_switch(bind_switch(switch, fn))
+    True
+    """
+    for attr in ('argument_name', 'position', 'default', 'reverse'):
+        if not hasattr(switch, attr):
+            return False
+    return True
+
+
+def bind_switch(switch, fn):
+    """
+    Return the switch bound to :attr:`fn` if it can be bound
+
+    Switch functions which have ``bind`` attribute (e.g. made by
+    :func:`signature_switch_generator`) are bound. Other switch functions
+    are returned as they are.
+    """
+    bind = getattr(switch, 'bind', None)
+    if bind is None:
+        return switch
+    return bind(fn)
+
+
+class ExceptionDispatcher(dict):
+    """
+    A dict which map an exception class to a substitute function
+
+    The substitute function for an exception class is resolved at the first
+    lookup of the class and cached in the dict itself so that following
+    lookups of the class cost a single dict lookup.
+    ``None`` is returned for exception classes which should not be ignored.
+
+    Parameters
+    ----------
+    exceptions : list of exceptions or dict
+        A list of exception classes or a dict which map an exception class to
+        a substitute (function or returning value) used for the exception.
+    substitute : function or returning value
+        A substitute used for exception classes specified in the list.
+    match : string
+        ``'exact'`` to ignore exceptions exactly listed in
+        :attr:`exceptions` or ``'subclass'`` to ignore subclasses of the
+        listed exceptions as well.
+        When several listed classes are found in the MRO of the exception
+        class, the nearest one is used.
+    maxsize : integer
+        A maximum number of cached exception classes.
+        The cache is cleared when the number exceeds.
+
+    Examples
+    --------
+    >>> dispatch = ExceptionDispatcher((LookupError,), 'foo', 'subclass')
+    >>> dispatch[KeyError]()
+    'foo'
+    >>> dispatch[ValueError] is None
+    True
+    >>> dispatch = ExceptionDispatcher({LookupError: 'foo', KeyError: 'bar'},
+    ...                               match='subclass')
+    >>> dispatch[IndexError]()
+    'foo'
+    >>> dispatch[KeyError]()
+    'bar'
+    >>> dispatch = ExceptionDispatcher((LookupError,), 'foo', 'exact')
+    >>> dispatch[KeyError] is None
+    True
+    """
+    def __init__(self, exceptions, substitute=None, match='exact',
+                 maxsize=256):
+        super(ExceptionDispatcher, self).__init__()
+        if match not in MATCH_MODES:
+            raise ValueError('match should be one of %s but %r is specified'
+                             % (', '.join(MATCH_MODES), match))
+        if not isinstance(exceptions, dict):
+            exceptions = dict((x, substitute) for x in exceptions)
+        self.substitutes = dict((k, as_substitute_function(v))
+                                for k, v in exceptions.items())
+        self.match = match
+        self.maxsize = maxsize
+
+    def __missing__(self, cls):
+        substitute = self.resolve(cls)
+        if len(self) >= self.maxsize:
+            self.clear()
+        self[cls] = substitute
+        return substitute
+
+    def resolve(self, cls):
+        """
+        Resolve a substitute function of the exception class without cache
+        """
+        if self.match == 'exact':
+            return self.substitutes.get(cls)
+        # old-style classes in Python 2 do not have __mro__
+        for base in getattr(cls, '__mro__', (cls,)):
+            if base in self.substitutes:
+                return self.substitutes[base]
+        return None
+
+
+def as_substitute_function(substitute):
+    """
+    Return a function which return the substitute
+
+    Callable substitute is returned as it is.
+
+    Examples
+    --------
+    >>> as_substitute_function('foo')(1, 2, bar='bar')
+    'foo'
+    >>> as_substitute_function(len)('foo')
+    3
+    """
+    if hasattr(substitute, '__call__'):
+        return substitute
+    def substitute_function(*args, **kwargs):
+        return substitute
+    return substitute_function
+
+
+def is_coroutine_function(fn):
+    """
+    Return ``True`` if the function is a coroutine function (``async def``)
+    """
+    return bool(_get_code_flags(fn) & CO_COROUTINE)
+
+
+def is_async_generator_function(fn):
+    """
+    Return ``True`` if the function is an asynchronous generator function
+    """
+    return bool(_get_code_flags(fn) & CO_ASYNC_GENERATOR)
+
+
+def _get_code_flags(fn):
+    # bound methods forward the attribute access to the function
+    code = getattr(fn, '__code__', None)
+    return getattr(code, 'co_flags', 0)
+
+
+def get_thread_pool(name):
+    """
+    Return a thread pool shared by policies with the name
+
+    The pool is created at the first call with :data:`DEFAULT_MAX_WORKERS`
+    threads. Policies which wait for calls in a pool (e.g. timeout) should
+    not share the pool with policies called in it to prevent deadlocks.
+    ``concurrent.futures`` (``futures`` package in Python 2) is required.
+    """
+    with _thread_pools_lock:
+        pool = _thread_pools.get(name)
+        if pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            pool = _thread_pools[name] = ThreadPoolExecutor(
+                DEFAULT_MAX_WORKERS)
+    return pool
+
+
+def get_class_name(cls):
+    """
+    Return the name of the class qualified by the module unless it is builtin
+
+    Examples
+    --------
+    >>> get_class_name(ValueError)
+    'ValueError'
+    >>> get_class_name(ExceptionDispatcher)
+    'tolerance.utils.ExceptionDispatcher'
+    """
+    if cls.__module__ in ('builtins', '__builtin__', 'exceptions'):
+        return cls.__name__
+    return '%s.%s' % (cls.__module__, cls.__name__)
+
+
+def move_to_end(entries, key):
+    """
+    Move the key to the end of the OrderedDict to mark it as the most
+    recently used
+
+    The key which has been removed (e.g. evicted by another thread) is
+    ignored.
+
+    Examples
+    --------
+    >>> from collections import OrderedDict
+    >>> entries = OrderedDict([('a', 1), ('b', 2)])
+    >>> move_to_end(entries, 'a')
+    >>> move_to_end(entries, 'c')
+    >>> list(entries)
+    ['b', 'a']
+    """
+    try:
+        entries.move_to_end(key)
+    except KeyError:
+        pass
+    except AttributeError:
+        # OrderedDict.move_to_end was introduced from Python 3.2
+        entry = entries.pop(key, None)
+        if entry is not None:
+            entries[key] = entry
+
+
+class _ThreadLocalVar(object):
+    # a fallback of contextvars.ContextVar which is scoped to threads
+    _missing = object()
+
+    def __init__(self, name, default=None):
+        self.name = name
+        self._default = default
+        self._local = threading.local()
+
+    def get(self):
+        return getattr(self._local, 'value', self._default)
+
+    def set(self, value):
+        token = getattr(self._local, 'value', self._missing)
+        self._local.value = value
+        return token
+
+    def reset(self, token):
+        if token is self._missing:
+            del self._local.value
+        else:
+            self._local.value = token
+
+
+if ContextVar is None:
+    ContextVar = _ThreadLocalVar
+
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod()
@@ -0,0 +1,212 @@
+# coding=utf-8
+"""
+tolerance vectorize module
+
+A function which apply a tolerant whole-array operation (e.g.
+``arr.astype(int)``) to a NumPy array and fall back to the substitute only for
+the failing elements. NumPy is imported when the function is called so it
+remains an optional dependency.
+The function is available as ``tolerate.vectorize``.
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+
+LEAF_SIZE = 64
+"""A size of chunks which are processed element by element"""
+
+FANOUT = 16
+"""A number of parts which a failing chunk is split into"""
+
+DENSE_SIZE = 4096
+"""A size of chunks processed by ``elementwise`` when all parts fail"""
+
+FAILURES_FORMATS = (None, 'mask', 'index')
+"""Available formats of failures returned by :func:`tolerant_vectorize`"""
+
+
+def tolerant_vectorize(fn, array, failures=None, elementwise=None):
+    """
+    Apply a tolerant elementwise array operation to the array
+
+    The operation is applied to the whole array first. Only if it fails, the
+    array is split into :data:`FANOUT` parts recursively to find failing
+    elements and the substitute of the
+    tolerant function is used for them; a constant substitute is used as it
+    is while a substitute function is called with each failing element.
+    Chunks smaller than :data:`LEAF_SIZE` are processed element by element.
+    Unlisted exceptions in ``exceptions`` are raised from the failing element.
+
+    Splitting pays off when failures are sparse. When :attr:`elementwise` is
+    specified, it is used to process elements one by one instead of calling
+    :attr:`fn` with 1-element arrays, and chunks smaller than
+    :data:`DENSE_SIZE` whose all parts fail (that is, failures are dense)
+    are processed by it without further splitting.
+
+    The dtype of the result is the dtype of successful results if the
+    substitutes are compatible with it (e.g. NaN for floats), otherwise
+    ``object``.
+
+    Parameters
+    ----------
+    fn : function
+        A tolerant function decorated by
+        :func:`tolerance.decorators.tolerate` which receive an 1-D array and
+        return an array of the same length (an elementwise operation).
+        A non tolerant function is decorated by ``tolerate()``.
+    array : array_like
+        An array passed to :attr:`fn`. Multi-dimensional arrays are
+        flattened and the result is reshaped back.
+    failures : None, 'mask', or 'index'
+        If ``'mask'`` is specified, a boolean array which indicate failed
+        elements is returned as well.
+        If ``'index'`` is specified, an array of (flat) indexes of failed
+        elements is returned as well.
+    elementwise : function or None
+        A function which apply the operation of :attr:`fn` to a single
+        element (e.g. ``int`` for ``lambda x: x.astype(int)``).
+
+    Returns
+    -------
+    ndarray or tuple
+        An array of results or a tuple of an array of results and failures.
+
+    Examples
+    --------
+    NumPy is an optional dependency so the examples are not tested.
+
+    >>> import numpy as np                              # doctest: +SKIP
+    >>> from tolerance.decorators import tolerate
+    >>> to_int = tolerate(-1)(lambda x: x.astype(int))
+    >>> array = np.array(['0', '1', 'two', '3'])        # doctest: +SKIP
+    >>> tolerant_vectorize(to_int, array)               # doctest: +SKIP
+    array([ 0,  1, -1,  3])
+    >>> prefer_int = tolerate(lambda x: x)(lambda x: x.astype(int))
+    >>> result, mask = tolerant_vectorize(prefer_int, ['0', 'one'],
+    ...                                   failures='mask')  # doctest: +SKIP
+    >>> result[0] == 0, result[1] == 'one'              # doctest: +SKIP
+    (True, True)
+    >>> result.dtype, mask.tolist()                     # doctest: +SKIP
+    (dtype('O'), [False, True])
+    >>> tolerant_vectorize(to_int, array, elementwise=int)  # doctest: +SKIP
+    array([ 0,  1, -1,  3])
+    """
+    import numpy as np
+    from tolerance.decorators import get_configuration
+    if failures not in FAILURES_FORMATS:
+        raise ValueError('failures should be one of %s but %r is specified'
+                         % (', '.join(map(repr, FAILURES_FORMATS)), failures))
+    configuration = get_configuration(fn)
+    fn = configuration.fn
+    handle = configuration.handle
+    array = np.asarray(array)
+    flat = array.reshape(-1)
+    if not configuration.is_tolerant():
+        # the tolerance is turned off so call normally.
+        return _with_failures(np, fn(flat).reshape(array.shape),
+                              np.zeros(array.shape, dtype=bool), failures)
+    try:
+        result = fn(flat)
+    except:
+        pass
+    else:
+        return _with_failures(np, result.reshape(array.shape),
+                              np.zeros(array.shape, dtype=bool), failures)
+    # successful results (start, stop, array) and substitutes (index, value)
+    chunks = []
+    substitutes = []
+    _split(fn, elementwise, handle, flat, 0, len(flat), chunks, substitutes)
+    chunks = [(start, stop, np.asarray(x)) for start, stop, x in chunks]
+    dtype = _result_dtype(np, [x[2].dtype for x in chunks],
+                          [x[1] for x in substitutes])
+    result = np.empty(len(flat), dtype=dtype)
+    for start, stop, chunk in chunks:
+        result[start:stop] = chunk
+    # assign one by one to prevent sequence substitutes from broadcast
+    for index, value in substitutes:
+        result[index] = value
+    indexes = np.array([x[0] for x in substitutes], dtype=np.intp)
+    mask = np.zeros(len(flat), dtype=bool)
+    mask[indexes] = True
+    return _with_failures(np, result.reshape(array.shape),
+                          mask.reshape(array.shape), failures)
+
+
+def _split(fn, elementwise, handle, flat, start, stop, chunks, substitutes):
+    # `fn(flat[start:stop])` has failed so find failing elements in it
+    if stop - start <= LEAF_SIZE:
+        _leaf(fn, elementwise, handle, flat, start, stop, chunks, substitutes)
+        return
+    step = -(-(stop - start) // FANOUT)
+    parts = range(start, stop, step)
+    failed = []
+    for lower in parts:
+        upper = min(lower + step, stop)
+        try:
+            chunks.append((lower, upper, fn(flat[lower:upper])))
+        except:
+            failed.append((lower, upper))
+    dense = (elementwise is not None and stop - start <= DENSE_SIZE and
+             len(failed) == len(parts))
+    for lower, upper in failed:
+        if dense:
+            # failures are dense so splitting does not pay off
+            _leaf(fn, elementwise, handle, flat, lower, upper,
+                  chunks, substitutes)
+        else:
+            _split(fn, elementwise, handle, flat, lower, upper,
+                   chunks, substitutes)
+
+
+def _leaf(fn, elementwise, handle, flat, start, stop, chunks, substitutes):
+    if elementwise is None:
+        for index in range(start, stop):
+            try:
+                chunks.append((index, index + 1, fn(flat[index:index+1])))
+            except:
+                substitutes.append((index, handle((flat[index],), {})))
+        return
+    values = []
+    succeeded = _MISSING
+    for index in range(start, stop):
+        try:
+            value = elementwise(flat[index])
+        except:
+            substitutes.append((index, handle((flat[index],), {})))
+            value = _MISSING
+        else:
+            succeeded = value
+        values.append(value)
+    if succeeded is not _MISSING:
+        # fill failed positions with a successful value to keep the dtype,
+        # they are overwritten by substitutes later
+        values = [succeeded if x is _MISSING else x for x in values]
+        chunks.append((start, stop, values))
+
+
+def _result_dtype(np, dtypes, values):
+    if not values:
+        return np.result_type(*dtypes)
+    try:
+        substitute_dtype = np.asarray(values).dtype
+    except ValueError:
+        # e.g. sequences of different lengths
+        return np.dtype(object)
+    if not dtypes:
+        return substitute_dtype
+    dtype = np.result_type(*dtypes)
+    numeric = 'biufc'
+    if dtype.kind in numeric and substitute_dtype.kind in numeric:
+        return np.result_type(dtype, substitute_dtype)
+    elif dtype.kind == substitute_dtype.kind and dtype.kind != 'O':
+        return np.result_type(dtype, substitute_dtype)
+    return np.dtype(object)
+
+
+_MISSING = object()
+
+
+def _with_failures(np, result, mask, failures):
+    if failures is None:
+        return result
+    elif failures == 'index':
+        return result, np.flatnonzero(mask)
+    return result, mask
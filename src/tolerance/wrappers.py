@@ -0,0 +1,456 @@
+# coding=utf-8
+"""
+tolerance wrapper module
+
+Tolerant functions made of slotted objects instead of closures. A
+:class:`TolerantFunction` keeps only the function and :class:`Settings`
+which can be shared by many functions, so decorating tens of thousands of
+functions costs a small object for each and the configuration can be
+inspected and replaced after decoration. :func:`tolerate_all` applies
+shared settings to every matching function of a class or a module.
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+from types import MethodType
+from types import ModuleType
+from types import FunctionType
+from tolerance.decorators import DEFAULT_TOLERATE_SWITCH
+from tolerance.decorators import Configuration
+from tolerance.decorators import get_scope
+from tolerance.decorators import normalize_switch
+from tolerance.decorators import _build_failure_handler
+from tolerance.utils import MATCH_MODES
+from tolerance.utils import is_argument_switch
+from tolerance.utils import is_coroutine_function
+from tolerance.utils import is_async_generator_function
+
+
+class Settings(object):
+    """
+    An immutable configuration of tolerant functions
+
+    It holds the substitute, the exceptions, the switch, and the match mode
+    of ``tolerate`` and a failure handler built from them, and it is shared
+    by :class:`TolerantFunction` instances. Call it with a function to make
+    a tolerant function.
+
+    Parameters
+    ----------
+    substitute, exceptions, switch, match
+        See :func:`tolerance.decorators.tolerate`.
+
+    Examples
+    --------
+    >>> settings = Settings(substitute=-1, exceptions=[ValueError])
+    >>> parse_int = settings(int)
+    >>> parse_float = settings(float)
+    >>> parse_int('zero'), parse_float('zero')
+    (-1, -1)
+    >>> parse_int.settings is parse_float.settings
+    True
+    >>> settings.substitute = 0
+    Traceback (most recent call last):
+        ...
+    AttributeError: Settings is immutable; use replace() instead
+    >>> settings.replace(substitute=0)(int)('zero')
+    0
+    """
+    __slots__ = ('substitute', 'exceptions', 'switch', 'match', 'handle',
+                 'argument')
+
+    def __init__(self, substitute=None, exceptions=None,
+                 switch=DEFAULT_TOLERATE_SWITCH, match='exact'):
+        if match not in MATCH_MODES:
+            raise ValueError('match should be one of %s but %r is specified'
+                             % (', '.join(MATCH_MODES), match))
+        switch = normalize_switch(switch)
+        if is_argument_switch(switch):
+            # the switch is inlined in TolerantFunction.__call__
+            argument = (switch.argument_name, switch.default,
+                        switch.reverse, switch.keep)
+        else:
+            argument = None
+        setattr = super(Settings, self).__setattr__
+        setattr('substitute', substitute)
+        setattr('exceptions', exceptions)
+        setattr('switch', switch)
+        setattr('match', match)
+        setattr('handle', _build_failure_handler(substitute, exceptions,
+                                                 match))
+        setattr('argument', argument)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Settings is immutable; use replace() instead')
+
+    def __repr__(self):
+        return '<Settings: substitute=%r, exceptions=%r, match=%r>' % (
+            self.substitute, self.exceptions, self.match)
+
+    def __call__(self, fn):
+        return TolerantFunction(fn, self)
+
+    def replace(self, **kwargs):
+        """
+        Return new settings with the specified values replaced
+        """
+        for name in ('substitute', 'exceptions', 'switch', 'match'):
+            kwargs.setdefault(name, getattr(self, name))
+        return Settings(**kwargs)
+
+    def bind(self, fn):
+        """
+        Return settings whose switch is bound to :attr:`fn` if it is required
+
+        Switches made by
+        :func:`tolerance.utils.signature_switch_generator` depend on the
+        signature of the function so such settings cannot be shared.
+        """
+        bind = getattr(self.switch, 'bind', None)
+        if bind is None:
+            return self
+        return self.replace(switch=bind(fn))
+
+
+class _FunctionAttribute(object):
+    """
+    A descriptor which return an attribute of the function of the instance
+    and the attribute of the class itself when it is accessed via the class
+    """
+    def __init__(self, name, default):
+        self.name = name
+        self.default = default
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self.default
+        return getattr(instance.fn, self.name)
+
+
+class TolerantFunction(object):
+    """
+    A slotted callable object which call a function tolerantly
+
+    It behaves as a function decorated by
+    :func:`tolerance.decorators.tolerate` without policies. Only the
+    function and shared :class:`Settings` are kept in each instance (no
+    closure and no copy of ``__dict__``) and ``__name__``, ``__doc__``, and
+    other attributes are read from the function on demand (``__module__``
+    is the module of this class as it is required by the class).
+    It implements ``__get__`` so it works as a method like functions do.
+    The configuration can be inspected as attributes and replaced by
+    assigning them, which replaces :attr:`settings` of the instance only.
+    A call costs about 100 ns more than a closure of ``tolerate`` (see
+    ``benchmarks/bench_memory.py`` for the memory) so prefer ``tolerate``
+    for functions which are called in tight loops.
+
+    Parameters
+    ----------
+    fn : function
+        A function to call.
+    settings : :class:`Settings` or None
+        Settings of the call. Default settings are used if ``None`` is
+        specified.
+
+    Attributes
+    ----------
+    fn : function
+        The function.
+    settings : :class:`Settings`
+        The settings; ``substitute``, ``exceptions``, ``switch``, and
+        ``match`` are available as attributes of the instance as well.
+
+    Examples
+    --------
+    >>> from tolerance.decorators import tolerate
+    >>> @tolerate.slotted(substitute=-1)
+    ... def parse(x):
+    ...     return int(x)
+    >>> parse('zero'), parse.substitute
+    (-1, -1)
+    >>> parse.substitute = 0
+    >>> parse('zero')
+    0
+    >>> parse('zero', fail_silently=False)
+    Traceback (most recent call last):
+        ...
+    ValueError: ...
+    >>> class Model(object):
+    ...     @tolerate.slotted()
+    ...     def parse(self, x):
+    ...         return int(x)
+    >>> Model().parse('zero') is None
+    True
+    """
+    __slots__ = ('fn', 'settings')
+
+    def __init__(self, fn, settings=None):
+        if is_coroutine_function(fn) or is_async_generator_function(fn):
+            raise ValueError('asynchronous functions cannot be used with '
+                             'TolerantFunction; use tolerate instead')
+        if settings is None:
+            settings = Settings()
+        self.fn = fn
+        self.settings = settings.bind(fn)
+
+    def __call__(self, *args, **kwargs):
+        fn = self.fn
+        if get_scope().disabled:
+            # the function has disabled so call normally.
+            return fn(*args, **kwargs)
+        settings = self.settings
+        argument = settings.argument
+        if argument is not None:
+            argument_name, default, reverse, keep = argument
+            if argument_name in kwargs:
+                if keep:
+                    status = kwargs[argument_name]
+                else:
+                    status = kwargs.pop(argument_name)
+                if bool(status) is reverse:
+                    # the switch is turned off so call normally.
+                    return fn(*args, **kwargs)
+            elif not default:
+                # the switch is turned off so call normally.
+                return fn(*args, **kwargs)
+        elif settings.switch is not None:
+            status, args, kwargs = settings.switch(*args, **kwargs)
+            if not status:
+                # the switch function return `False` so call noramlly.
+                return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        except:
+            return settings.handle(args, kwargs)
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return MethodType(self, instance)
+
+    def __repr__(self):
+        return '<TolerantFunction: %s>' % getattr(self.fn, '__qualname__',
+                                                  self.fn.__name__)
+
+    def __getattr__(self, name):
+        # attributes of the function (e.g. __name__ or __dict__ items)
+        if name in TolerantFunction.__slots__:
+            # the instance has not been initialized (e.g. unpickling)
+            raise AttributeError(name)
+        return getattr(self.fn, name)
+
+    @property
+    def __wrapped__(self):
+        return self.fn
+
+    @property
+    def __tolerance__(self):
+        """
+        :class:`tolerance.decorators.Configuration` used by batch APIs
+        """
+        settings = self.settings
+        return Configuration(self.fn, settings.handle, settings.switch)
+
+    def _replace(self, **kwargs):
+        self.settings = self.settings.replace(**kwargs).bind(self.fn)
+
+    substitute = property(
+        lambda self: self.settings.substitute,
+        lambda self, value: self._replace(substitute=value),
+        doc='The substitute')
+    exceptions = property(
+        lambda self: self.settings.exceptions,
+        lambda self, value: self._replace(exceptions=value),
+        doc='Exceptions which are ignored')
+    switch = property(
+        lambda self: self.settings.switch,
+        lambda self, value: self._replace(switch=value),
+        doc='The switch function')
+    match = property(
+        lambda self: self.settings.match,
+        lambda self, value: self._replace(match=value),
+        doc='How exceptions are matched')
+
+    # `__doc__` of instances is the one of the function while the docstring
+    # above is kept for the class (it cannot be assigned after the class is
+    # created in Python 2)
+    __doc__ = _FunctionAttribute('__doc__', __doc__)
+
+
+def slotted(substitute=None, exceptions=None,
+            switch=DEFAULT_TOLERATE_SWITCH, match='exact'):
+    """
+    Return a decorator which make :class:`TolerantFunction`
+
+    It is available as ``tolerate.slotted`` and takes the same arguments as
+    :func:`tolerance.decorators.tolerate` without policies.
+    """
+    return Settings(substitute, exceptions, switch, match)
+
+
+class Application(object):
+    """
+    Tolerant functions applied to a class or a module by :func:`tolerate_all`
+
+    It keeps the original attributes so :meth:`undo` restores them with a
+    single ``setattr`` for each. It can be used as a context manager which
+    undo the application at the exit.
+
+    Attributes
+    ----------
+    target : class or module
+        A class or a module which the functions are applied to.
+    settings : :class:`Settings`
+        Settings shared by the tolerant functions.
+    """
+    __slots__ = ('target', 'settings', '_entries', '_functions')
+
+    def __init__(self, target, settings, entries, functions):
+        self.target = target
+        self.settings = settings
+        self._entries = entries
+        self._functions = functions
+
+    def __repr__(self):
+        return '<Application: %d attributes of %r>' % (len(self._entries),
+                                                       self.target)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.undo()
+
+    @property
+    def names(self):
+        """
+        Names of the replaced attributes
+        """
+        return [entry[0] for entry in self._entries]
+
+    def reconfigure(self, settings):
+        """
+        Replace the settings of every applied tolerant function
+        """
+        for function in self._functions:
+            function.settings = settings.bind(function.fn)
+        self.settings = settings
+
+    def undo(self):
+        """
+        Restore the original attributes
+
+        Attributes which have been replaced by others after the application
+        are left as they are.
+        """
+        target = self.target
+        namespace = vars(target)
+        for name, original, replacement in self._entries:
+            if namespace.get(name) is replacement:
+                setattr(target, name, original)
+        self._entries = []
+        self._functions = []
+
+
+def tolerate_all(target, names='*', settings=None):
+    """
+    Make every matching function of a class or a module tolerant
+
+    Functions, static methods, class methods, and accessors of properties
+    defined in :attr:`target` are replaced by :class:`TolerantFunction`
+    which share :attr:`settings`, so a single configuration is kept in
+    memory for all of them. Inherited attributes, dunder names (e.g.
+    ``__init__``), coroutine functions, and functions imported into a module
+    from other modules are left as they are. Note that references taken
+    before the application (e.g. ``from module import function``) are not
+    replaced.
+    It is available as ``tolerate.all``.
+
+    Parameters
+    ----------
+    target : class or module
+        A class or a module whose functions are replaced.
+    names : string, list of string, regular expression, or function
+        A glob pattern (or a list of them), a compiled regular expression
+        (``search`` is used), or a function which receives a name and
+        return whether the attribute is replaced.
+    settings : :class:`Settings` or None
+        Settings shared by the tolerant functions. Default settings are used
+        if ``None`` is specified.
+
+    Returns
+    -------
+    :class:`Application`
+        An object which undo the application or replace the settings.
+
+    Examples
+    --------
+    >>> from tolerance.decorators import tolerate
+    >>> class Model(object):
+    ...     def get_age(self, value):
+    ...         return int(value)
+    ...     @staticmethod
+    ...     def get_ratio(value):
+    ...         return float(value)
+    ...     @property
+    ...     def name(self):
+    ...         raise KeyError
+    >>> application = tolerate.all(Model, 'get_*',
+    ...                            settings=tolerate.slotted(-1))
+    >>> sorted(application.names)
+    ['get_age', 'get_ratio']
+    >>> Model().get_age('zero'), Model.get_ratio('zero')
+    (-1, -1)
+    >>> application.undo()
+    >>> Model().get_age('zero')
+    Traceback (most recent call last):
+        ...
+    ValueError: ...
+    """
+    if settings is None:
+        settings = Settings()
+    match = _build_name_matcher(names)
+    module = target.__name__ if isinstance(target, ModuleType) else None
+    entries = []
+    functions = []
+
+    def wrap(fn):
+        if module is not None and getattr(fn, '__module__', None) != module:
+            # imported from other modules
+            return None
+        if is_coroutine_function(fn) or is_async_generator_function(fn):
+            return None
+        function = TolerantFunction(fn, settings)
+        functions.append(function)
+        return function
+    for name, value in list(vars(target).items()):
+        if name.startswith('__') and name.endswith('__'):
+            continue
+        if not match(name):
+            continue
+        replacement = None
+        if isinstance(value, (staticmethod, classmethod)):
+            function = wrap(value.__func__)
+            if function is not None:
+                replacement = type(value)(function)
+        elif isinstance(value, property):
+            accessors = [x if x is None else wrap(x) or x
+                         for x in (value.fget, value.fset, value.fdel)]
+            if any(isinstance(x, TolerantFunction) for x in accessors):
+                replacement = property(*accessors, doc=value.__doc__)
+        elif isinstance(value, FunctionType):
+            replacement = wrap(value)
+        if replacement is not None:
+            setattr(target, name, replacement)
+            entries.append((name, value, replacement))
+    return Application(target, settings, entries, functions)
+
+
+def _build_name_matcher(names):
+    if hasattr(names, 'search'):
+        return lambda name: names.search(name) is not None
+    if hasattr(names, '__call__'):
+        return names
+    if isinstance(names, basestring):
+        names = [names]
+    from fnmatch import fnmatchcase
+    patterns = list(names)
+    return lambda name: any(fnmatchcase(name, x) for x in patterns)
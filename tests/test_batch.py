@@ -0,0 +1,117 @@
+#!/usr/bin/env nosetests -v
+# coding=utf-8
+"""
+A unit test module of ``tolerance.batch``
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+from nose.tools import *
+from tolerance.decorators import tolerate
+from tolerance.batch import tolerant_map
+from tolerance.batch import tolerant_imap
+
+
+prefer_int = tolerate(lambda x: x)(int)
+
+def test_tolerate_provide_batch_api():
+    """
+    tolerate provide batch api
+    """
+    ok_(tolerate.map is tolerant_map)
+    ok_(tolerate.imap is tolerant_imap)
+
+def test_tolerant_map_return_results():
+    """
+    tolerant_map return results
+    """
+    eq_(tolerant_map(prefer_int, ['0', 'one', '2']), [0, 'one', 2])
+    eq_(tolerant_map(prefer_int, iter(['0', 'one', '2'])), [0, 'one', 2])
+    eq_(tolerant_map(prefer_int, []), [])
+
+def test_tolerant_map_return_failures():
+    """
+    tolerant_map return failures
+    """
+    results, mask = tolerant_map(prefer_int, ['a', '1', 'b'],
+                                 failures='mask')
+    eq_(results, ['a', 1, 'b'])
+    eq_(mask, [True, False, True])
+    results, indexes = tolerant_map(prefer_int, ['a', '1', 'b'],
+                                    failures='index')
+    eq_(results, ['a', 1, 'b'])
+    eq_(indexes, [0, 2])
+
+@raises(ValueError)
+def test_tolerant_map_raise_if_failures_is_unknown():
+    """
+    tolerant_map raise if failures is unknown
+    """
+    tolerant_map(prefer_int, [], failures='unknown')
+
+@raises(ValueError)
+def test_tolerant_map_raise_if_exception_is_not_found():
+    """
+    tolerant_map raise if exception is not found in exceptions
+    """
+    fn = tolerate(exceptions=[KeyError])(int)
+    tolerant_map(fn, ['0', 'one'])
+
+@raises(ValueError)
+def test_tolerant_map_raise_if_switch_fail():
+    """
+    tolerant_map raise if switch fail
+    """
+    fn = tolerate(switch={'default': False})(int)
+    tolerant_map(fn, ['0', 'one'])
+
+def test_tolerant_map_raise_if_disabled():
+    """
+    tolerant_map raise if disabled
+    """
+    tolerate.disabled = True
+    try:
+        assert_raises(ValueError, tolerant_map, prefer_int, ['0', 'one'])
+    finally:
+        tolerate.disabled = False
+
+def test_tolerant_map_decorate_non_tolerant_function():
+    """
+    tolerant_map decorate non tolerant function
+    """
+    eq_(tolerant_map(int, ['0', 'one']), [0, None])
+
+def test_tolerant_imap_is_lazy():
+    """
+    tolerant_imap is lazy
+    """
+    consumed = []
+    def iterable():
+        for x in ('0', 'one', '2'):
+            consumed.append(x)
+            yield x
+    results = tolerant_imap(prefer_int, iterable())
+    eq_(consumed, [])
+    eq_(next(results), 0)
+    eq_(consumed, ['0'])
+    eq_(list(results), ['one', 2])
+
+def test_tolerant_imap_yield_failures():
+    """
+    tolerant_imap yield failures
+    """
+    results = tolerant_imap(prefer_int, ['0', 'one'], failures=True)
+    eq_(list(results), [(0, False), ('one', True)])
+    fn = tolerate(switch={'default': False})(int)
+    results = tolerant_imap(fn, ['0', '1'], failures=True)
+    eq_(list(results), [(0, False), (1, False)])
+    assert_raises(ValueError, list, tolerant_imap(fn, ['one']))
+
+def test_tolerant_map_use_configuration_of_outer_wrapper():
+    """
+    tolerant_map use the outer wrapper of a tolerant function
+    """
+    def parse_all(rows):
+        return (int(row) for row in rows)
+    outer = tolerate(iteration='skip')(tolerate('inner')(parse_all))
+    ok_('__tolerance__' not in outer.__dict__)
+    results = tolerant_map(outer, [['0', 'one', '2']])
+    eq_([list(x) for x in results], [[0]])
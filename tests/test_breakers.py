@@ -0,0 +1,219 @@
+#!/usr/bin/env nosetests -v
+# coding=utf-8
+"""
+A unit test module of ``tolerance.breakers``
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import threading
+from nose.tools import *
+from tolerance.decorators import tolerate
+from tolerance.breakers import CircuitBreaker
+from tolerance.breakers import CircuitOpen
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class Service(object):
+    # functools.wraps requires __name__ in Python 2
+    __name__ = 'service'
+
+    def __init__(self):
+        self.calls = 0
+        self.failing = True
+
+    def __call__(self, x=None):
+        self.calls += 1
+        if self.failing:
+            raise IOError
+        return 'ok'
+
+
+def build(breaker, **kwargs):
+    service = Service()
+    return tolerate('substitute', breaker=breaker, **kwargs)(service), service
+
+
+def test_circuit_breaker_open_after_consecutive_failures():
+    """
+    CircuitBreaker should open after the threshold consecutive failures
+    """
+    breaker = CircuitBreaker(threshold=3)
+    fn, service = build(breaker)
+    for i in range(5):
+        eq_(fn(), 'substitute')
+    eq_(service.calls, 3)
+    eq_(breaker.state, 'open')
+    eq_(breaker.opened, 1)
+
+
+def test_circuit_breaker_reset_consecutive_failures_on_success():
+    """
+    CircuitBreaker should count only consecutive failures
+    """
+    breaker = CircuitBreaker(threshold=3)
+    fn, service = build(breaker)
+    fn()
+    fn()
+    service.failing = False
+    fn()
+    service.failing = True
+    fn()
+    fn()
+    eq_(breaker.state, 'closed')
+    fn()
+    eq_(breaker.state, 'open')
+
+
+def test_circuit_breaker_open_by_failure_rate():
+    """
+    CircuitBreaker should open when the failure rate reaches the rate
+    """
+    breaker = CircuitBreaker(threshold=2, rate=0.5, window=4)
+    fn, service = build(breaker)
+    service.failing = False
+    fn()
+    fn()
+    fn()
+    service.failing = True
+    fn()        # 1 / 4
+    eq_(breaker.state, 'closed')
+    fn()        # 2 / 4
+    eq_(breaker.state, 'open')
+
+
+def test_circuit_breaker_window_slides():
+    """
+    CircuitBreaker should forget calls out of the window
+    """
+    breaker = CircuitBreaker(threshold=2, rate=0.5, window=4)
+    fn, service = build(breaker)
+    fn()        # 1 / 1
+    service.failing = False
+    for i in range(4):
+        fn()    # the failure goes out of the window
+    service.failing = True
+    fn()        # 1 / 4
+    eq_(breaker.state, 'closed')
+
+
+def test_circuit_breaker_half_open_after_cooldown():
+    """
+    CircuitBreaker should probe after cooldown and close on success
+    """
+    clock = Clock()
+    breaker = CircuitBreaker(threshold=1, cooldown=10, clock=clock)
+    fn, service = build(breaker)
+    fn()
+    eq_(breaker.state, 'open')
+    clock.now = 9
+    fn()
+    eq_(service.calls, 1)
+    clock.now = 10
+    service.failing = False
+    eq_(fn(), 'ok')
+    eq_(service.calls, 2)
+    eq_(breaker.state, 'closed')
+
+
+def test_circuit_breaker_reopen_when_probe_fails():
+    """
+    CircuitBreaker should open again when the probe fails
+    """
+    clock = Clock()
+    breaker = CircuitBreaker(threshold=1, cooldown=10, clock=clock)
+    fn, service = build(breaker)
+    fn()
+    clock.now = 10
+    fn()
+    eq_(service.calls, 2)
+    eq_(breaker.state, 'open')
+    eq_(breaker.opened, 2)
+    clock.now = 19
+    fn()
+    eq_(service.calls, 2)
+
+
+def test_circuit_breaker_limit_concurrent_probes():
+    """
+    CircuitBreaker should allow only probes calls in the half-open state
+    """
+    clock = Clock()
+    breaker = CircuitBreaker(threshold=1, cooldown=10, probes=1,
+                             clock=clock)
+    fn, service = build(breaker)
+    fn()
+    clock.now = 10
+    token = breaker.before((), {})
+    eq_(token, 'half-open')
+    eq_(breaker.before((), {}).type, CircuitOpen)
+    breaker.release(token)
+    eq_(breaker.before((), {}), 'half-open')
+
+
+def test_circuit_breaker_use_substitute_for_circuit_open():
+    """
+    CircuitBreaker should use the substitute specified for CircuitOpen
+    """
+    breaker = CircuitBreaker(threshold=1)
+    service = Service()
+    fn = tolerate(exceptions={IOError: 'failed', CircuitOpen: 'open'},
+                  breaker=breaker)(service)
+    eq_(fn(), 'failed')
+    eq_(fn(), 'open')
+
+
+def test_circuit_breaker_ignore_exceptions_which_are_raised():
+    """
+    CircuitBreaker should not count exceptions which are not ignored
+    """
+    breaker = CircuitBreaker(threshold=1)
+    fn, service = build(breaker, exceptions=[KeyError])
+    assert_raises(IOError, fn)
+    assert_raises(IOError, fn)
+    eq_(breaker.state, 'closed')
+
+
+def test_circuit_breaker_reset():
+    """
+    CircuitBreaker.reset should close the circuit
+    """
+    breaker = CircuitBreaker(threshold=1)
+    fn, service = build(breaker)
+    fn()
+    breaker.reset()
+    eq_(breaker.state, 'closed')
+    fn()
+    eq_(service.calls, 2)
+
+
+def test_circuit_breaker_is_shared_between_threads():
+    """
+    CircuitBreaker should open once under many threads
+    """
+    breaker = CircuitBreaker(threshold=10, cooldown=60)
+    fn, service = build(breaker)
+
+    def worker():
+        for i in range(100):
+            fn()
+    threads = [threading.Thread(target=worker) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    eq_(breaker.opened, 1)
+    ok_(service.calls < 100)
+
+
+@raises(ValueError)
+def test_circuit_breaker_raise_value_error_for_invalid_rate():
+    """
+    CircuitBreaker should raise ValueError when rate is not in (0, 1]
+    """
+    CircuitBreaker(rate=1.5)
@@ -0,0 +1,361 @@
+#!/usr/bin/env nosetests -v
+# coding=utf-8
+"""
+A unit test module of ``tolerance.bulkheads``
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import threading
+from nose import SkipTest
+from nose.tools import *
+from tolerance.decorators import tolerate
+from tolerance.bulkheads import Bulkhead
+from tolerance.bulkheads import AdaptiveLimit
+from tolerance.bulkheads import BulkheadFull
+from tolerance.timeouts import Timeout
+
+
+def build_blocking(bulkhead, **kwargs):
+    event = threading.Event()
+    calls = []
+
+    def fn(x):
+        calls.append(x)
+        event.wait(5)
+        return x
+    return tolerate('busy', max_concurrency=bulkhead, **kwargs)(fn), \
+        event, calls
+
+
+def start(fn, *args):
+    results = []
+    thread = threading.Thread(target=lambda: results.append(fn(*args)))
+    thread.start()
+    return thread, results
+
+
+def wait_until(predicate):
+    event = threading.Event()
+    for i in range(5000):
+        if predicate():
+            return
+        event.wait(0.001)
+    ok_(False, 'the condition is not satisfied')
+
+
+def test_bulkhead_shed_calls_over_the_limit():
+    """
+    Bulkhead should return the substitute without calling the function
+    """
+    bulkhead = Bulkhead(max_concurrency=2)
+    fn, event, calls = build_blocking(bulkhead)
+    threads = [start(fn, i) for i in range(2)]
+    wait_until(lambda: len(calls) == 2)
+    eq_(fn(2), 'busy')
+    eq_(fn(3), 'busy')
+    eq_(bulkhead.in_flight, 2)
+    eq_(bulkhead.rejected, 2)
+    eq_(sorted(calls), [0, 1])
+    event.set()
+    for thread, results in threads:
+        thread.join()
+        eq_(len(results), 1)
+    eq_(bulkhead.in_flight, 0)
+    eq_(fn(4), 4)
+
+
+def test_bulkhead_accept_number():
+    """
+    tolerate should accept a number of concurrent calls as max_concurrency
+    """
+    fn, event, calls = build_blocking(1)
+    thread, results = start(fn, 0)
+    wait_until(lambda: calls)
+    eq_(fn(1), 'busy')
+    event.set()
+    thread.join()
+    eq_(results, [0])
+
+
+def test_bulkhead_hand_slot_over_to_waiter():
+    """
+    Bulkhead should let calls in the queue wait for a slot
+    """
+    bulkhead = Bulkhead(max_concurrency=1, max_queue=1)
+    fn, event, calls = build_blocking(bulkhead)
+    first, first_results = start(fn, 0)
+    wait_until(lambda: calls)
+    second, second_results = start(fn, 1)
+    wait_until(lambda: bulkhead.queued)
+    eq_(fn(2), 'busy')
+    eq_(bulkhead.rejected, 1)
+    event.set()
+    first.join()
+    second.join()
+    eq_(calls, [0, 1])
+    eq_(second_results, [1])
+    eq_(bulkhead.in_flight, 0)
+    eq_(bulkhead.queued, 0)
+
+
+def test_bulkhead_reject_call_exceeded_queue_timeout():
+    """
+    Bulkhead should reject calls which wait longer than queue_timeout
+    """
+    bulkhead = Bulkhead(max_concurrency=1, max_queue=1, queue_timeout=0.01)
+    fn, event, calls = build_blocking(bulkhead)
+    thread, results = start(fn, 0)
+    wait_until(lambda: calls)
+    eq_(fn(1), 'busy')
+    eq_(bulkhead.rejected, 1)
+    eq_(bulkhead.queued, 0)
+    event.set()
+    thread.join()
+    eq_(bulkhead.in_flight, 0)
+
+
+def test_bulkhead_use_substitute_even_if_exceptions_is_specified():
+    """
+    tolerate should use the substitute for BulkheadFull which is not listed
+    """
+    bulkhead = Bulkhead(max_concurrency=1)
+    fn, event, calls = build_blocking(bulkhead, exceptions=[KeyError])
+    thread, results = start(fn, 0)
+    wait_until(lambda: calls)
+    eq_(fn(1), 'busy')
+    event.set()
+    thread.join()
+
+
+def test_bulkhead_keep_slot_of_timed_out_call():
+    """
+    Bulkhead should keep the slot until a timed-out call actually returns
+    """
+    try:
+        # futures package is required in Python 2
+        __import__('concurrent.futures')
+    except ImportError:
+        raise SkipTest('concurrent.futures is not available')
+    bulkhead = Bulkhead(max_concurrency=1)
+    timeout = Timeout(0.01, max_workers=2)
+    fn, event, calls = build_blocking(bulkhead, timeout=timeout)
+    eq_(fn(0), 'busy')
+    eq_(timeout.timeouts, 1)
+    eq_(fn(1), 'busy')
+    eq_(bulkhead.rejected, 1)
+    event.set()
+    timeout.executor.shutdown(wait=True)
+    eq_(bulkhead.in_flight, 0)
+
+
+def test_bulkhead_is_shared_between_threads():
+    """
+    Bulkhead should never run more calls than max_concurrency
+    """
+    bulkhead = Bulkhead(max_concurrency=3, max_queue=2)
+    lock = threading.Lock()
+    running = [0, 0]
+
+    @tolerate('busy', max_concurrency=bulkhead)
+    def fn():
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        threading.Event().wait(0.0005)
+        with lock:
+            running[0] -= 1
+        return 'done'
+    results = []
+
+    def worker():
+        for i in range(50):
+            results.append(fn())
+    threads = [threading.Thread(target=worker) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    ok_(running[1] <= 3, running[1])
+    eq_(results.count('busy'), bulkhead.rejected)
+    eq_(len(results), 400)
+    eq_(bulkhead.in_flight, 0)
+
+
+def test_bulkhead_use_substitute_of_bulkhead_full_when_listed():
+    """
+    tolerate should use the substitute of BulkheadFull listed in exceptions
+    """
+    bulkhead = Bulkhead(max_concurrency=1)
+    bulkhead.reserve()
+    fn = tolerate(exceptions={BulkheadFull: 'full'},
+                  max_concurrency=bulkhead)(int)
+    eq_(fn('0'), 'full')
+    # non-tolerant calls bypass the bulkhead
+    eq_(fn('0', fail_silently=False), 0)
+
+
+@raises(ValueError)
+def test_bulkhead_raise_value_error_for_invalid_max_concurrency():
+    """
+    Bulkhead should raise ValueError when max_concurrency is not positive
+    """
+    Bulkhead(max_concurrency=0)
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def build_timed(limit, clock):
+    @tolerate('busy', max_concurrency=limit)
+    def fn(latency):
+        clock.now += latency
+        return latency
+    return fn
+
+
+def test_adaptive_limit_aimd():
+    """
+    AdaptiveLimit should decrease the limit multiplicatively when slow and
+    increase it additively only while it is saturated
+    """
+    clock = Clock()
+    limit = AdaptiveLimit(initial=10, min_limit=2, algorithm='aimd',
+                          backoff=0.5, clock=clock)
+    fn = build_timed(limit, clock)
+    fn(0.1)
+    eq_(limit.min_latency, 0.1)
+    fn(0.3)
+    eq_(limit.limit, 5)
+    fn(0.3)
+    fn(0.3)
+    eq_(limit.limit, 2)     # min_limit
+    # a single call saturates the limit of 2 and adds 1 / limit but does
+    # not saturate the limit of 2.5
+    for i in range(5):
+        fn(0.1)
+    assert_almost_equal(limit._limit, 2.5)
+    limit = AdaptiveLimit(initial=10, algorithm='aimd', clock=clock)
+    fn = build_timed(limit, clock)
+    for i in range(20):
+        fn(0.1)
+    eq_(limit.limit, 10)
+    eq_([x[1] for x in limit.get_history()], [10])
+
+
+def test_adaptive_limit_decrease_once_for_concurrent_calls():
+    """
+    AdaptiveLimit should decrease the limit once for calls which started
+    before the last decrease
+    """
+    clock = Clock()
+    limit = AdaptiveLimit(initial=10, algorithm='aimd', backoff=0.5,
+                          clock=clock)
+    token = limit.before((), {})
+    clock.now = 0.1
+    limit.success(token, None)
+    tokens = [limit.before((), {}) for i in range(4)]
+    clock.now = 1
+    for token in tokens:
+        limit.success(token, None)
+    eq_(limit.limit, 5)
+    eq_(limit.in_flight, 0)
+    token = limit.before((), {})
+    clock.now = 2
+    limit.success(token, None)
+    eq_(limit.limit, 2)
+
+
+def test_adaptive_limit_gradient():
+    """
+    AdaptiveLimit should shrink the limit while the latency grows
+    """
+    clock = Clock()
+    limit = AdaptiveLimit(initial=100, algorithm='gradient', clock=clock)
+    fn = build_timed(limit, clock)
+    fn(0.1)
+    eq_(limit.limit, 100)
+    for i in range(20):
+        fn(1.0)
+    ok_(limit.limit < 50, limit.limit)
+    ok_(limit.latency > 0.5, limit.latency)
+    history = limit.get_history()
+    eq_(history[0][1], 100)
+    eq_(history[-1][1], limit.limit)
+
+
+def test_adaptive_limit_gradient_shrink_small_limit():
+    """
+    AdaptiveLimit should shrink a small limit while the latency grows
+    """
+    clock = Clock()
+    limit = AdaptiveLimit(initial=4, algorithm='gradient', clock=clock)
+    fn = build_timed(limit, clock)
+    fn(0.1)
+    eq_(limit.limit, 4)
+    for i in range(20):
+        fn(0.5 + 0.1 * i)
+    eq_(limit.limit, 1)     # min_limit
+
+
+def test_adaptive_limit_forget_minimum_latency_after_window():
+    """
+    AdaptiveLimit should use the minimum latency of the window
+    """
+    clock = Clock()
+    limit = AdaptiveLimit(window=1, clock=clock)
+    fn = build_timed(limit, clock)
+    fn(0.1)
+    fn(0.5)
+    eq_(limit.min_latency, 0.1)
+    clock.now = 2
+    fn(0.3)
+    fn(0.4)
+    assert_almost_equal(limit.min_latency, 0.3)
+
+
+def test_adaptive_limit_shed_calls_over_the_limit():
+    """
+    AdaptiveLimit should return the substitute for calls over the limit
+    """
+    limit = AdaptiveLimit(initial=1, max_limit=1)
+    fn, event, calls = build_blocking(limit)
+    thread, results = start(fn, 0)
+    wait_until(lambda: calls)
+    eq_(fn(1), 'busy')
+    eq_(limit.snapshot()['in_flight'], 1)
+    eq_(limit.snapshot()['rejected'], 1)
+    event.set()
+    thread.join()
+    eq_(results, [0])
+    eq_(limit.in_flight, 0)
+
+
+def test_adaptive_limit_shrink_for_timeouts():
+    """
+    AdaptiveLimit should shrink the limit for calls rejected by executors
+    """
+    try:
+        # futures package is required in Python 2
+        __import__('concurrent.futures')
+    except ImportError:
+        raise SkipTest('concurrent.futures is not available')
+    limit = AdaptiveLimit(initial=10, backoff=0.5)
+    timeout = Timeout(0.01, max_workers=1)
+    fn, event, calls = build_blocking(limit, timeout=timeout)
+    eq_(fn(0), 'busy')
+    eq_(limit.limit, 5)
+    eq_(limit.in_flight, 0)
+    event.set()
+    timeout.executor.shutdown(wait=True)
+
+
+@raises(ValueError)
+def test_adaptive_limit_raise_value_error_for_unknown_algorithm():
+    """
+    AdaptiveLimit should raise ValueError when algorithm is unknown
+    """
+    AdaptiveLimit(algorithm='unknown')
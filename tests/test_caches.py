@@ -0,0 +1,326 @@
+#!/usr/bin/env nosetests -v
+# coding=utf-8
+"""
+A unit test module of ``tolerance.caches``
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import threading
+from nose.tools import *
+from tolerance.decorators import tolerate
+from tolerance.caches import FailureCache
+from tolerance.caches import StaleCache
+from tolerance.breakers import CircuitBreaker
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def build(cache, **kwargs):
+    calls = []
+
+    def parse(x, base=10):
+        calls.append(x)
+        return int(x, base)
+    return tolerate(lambda *args, **kwargs: 'substitute', cache=cache,
+                    **kwargs)(parse), calls
+
+
+def test_failure_cache_skip_calls_with_failed_arguments():
+    """
+    FailureCache should return the substitute without calling fn for failed
+    arguments
+    """
+    cache = FailureCache()
+    fn, calls = build(cache)
+    eq_(fn('zero'), 'substitute')
+    eq_(fn('zero'), 'substitute')
+    eq_(fn('0'), 0)
+    eq_(fn('0'), 0)
+    eq_(calls, ['zero', '0', '0'])
+    eq_(cache.hits, 1)
+    eq_(cache.misses, 3)
+
+
+def test_failure_cache_key_contains_keyword_arguments():
+    """
+    FailureCache should distinguish keyword arguments
+    """
+    cache = FailureCache()
+    fn, calls = build(cache)
+    eq_(fn('f'), 'substitute')
+    eq_(fn('f', base=16), 15)
+    eq_(fn('f', base=10), 'substitute')
+    eq_(fn('f', base=10), 'substitute')
+    eq_(calls, ['f', 'f', 'f'])
+
+
+def test_failure_cache_use_substitute_of_the_exception():
+    """
+    FailureCache should use the substitute for the cached exception class
+    """
+    cache = FailureCache()
+
+    @tolerate(exceptions={KeyError: 'missing', TypeError: 'invalid'},
+              cache=cache)
+    def get(key):
+        return {'foo': 'bar'}[key]
+    eq_(get('baz'), 'missing')
+    eq_(get('baz'), 'missing')
+    eq_(get(['foo']), 'invalid')    # unhashable, not cached
+    eq_(get(('foo',)), 'missing')
+    eq_(get(('foo',)), 'missing')
+    eq_(cache.hits, 2)
+
+
+def test_failure_cache_does_not_cache_raised_exceptions():
+    """
+    FailureCache should not remember exceptions which are not ignored
+    """
+    cache = FailureCache()
+    fn, calls = build(cache, exceptions=[TypeError])
+    assert_raises(ValueError, fn, 'zero')
+    assert_raises(ValueError, fn, 'zero')
+    eq_(len(cache), 0)
+    eq_(len(calls), 2)
+
+
+def test_failure_cache_ignore_unhashable_arguments():
+    """
+    FailureCache should call fn every time for unhashable arguments
+    """
+    cache = FailureCache()
+    fn, calls = build(cache)
+    eq_(fn(['zero']), 'substitute')
+    eq_(fn(['zero']), 'substitute')
+    eq_(len(calls), 2)
+    eq_(len(cache), 0)
+    eq_(cache.hits, 0)
+
+
+def test_failure_cache_expire_entries():
+    """
+    FailureCache should forget failures when ttl has elapsed
+    """
+    clock = Clock()
+    cache = FailureCache(ttl=10, clock=clock)
+    fn, calls = build(cache)
+    fn('zero')
+    clock.now = 9
+    fn('zero')
+    eq_(len(calls), 1)
+    clock.now = 10
+    fn('zero')
+    eq_(len(calls), 2)
+    clock.now = 19
+    fn('zero')
+    eq_(len(calls), 2)
+
+
+def test_failure_cache_evict_least_recently_used_entries():
+    """
+    FailureCache should evict the least recently used entry when full
+    """
+    cache = FailureCache(maxsize=2)
+    fn, calls = build(cache)
+    fn('a')
+    fn('b')
+    fn('a')     # hit; 'b' becomes the least recently used
+    fn('c')     # evict 'b'
+    eq_(len(cache), 2)
+    ok_(('a',) in cache)
+    ok_(('b',) not in cache)
+    ok_(('c',) in cache)
+
+
+def test_failure_cache_clear():
+    """
+    FailureCache.clear should remove entries and reset counters
+    """
+    cache = FailureCache()
+    fn, calls = build(cache)
+    fn('zero')
+    fn('zero')
+    cache.clear()
+    eq_((len(cache), cache.hits, cache.misses), (0, 0, 0))
+    fn('zero')
+    eq_(len(calls), 2)
+
+
+def test_failure_cache_is_not_used_when_switch_is_off():
+    """
+    FailureCache should not be used when the tolerance is turned off
+    """
+    cache = FailureCache()
+    fn, calls = build(cache)
+    fn('zero')
+    assert_raises(ValueError, fn, 'zero', fail_silently=False)
+    eq_(cache.hits, 0)
+
+
+@raises(ValueError)
+def test_failure_cache_raise_value_error_for_invalid_maxsize():
+    """
+    FailureCache should raise ValueError when maxsize is not positive
+    """
+    FailureCache(maxsize=0)
+
+
+def test_failure_cache_is_thread_safe():
+    """
+    FailureCache should keep counters and size consistent under threads
+    """
+    cache = FailureCache(maxsize=16)
+    fn, calls = build(cache)
+
+    def worker():
+        for i in range(1000):
+            fn(str(i % 32) + 'x')
+    threads = [threading.Thread(target=worker) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    eq_(cache.hits + cache.misses, 8000)
+    ok_(len(cache) <= 16)
+
+
+class Backend(object):
+    # functools.wraps requires __name__ in Python 2
+    __name__ = 'backend'
+
+    def __init__(self):
+        self.values = {'a': 1, 'b': 2}
+        self.calls = 0
+
+    def __call__(self, key):
+        self.calls += 1
+        return self.values[key]
+
+
+def build_stale(cache, **kwargs):
+    backend = Backend()
+    return tolerate('substitute', stale=cache, **kwargs)(backend), backend
+
+
+def test_stale_cache_return_last_result_on_failure():
+    """
+    StaleCache should return the last result of the arguments on failures
+    """
+    cache = StaleCache()
+    fn, backend = build_stale(cache)
+    eq_(fn('a'), 1)
+    backend.values['a'] = 10
+    eq_(fn('a'), 10)
+    backend.values.clear()
+    eq_(fn('a'), 10)
+    eq_(fn('b'), 'substitute')
+    eq_((cache.hits, cache.misses), (1, 1))
+
+
+def test_stale_cache_expire_old_results():
+    """
+    StaleCache should not return results older than max_age
+    """
+    clock = Clock()
+    cache = StaleCache(max_age=10, clock=clock)
+    fn, backend = build_stale(cache)
+    fn('a')
+    backend.values.clear()
+    clock.now = 10
+    eq_(cache.get_age(('a',), {}), 10)
+    eq_(fn('a'), 1)
+    clock.now = 11
+    eq_(fn('a'), 'substitute')
+    eq_(cache.get_ages(), [11])
+
+
+def test_stale_cache_evict_least_recently_stored_results():
+    """
+    StaleCache should evict results in LRU order
+    """
+    cache = StaleCache(maxsize=2)
+    fn, backend = build_stale(cache)
+    backend.values['c'] = 3
+    fn('a')
+    fn('b')
+    fn('a')
+    fn('c')
+    eq_(len(cache), 2)
+    ok_(('a',) in cache)
+    ok_(('b',) not in cache)
+
+
+def test_stale_cache_return_last_result_on_rejection():
+    """
+    StaleCache should return the last result when the breaker is open
+    """
+    cache = StaleCache()
+    fn, backend = build_stale(cache, breaker=CircuitBreaker(threshold=1))
+    fn('a')
+    backend.values.clear()
+    eq_(fn('a'), 1)     # fails and opens the circuit
+    calls = backend.calls
+    eq_(fn('a'), 1)     # rejected
+    eq_(backend.calls, calls)
+    eq_(cache.hits, 2)
+
+
+def test_stale_cache_does_not_return_for_raised_exceptions():
+    """
+    StaleCache should not be used for exceptions which are not ignored
+    """
+    cache = StaleCache()
+    fn, backend = build_stale(cache, exceptions=[ValueError])
+    fn('a')
+    backend.values.clear()
+    assert_raises(KeyError, fn, 'a')
+    eq_((cache.hits, cache.misses), (0, 0))
+
+
+def test_stale_cache_ignore_unhashable_arguments():
+    """
+    StaleCache should not cache calls with unhashable arguments
+    """
+    cache = StaleCache()
+    fn = tolerate('substitute', stale=cache)(lambda x: x[0])
+    eq_(fn([1]), 1)
+    eq_(fn([]), 'substitute')
+    eq_(len(cache), 0)
+
+
+def test_stale_cache_clear():
+    """
+    StaleCache.clear should remove all results and reset counters
+    """
+    cache = StaleCache()
+    fn, backend = build_stale(cache)
+    fn('a')
+    fn('c')
+    cache.clear()
+    eq_(len(cache), 0)
+    eq_((cache.hits, cache.misses), (0, 0))
+
+
+def test_stale_cache_is_thread_safe():
+    """
+    StaleCache should keep counters and size consistent under threads
+    """
+    cache = StaleCache(maxsize=16)
+    values = dict((i, i) for i in range(0, 32, 2))
+    fn = tolerate('substitute', stale=cache)(lambda i: values[i])
+
+    def worker():
+        for i in range(1000):
+            fn(i % 32)
+    threads = [threading.Thread(target=worker) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    eq_(cache.hits + cache.misses, 4000)
+    eq_(len(cache), 16)
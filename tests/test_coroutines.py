@@ -0,0 +1,488 @@
+#!/usr/bin/env nosetests -v
+# coding=utf-8
+"""
+A unit test module of ``tolerance.coroutines``
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import asyncio
+import inspect
+from nose.tools import *
+from tolerance.decorators import tolerate
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+def collect(agen):
+    async def inner():
+        return [x async for x in agen]
+    return run(inner())
+
+def test_tolerate_decorated_coroutine_function_is_coroutine_function():
+    """
+    tolerance decorated coroutine function is a coroutine function
+    """
+    async def test_function():
+        return "foobar"
+    fn = tolerate()(test_function)
+    ok_(inspect.iscoroutinefunction(fn))
+    eq_(run(fn()), "foobar")
+
+def test_tolerate_decorated_coroutine_function_return_substitute_when_fail():
+    """
+    tolerance decorated coroutine function return substitute when fail
+    """
+    async def test_function():
+        raise AttributeError()
+    fn = tolerate(substitute="foobar")(test_function)
+    eq_(run(fn()), "foobar")
+
+def test_tolerate_decorated_coroutine_function_await_substitute():
+    """
+    tolerance decorated coroutine function await substitute when fail
+    """
+    async def test_function(x):
+        raise AttributeError()
+    async def test_substitute(x):
+        return x
+    fn = tolerate(substitute=test_substitute)(test_function)
+    eq_(run(fn("foobar")), "foobar")
+    fn = tolerate(substitute=lambda x: x * 2)(test_function)
+    eq_(run(fn("foobar")), "foobarfoobar")
+
+@raises(AttributeError)
+def test_tolerate_decorated_coroutine_function_raise_if_not_found():
+    """
+    tolerance decorated coroutine function raise if exception is not found
+    """
+    async def test_function():
+        raise AttributeError()
+    fn = tolerate(exceptions=[KeyError])(test_function)
+    run(fn())
+
+@raises(AttributeError)
+def test_tolerate_decorated_coroutine_function_raise_if_switch_fail():
+    """
+    tolerance decorated coroutine function raise if switch fail
+    """
+    async def test_function():
+        raise AttributeError()
+    fn = tolerate()(test_function)
+    run(fn(fail_silently=False))
+
+@raises(asyncio.CancelledError)
+def test_tolerate_decorated_coroutine_function_does_not_ignore_cancel():
+    """
+    tolerance decorated coroutine function does not ignore cancellation
+    """
+    async def test_function():
+        raise asyncio.CancelledError()
+    fn = tolerate()(test_function)
+    run(fn())
+
+def test_tolerate_decorated_coroutine_function_raise_if_disabled():
+    """
+    tolerance decorated coroutine function raise if disabled
+    """
+    async def test_function():
+        raise AttributeError()
+    fn = tolerate()(test_function)
+    tolerate.disabled = True
+    try:
+        assert_raises(AttributeError, run, fn())
+    finally:
+        tolerate.disabled = False
+
+def test_tolerate_decorated_async_generator_function_yield_items():
+    """
+    tolerance decorated async generator function yield items
+    """
+    async def test_function(n):
+        for i in range(n):
+            yield i
+    fn = tolerate()(test_function)
+    ok_(inspect.isasyncgenfunction(fn))
+    eq_(collect(fn(3)), [0, 1, 2])
+
+def test_tolerate_decorated_async_generator_function_yield_substitute():
+    """
+    tolerance decorated async generator function yield substitute and stop
+    """
+    async def test_function(n):
+        for i in range(n):
+            yield i
+        raise AttributeError()
+    async def test_substitute(n):
+        return -n
+    fn = tolerate(substitute=test_substitute)(test_function)
+    eq_(collect(fn(3)), [0, 1, 2, -3])
+    fn = tolerate(exceptions=[KeyError])(test_function)
+    assert_raises(AttributeError, collect, fn(3))
+    fn = tolerate()(test_function)
+    assert_raises(AttributeError, collect, fn(3, fail_silently=False))
+
+def test_tolerate_decorated_async_generator_function_skip_failed_items():
+    """
+    tolerance decorated async generator function skip failed items
+    """
+    class Iterator(object):
+        def __init__(self, items):
+            self.items = list(items)
+        def __aiter__(self):
+            return self
+        async def __anext__(self):
+            if not self.items:
+                raise StopAsyncIteration
+            item = self.items.pop(0)
+            if isinstance(item, type):
+                raise item()
+            return item
+    async def test_function(*items):
+        async for item in Iterator(items):
+            yield item
+    fn = tolerate(iteration='skip')(test_function)
+    eq_(collect(fn(1, KeyError, 2)), [1])
+    fn = tolerate('foo', iteration='substitute')(test_function)
+    eq_(collect(fn(1, KeyError, 2)), [1, 'foo'])
+
+def test_tolerate_decorated_coroutine_function_with_cache():
+    """
+    tolerance decorated coroutine function use the failure cache
+    """
+    from tolerance.caches import FailureCache
+    calls = []
+    async def test_function(x):
+        calls.append(x)
+        return int(x)
+    async def test_substitute(x):
+        return x
+    cache = FailureCache()
+    fn = tolerate(substitute=test_substitute, cache=cache)(test_function)
+    eq_(run(fn('zero')), 'zero')
+    eq_(run(fn('zero')), 'zero')
+    eq_(run(fn('0')), 0)
+    eq_(calls, ['zero', '0'])
+    eq_(cache.hits, 1)
+
+def test_tolerate_decorated_coroutine_function_with_retry():
+    """
+    tolerance decorated coroutine function retry failed calls
+    """
+    from tolerance.retries import Retry
+    delays = []
+    responses = [KeyError, KeyError, 'foobar']
+    async def sleep(delay):
+        delays.append(delay)
+    async def test_function():
+        response = responses.pop(0)
+        if response is KeyError:
+            raise KeyError
+        return response
+    retry = Retry(attempts=3, backoff=1, jitter=0, sleep=sleep)
+    fn = tolerate(substitute='substitute', retry=retry)(test_function)
+    eq_(run(fn()), 'foobar')
+    eq_(delays, [1, 2])
+    responses[:] = [KeyError] * 3
+    eq_(run(fn()), 'substitute')
+    eq_(retry.retries, 4)
+
+def test_tolerate_decorated_coroutine_function_with_timeout():
+    """
+    tolerance decorated coroutine function cancel slow calls
+    """
+    from tolerance.timeouts import Timeout
+    cancelled = []
+    async def test_function(seconds):
+        try:
+            await asyncio.sleep(seconds)
+        except asyncio.CancelledError:
+            cancelled.append(seconds)
+            raise
+        return 'done'
+    timeout = Timeout(0.01)
+    fn = tolerate(substitute='substitute', timeout=timeout)(test_function)
+    eq_(run(fn(0)), 'done')
+    eq_(run(fn(5)), 'substitute')
+    eq_(cancelled, [5])
+    eq_(timeout.timeouts, 1)
+    eq_(timeout.abandoned, 0)
+
+def test_tolerate_decorated_coroutine_function_with_timeout_error():
+    """
+    tolerance decorated coroutine function does not count TimeoutError
+    """
+    from tolerance.timeouts import Timeout
+    async def test_function():
+        raise TimeoutError
+    timeout = Timeout(1)
+    fn = tolerate(exceptions=[KeyError], timeout=timeout)(test_function)
+    assert_raises(TimeoutError, run, fn())
+    eq_(timeout.timeouts, 0)
+
+def test_tolerate_decorated_coroutine_function_with_timeout_cancelled():
+    """
+    tolerance decorated coroutine function cancel the call with the caller
+    """
+    from tolerance.timeouts import Timeout
+    cancelled = []
+    async def test_function():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+    # test the fallback for Python < 3.11 as well
+    original = getattr(asyncio, 'timeout', None)
+    fns = []
+    try:
+        for i in range(2):
+            timeout = Timeout(1)
+            fns.append(tolerate(timeout=timeout)(test_function))
+            if hasattr(asyncio, 'timeout'):
+                del asyncio.timeout
+    finally:
+        if original is not None:
+            asyncio.timeout = original
+    async def main(fn):
+        task = asyncio.ensure_future(fn())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        # the inner task handles the cancellation on the next iteration
+        await asyncio.sleep(0.01)
+    for fn in fns:
+        del cancelled[:]
+        run(main(fn))
+        eq_(cancelled, [True])
+
+def test_tolerate_decorated_coroutine_function_with_hedge():
+    """
+    tolerance decorated coroutine function hedge slow calls
+    """
+    from tolerance.hedges import Hedge
+    latencies = [5, 0]
+    cancelled = []
+    async def test_function():
+        latency = latencies.pop(0)
+        try:
+            await asyncio.sleep(latency)
+        except asyncio.CancelledError:
+            cancelled.append(latency)
+            raise
+        return latency
+    hedge = Hedge(delay=0.01)
+    fn = tolerate(substitute='substitute', hedge=hedge)(test_function)
+    eq_(run(fn()), 0)
+    eq_(cancelled, [5])
+    eq_((hedge.hedges, hedge.wins, hedge.in_flight), (1, 1, 0))
+    async def test_function():
+        raise KeyError
+    fn = tolerate(substitute='substitute', hedge=hedge)(test_function)
+    eq_(run(fn()), 'substitute')
+
+def test_tolerate_decorated_coroutine_function_with_metrics():
+    """
+    tolerance decorated coroutine function record metrics
+    """
+    from tolerance.metrics import Metrics
+    async def test_function(x):
+        if x is None:
+            raise KeyError
+        return x
+    metrics = Metrics(sample=1)
+    fn = tolerate(substitute='substitute', metrics=metrics)(test_function)
+    eq_(run(fn(0)), 0)
+    eq_(run(fn(None)), 'substitute')
+    assert_raises(KeyError, run, fn(None, fail_silently=False))
+    snapshot = metrics.snapshot()
+    eq_(snapshot['calls'], 3)
+    eq_(snapshot['successes'], 1)
+    eq_(snapshot['substitutions'], {'KeyError': 1})
+    eq_(snapshot['bypassed'], 1)
+    eq_(sum(snapshot['latency']), 2)
+
+def test_tolerate_decorated_coroutine_function_with_on_error():
+    """
+    tolerance decorated coroutine function call on_error for failures
+    """
+    errors = []
+    async def test_function():
+        raise KeyError
+    fn = tolerate(substitute='substitute',
+                  on_error=lambda *args: errors.append(args[0]))(test_function)
+    eq_(run(fn()), 'substitute')
+    eq_(errors, [KeyError])
+
+def test_tolerate_decorated_coroutine_function_in_scope():
+    """
+    tolerance decorated coroutine function follow the scope of the task
+    """
+    async def test_function():
+        raise KeyError
+    fn = tolerate(substitute='substitute')(test_function)
+    async def call():
+        try:
+            return await fn()
+        except KeyError:
+            return 'raised'
+    async def main():
+        with tolerate.scope(disabled=True):
+            inner = asyncio.ensure_future(call())
+        outer = asyncio.ensure_future(call())
+        return await inner, await outer
+    eq_(run(main()), ('raised', 'substitute'))
+    strict = tolerate.scope(disabled=True)(call)
+    ok_(inspect.iscoroutinefunction(strict))
+    eq_(run(strict()), 'raised')
+    eq_(run(call()), 'substitute')
+
+def test_tolerate_scope_can_be_entered_from_tasks_concurrently():
+    """
+    tolerance scope can be entered and exited from tasks in any order
+    """
+    fn = tolerate()(int)
+    scope = tolerate.scope(disabled=True)
+    async def enter(delay):
+        with scope:
+            await asyncio.sleep(delay)
+            try:
+                fn('zero')
+            except ValueError:
+                pass
+            else:
+                return 'not in the scope'
+        return fn('zero')
+    async def main():
+        return await asyncio.gather(enter(0.01), enter(0.02))
+    eq_(run(main()), [None, None])
+
+def test_tolerate_decorated_coroutine_function_with_stale_cache():
+    """
+    tolerance decorated coroutine function return the last known good result
+    """
+    from tolerance.caches import StaleCache
+    values = {'a': 1}
+    async def test_function(key):
+        return values[key]
+    cache = StaleCache()
+    fn = tolerate(substitute='substitute', stale=cache)(test_function)
+    eq_(run(fn('a')), 1)
+    values.clear()
+    eq_(run(fn('a')), 1)
+    eq_(run(fn('b')), 'substitute')
+
+def test_tolerate_decorated_coroutine_function_with_bulkhead():
+    """
+    tolerance decorated coroutine function limit tasks with the bulkhead
+    """
+    from tolerance.bulkheads import Bulkhead
+    bulkhead = Bulkhead(max_concurrency=1, max_queue=1)
+    calls = []
+    @tolerate('busy', max_concurrency=bulkhead)
+    async def fn(x):
+        calls.append(x)
+        await asyncio.sleep(0.01)
+        return x
+    async def main():
+        return await asyncio.gather(fn(0), fn(1), fn(2))
+    eq_(run(main()), [0, 1, 'busy'])
+    eq_(calls, [0, 1])
+    eq_(bulkhead.rejected, 1)
+    eq_(bulkhead.in_flight, 0)
+
+def test_tolerate_decorated_coroutine_function_release_bulkhead_slot():
+    """
+    tolerance decorated coroutine function does not leak slots of the
+    bulkhead of tasks cancelled in the queue
+    """
+    from tolerance.bulkheads import Bulkhead
+    bulkhead = Bulkhead(max_concurrency=1, max_queue=2)
+    @tolerate('busy', max_concurrency=bulkhead)
+    async def fn(seconds):
+        await asyncio.sleep(seconds)
+        return seconds
+    async def main():
+        first = asyncio.ensure_future(fn(0.01))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(fn(0))
+        await asyncio.sleep(0)
+        eq_(bulkhead.queued, 1)
+        second.cancel()
+        eq_(await first, 0.01)
+        assert_raises(asyncio.CancelledError, second.result)
+        return await fn(0)
+    eq_(run(main()), 0)
+    eq_(bulkhead.in_flight, 0)
+    eq_(bulkhead.queued, 0)
+
+def test_tolerate_decorated_coroutine_function_with_adaptive_limit():
+    """
+    tolerance decorated coroutine function limit tasks with the adaptive
+    limit
+    """
+    from tolerance.bulkheads import AdaptiveLimit
+    limit = AdaptiveLimit(initial=2, max_limit=2)
+    @tolerate('busy', max_concurrency=limit)
+    async def fn(x):
+        await asyncio.sleep(0.01)
+        return x
+    async def main():
+        return await asyncio.gather(fn(0), fn(1), fn(2))
+    eq_(run(main()), [0, 1, 'busy'])
+    eq_(limit.in_flight, 0)
+
+def test_tolerate_decorated_coroutine_function_with_rate_limit():
+    """
+    tolerance decorated coroutine function limit calls with the token bucket
+    """
+    from tolerance.limiters import TokenBucket
+    bucket = TokenBucket(rate=1, burst=2, clock=lambda: 0)
+    @tolerate('substitute', rate_limit=bucket)
+    async def fn(x):
+        return x
+    async def main():
+        return await asyncio.gather(fn(0), fn(1), fn(2))
+    eq_(run(main()), [0, 1, 'substitute'])
+
+@raises(ValueError)
+def test_tolerate_slotted_raise_value_error_for_coroutine_function():
+    """
+    tolerance slotted raise ValueError for coroutine functions
+    """
+    async def test_function():
+        pass
+    tolerate.slotted()(test_function)
+
+def test_tolerate_all_leave_coroutine_functions():
+    """
+    tolerance all leave coroutine functions as they are
+    """
+    class Service(object):
+        def get_value(self, x):
+            return int(x)
+        async def get_async(self, x):
+            return int(x)
+    original = vars(Service)['get_async']
+    with tolerate.all(Service, 'get_*') as application:
+        eq_(application.names, ['get_value'])
+        ok_(vars(Service)['get_async'] is original)
+        assert_raises(ValueError, run, Service().get_async('zero'))
+
+def test_tolerate_named_policy_coroutine_function():
+    """
+    tolerance decorated coroutine function use named policies
+    """
+    from tolerance.registries import PolicyRegistry
+    registry = PolicyRegistry()
+    registry.register('fetch', substitute='substitute')
+    @tolerate(policy=registry.get('fetch'))
+    async def fetch():
+        raise IOError
+    eq_(run(fetch()), 'substitute')
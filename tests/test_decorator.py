@@ -4,7 +4,9 @@
 A unit test module of ``tolerance.decorators``
 """
 __author__ = 'Alisue <lambdalisue@hashnote.net>'
+import sys
 import inspect
+import traceback
 from nose.tools import *
 from tolerance.decorators import tolerate
 from tolerance.decorators import DEFAULT_TOLERATE_SWITCH
@@ -17,10 +19,15 @@ def test_tolerate_specification():
     args, varargs, keywords, defaults = \
         inspect.getargspec(tolerate)
 
-    eq_(args, ['substitute', 'exceptions', 'switch'])
+    eq_(args, ['substitute', 'exceptions', 'switch', 'match',
+               'iteration', 'resume', 'cache', 'breaker',
+               'retry', 'timeout', 'hedge', 'metrics', 'on_error',
+               'stale', 'max_concurrency', 'rate_limit', 'policy'])
     eq_(varargs, None)
     eq_(keywords, None)
-    eq_(defaults, (None, None, DEFAULT_TOLERATE_SWITCH))
+    eq_(defaults, (None, None, DEFAULT_TOLERATE_SWITCH, 'exact',
+                   None, True, None, None, None, None, None, None, None,
+                   None, None, None, None))
 
 def test_tolerate_return_function_decorator():
     """
@@ -113,3 +120,260 @@ def test_tolerate_decorated_function_raise_if_disabled():
     # disable
     tolerate.disabled = True
     fn()
+
+def test_tolerate_decorated_function_inline_argument_switch():
+    """
+    tolerance decorated function inline argument switch
+    """
+    def test_function(**kwargs):
+        raise AttributeError()
+    fn = tolerate(switch={'keep': True})(test_function)
+    eq_(fn(fail_silently=True), None)
+    assert_raises(AttributeError, fn, fail_silently=False)
+    fn = tolerate(switch={'reverse': True})(test_function)
+    eq_(fn(fail_silently=False), None)
+    assert_raises(AttributeError, fn, fail_silently=True)
+    fn = tolerate(switch={'default': False})(test_function)
+    assert_raises(AttributeError, fn)
+    eq_(fn(fail_silently=True), None)
+
+def test_tolerate_decorated_function_inline_argument_switch_remove_argument():
+    """
+    tolerance decorated function inline argument switch remove argument
+    """
+    def test_function(**kwargs):
+        return kwargs
+    fn = tolerate()(test_function)
+    eq_(fn(fail_silently=False), {})
+    eq_(fn(fail_silently=True, foo='bar'), {'foo': 'bar'})
+    fn = tolerate(switch={'keep': True})(test_function)
+    eq_(fn(fail_silently=False), {'fail_silently': False})
+
+def test_tolerate_decorated_function_keep_traceback_when_reraise():
+    """
+    tolerance decorated function keep traceback when re-raise
+    """
+    def test_function():
+        raise AttributeError()
+    fn = tolerate(exceptions=[KeyError])(test_function)
+    try:
+        fn()
+    except AttributeError:
+        tb = sys.exc_info()[2]
+        names = [x[2] for x in traceback.extract_tb(tb)]
+        eq_(names[-1], 'test_function')
+    else:
+        ok_(False, 'AttributeError is not raised')
+
+@raises(KeyError)
+def test_tolerate_decorated_function_match_exact_exception():
+    """
+    tolerance decorated function match exact exception in default
+    """
+    def test_function():
+        raise KeyError()
+    fn = tolerate(exceptions=[LookupError])(test_function)
+    fn()
+
+def test_tolerate_decorated_function_match_subclass_exception():
+    """
+    tolerance decorated function match subclass exception
+    """
+    def test_function(x):
+        raise x()
+    fn = tolerate('foobar', exceptions=[LookupError],
+                  match='subclass')(test_function)
+    eq_(fn(KeyError), 'foobar')
+    eq_(fn(IndexError), 'foobar')
+    eq_(fn(LookupError), 'foobar')
+    assert_raises(ValueError, fn, ValueError)
+
+def test_tolerate_decorated_function_use_substitute_of_exception():
+    """
+    tolerance decorated function use substitute of exception
+    """
+    def test_function(x):
+        raise x()
+    def test_substitute(x):
+        return x.__name__
+    exceptions = {
+        LookupError: 'lookup',
+        KeyError: test_substitute,
+    }
+    fn = tolerate(exceptions=exceptions, match='subclass')(test_function)
+    eq_(fn(KeyError), 'KeyError')
+    eq_(fn(IndexError), 'lookup')
+    assert_raises(ValueError, fn, ValueError)
+    fn = tolerate(exceptions=exceptions)(test_function)
+    eq_(fn(KeyError), 'KeyError')
+    assert_raises(IndexError, fn, IndexError)
+
+@raises(ValueError)
+def test_tolerate_raise_if_match_is_unknown():
+    """
+    tolerance raise if match is unknown
+    """
+    tolerate(match='unknown')
+
+class ResumableIterator(object):
+    """
+    An iterator which can be resumed after raise (like csv.reader)
+    """
+    def __init__(self, items):
+        self.items = list(items)
+        self.closed = False
+    def __iter__(self):
+        return self
+    def __next__(self):
+        if not self.items:
+            raise StopIteration
+        item = self.items.pop(0)
+        if isinstance(item, type):
+            raise item()
+        return item
+    next = __next__
+    def close(self):
+        self.closed = True
+
+def test_tolerate_decorated_function_does_not_touch_generator():
+    """
+    tolerance decorated function does not touch generator in default
+    """
+    def test_function():
+        yield 1
+        raise AttributeError()
+    fn = tolerate()(test_function)
+    assert_raises(AttributeError, list, fn())
+
+def test_tolerate_decorated_function_skip_failed_items():
+    """
+    tolerance decorated function skip failed items
+    """
+    def test_function(*items):
+        return ResumableIterator(items)
+    fn = tolerate(iteration='skip')(test_function)
+    eq_(list(fn(1, KeyError, 2, KeyError, KeyError, 3)), [1, 2, 3])
+    fn = tolerate(iteration='skip', resume=False)(test_function)
+    eq_(list(fn(1, KeyError, 2)), [1])
+    fn = tolerate(iteration='skip', resume=1)(test_function)
+    eq_(list(fn(1, KeyError, 2, KeyError, KeyError, 3)), [1, 2])
+
+def test_tolerate_decorated_function_substitute_failed_items():
+    """
+    tolerance decorated function substitute failed items
+    """
+    def test_function(*items):
+        return ResumableIterator(items)
+    def test_substitute(*items):
+        return len(items)
+    fn = tolerate(test_substitute, iteration='substitute')(test_function)
+    eq_(list(fn(1, KeyError, 2)), [1, 3, 2])
+    fn = tolerate(0, iteration='substitute', resume=False)(test_function)
+    eq_(list(fn(1, KeyError, 2)), [1, 0])
+
+def test_tolerate_decorated_function_stop_generator_after_failure():
+    """
+    tolerance decorated function stop generator after failure
+    """
+    def test_function():
+        yield 1
+        raise AttributeError()
+    fn = tolerate('foo', iteration='substitute')(test_function)
+    eq_(list(fn()), [1, 'foo'])
+    fn = tolerate('foo', iteration='skip')(test_function)
+    eq_(list(fn()), [1])
+
+def test_tolerate_decorated_function_iteration_respect_exceptions():
+    """
+    tolerance decorated function iteration respect exceptions and switch
+    """
+    def test_function(*items):
+        return ResumableIterator(items)
+    fn = tolerate(exceptions={KeyError: 'foo'},
+                  iteration='substitute')(test_function)
+    eq_(list(fn(1, KeyError, 2)), [1, 'foo', 2])
+    assert_raises(AttributeError, list, fn(1, AttributeError))
+    fn = tolerate(exceptions={KeyError: 'foo'},
+                  iteration='skip')(test_function)
+    eq_(list(fn(1, KeyError, 2)), [1, 2])
+    assert_raises(KeyError, list, fn(1, KeyError, fail_silently=False))
+
+def test_tolerate_decorated_function_iteration_failed_call():
+    """
+    tolerance decorated function iteration treat failed call as failed item
+    """
+    def test_function():
+        raise AttributeError()
+    fn = tolerate('foo', iteration='substitute')(test_function)
+    eq_(list(fn()), ['foo'])
+    fn = tolerate('foo', iteration='skip')(test_function)
+    eq_(list(fn()), [])
+
+def test_tolerate_decorated_function_iteration_close_iterator():
+    """
+    tolerance decorated function iteration close iterator
+    """
+    iterator = ResumableIterator([1, 2, 3])
+    fn = tolerate(iteration='skip')(lambda: iterator)
+    results = fn()
+    eq_(next(results), 1)
+    results.close()
+    ok_(iterator.closed)
+
+@raises(ValueError)
+def test_tolerate_raise_if_iteration_is_unknown():
+    """
+    tolerance raise if iteration is unknown
+    """
+    tolerate(iteration='unknown')
+
+def test_tolerate_signature_switch():
+    """
+    tolerance decorated function use the parameter as the switch
+    """
+    from tolerance.utils import signature_switch_generator
+    switch = signature_switch_generator('fail_silently')
+    def parse(x, fail_silently=True):
+        return int(x)
+    fn = tolerate(switch=switch)(parse)
+    eq_(fn('zero'), None)
+    assert_raises(ValueError, fn, 'zero', False)
+    assert_raises(ValueError, fn, 'zero', fail_silently=False)
+
+def test_tolerate_signature_switch_keyword_only():
+    """
+    tolerance decorated function use the keyword-only parameter as the
+    switch
+    """
+    if sys.version_info < (3,):
+        # keyword-only arguments are not available
+        return
+    from tolerance.utils import signature_switch_generator
+    switch = signature_switch_generator('fail_silently')
+    # the syntax is compiled at runtime to keep this module importable
+    namespace = {}
+    exec('def parse_strictly(x, *, fail_silently=False):\n'
+         '    return int(x)\n', namespace)
+    fn = tolerate(switch=switch)(namespace['parse_strictly'])
+    assert_raises(ValueError, fn, 'zero')
+    eq_(fn('zero', fail_silently=True), None)
+    eq_(fn.__tolerance__.is_tolerant('zero', fail_silently=True), True)
+
+def test_tolerate_signature_switch_with_policies():
+    """
+    tolerance decorated function with policies use the parameter as the
+    switch
+    """
+    from tolerance.utils import signature_switch_generator
+    from tolerance.caches import FailureCache
+    switch = signature_switch_generator('fail_silently')
+    calls = []
+    def parse(x, fail_silently=True):
+        calls.append(x)
+        return int(x)
+    fn = tolerate(switch=switch, cache=FailureCache())(parse)
+    eq_(fn('zero'), None)
+    eq_(fn('zero'), None)
+    eq_(len(calls), 1)
+    assert_raises(ValueError, fn, 'zero', False)
+    eq_(len(calls), 2)
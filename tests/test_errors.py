@@ -0,0 +1,235 @@
+#!/usr/bin/env nosetests -v
+# coding=utf-8
+"""
+A unit test module of ``tolerance.errors``
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import sys
+import weakref
+import threading
+from collections import deque
+from nose import SkipTest
+from nose.tools import *
+from tolerance.decorators import tolerate
+from tolerance.breakers import CircuitBreaker
+from tolerance.errors import ErrorSampler
+from tolerance.errors import capture_failure
+from tolerance.errors import get_fingerprint
+
+
+def parse(x):
+    if x is None:
+        raise KeyError
+    return int(x)
+
+
+def build(sampler, **kwargs):
+    reports = []
+    sampler.report = lambda *args: reports.append(args)
+    return tolerate(on_error=sampler, **kwargs)(parse), reports
+
+
+def test_get_fingerprint_use_innermost_frame():
+    """
+    get_fingerprint should use the location which raised the exception
+    """
+    try:
+        parse(None)
+    except KeyError:
+        exc_type, exc_value, tb = sys.exc_info()
+    fingerprint = get_fingerprint(exc_type, tb)
+    eq_(fingerprint[0], KeyError)
+    eq_(fingerprint[1], parse.__code__.co_filename)
+    eq_(fingerprint[2], parse.__code__.co_firstlineno + 2)
+    eq_(fingerprint[3], 'parse')
+
+
+def test_error_sampler_capture_first_and_sampled_occurrences():
+    """
+    ErrorSampler should capture the first and every n-th occurrence
+    """
+    sampler = ErrorSampler(sample=0.1)
+    fn, reports = build(sampler)
+    for i in range(25):
+        fn(None)
+    eq_([x[1] for x in reports], [1, 11, 21])
+    ok_(reports[0][2].startswith('Traceback'))
+    ok_('KeyError' in reports[0][2])
+    error, = sampler.snapshot()
+    eq_(error['type'], 'KeyError')
+    eq_(error['name'], 'parse')
+    eq_(error['count'], 25)
+
+
+def test_error_sampler_capture_only_first_occurrence_without_sample():
+    """
+    ErrorSampler should capture only the first occurrence with sample=0
+    """
+    sampler = ErrorSampler(sample=0)
+    fn, reports = build(sampler)
+    for i in range(10):
+        fn(None)
+    eq_(len(reports), 1)
+    eq_(sampler.snapshot()[0]['count'], 10)
+
+
+def test_error_sampler_distinguish_fingerprints():
+    """
+    ErrorSampler should count each type and location separately
+    """
+    sampler = ErrorSampler(sample=0)
+    fn, reports = build(sampler)
+    fn(None)
+    fn('zero')
+    fn('zero')
+    eq_(len(reports), 2)
+    eq_([(x['type'], x['count']) for x in sampler.snapshot()],
+        [('KeyError', 1), ('ValueError', 2)])
+
+
+def test_error_sampler_evict_least_recently_used():
+    """
+    ErrorSampler should evict the least recently used fingerprint
+    """
+    sampler = ErrorSampler(sample=0, maxsize=2)
+    fn, reports = build(sampler)
+    fn(None)        # KeyError
+    fn('zero')      # ValueError
+    fn(None)        # KeyError is used recently
+    fn(object())    # TypeError evicts ValueError
+    eq_(len(sampler), 2)
+    eq_([x['type'] for x in sampler.snapshot()], ['KeyError', 'TypeError'])
+    fn('zero')      # captured again
+    eq_(reports[-1][1], 1)
+
+
+def test_on_error_is_not_called_for_rejections_and_raised_exceptions():
+    """
+    tolerate should call on_error only for swallowed exceptions
+    """
+    calls = []
+    fn = tolerate(exceptions=[KeyError], breaker=CircuitBreaker(threshold=1),
+                  on_error=lambda *args: calls.append(args[0]))(parse)
+    assert_raises(ValueError, fn, 'zero')
+    fn(None)
+    fn(None)    # rejected by the breaker
+    assert_raises(KeyError, fn, None, fail_silently=False)
+    eq_(calls, [KeyError])
+
+
+def test_error_sampler_is_shared_between_threads():
+    """
+    ErrorSampler should count occurrences of many threads
+    """
+    sampler = ErrorSampler(sample=0)
+    fn, reports = build(sampler)
+
+    def worker():
+        for i in range(1000):
+            fn(None)
+    threads = [threading.Thread(target=worker) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    eq_(sampler.snapshot()[0]['count'], 8000)
+    eq_(len(reports), 1)
+
+
+class Payload(object):
+    pass
+
+
+def fail_with_payload(x):
+    payload = Payload()
+    buffer = bytearray(65536)
+    raise ValueError('failed %d' % x)
+
+
+def test_capture_failure_does_not_keep_frames():
+    """
+    capture_failure should not keep the frame which raised the exception
+    """
+    refs = []
+
+    def fail():
+        payload = Payload()
+        refs.append(weakref.ref(payload))
+        raise ValueError('failed')
+    try:
+        fail()
+    except ValueError:
+        failure = capture_failure()
+    if hasattr(sys, 'exc_clear'):
+        # Python 2 keeps the last exception until the function returns
+        sys.exc_clear()
+    eq_(refs[0](), None)
+    eq_(failure.type, ValueError)
+    eq_(failure.message, 'failed')
+    eq_(failure.name, 'fail')
+    eq_(failure.fingerprint[::3], (ValueError, 'fail'))
+    ok_(str(failure).startswith('ValueError: failed ('))
+
+
+def test_capture_failure_of_unprintable_exception():
+    """
+    capture_failure should not fail for exceptions which cannot be printed
+    """
+    class Unprintable(Exception):
+        def __str__(self):
+            raise TypeError
+    failure = capture_failure((Unprintable, Unprintable(), None))
+    eq_(failure.message, '<unprintable Unprintable object>')
+    eq_(failure.filename, None)
+
+
+def test_tolerate_reraise_keep_original_traceback():
+    """
+    tolerate should re-raise the exception with the original traceback
+    """
+    fn = tolerate(exceptions=[KeyError])(fail_with_payload)
+    try:
+        fn(0)
+    except ValueError:
+        tb = sys.exc_info()[2]
+    names = []
+    while tb is not None:
+        names.append(tb.tb_frame.f_code.co_name)
+        tb = tb.tb_next
+    eq_(names[-1], 'fail_with_payload')
+    eq_(names.count('fail_with_payload'), 1)
+
+
+def test_swallowed_failures_do_not_grow_memory():
+    """
+    tolerate should not keep frames of a million swallowed failures
+    """
+    try:
+        import tracemalloc
+    except ImportError:
+        raise SkipTest('tracemalloc is not available')
+    failures = deque(maxlen=100)
+
+    def on_error(*exc_info):
+        failures.append(capture_failure(exc_info))
+    fn = tolerate(on_error=on_error)(fail_with_payload)
+    fn(0)
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        for i in range(1000000):
+            fn(i)
+        growth = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    eq_(len(failures), 100)
+    # 100 failures which keep frames would keep more than 6 MB
+    ok_(growth < 1024 * 1024, growth)
+
+
+@raises(ValueError)
+def test_error_sampler_raise_value_error_for_invalid_sample():
+    """
+    ErrorSampler should raise ValueError when sample is not in [0, 1]
+    """
+    ErrorSampler(sample=-1)
@@ -0,0 +1,154 @@
+#!/usr/bin/env nosetests -v
+# coding=utf-8
+"""
+A unit test module of ``tolerance.hedges``
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import time
+import threading
+from nose import SkipTest
+from nose.tools import *
+from tolerance.decorators import tolerate
+from tolerance.hedges import Hedge
+try:
+    # futures package is required in Python 2
+    __import__('concurrent.futures')
+except ImportError:
+    raise SkipTest('concurrent.futures is not available')
+
+
+class Service(object):
+    """
+    A service whose n-th call sleeps the n-th latency and return/raise
+    """
+    def __init__(self, *behaviors):
+        self.behaviors = list(behaviors)
+        self.threads = []
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            latency, response = self.behaviors.pop(0)
+            self.threads.append(threading.current_thread())
+        time.sleep(latency)
+        if isinstance(response, type):
+            raise response
+        return response
+
+
+def test_hedge_is_not_started_for_fast_calls():
+    """
+    Hedge should not start a hedge when the call returns within the delay
+    """
+    hedge = Hedge(delay=1)
+    service = Service((0, 'primary'))
+    fn = tolerate('substitute', hedge=hedge)(service)
+    eq_(fn(), 'primary')
+    eq_(hedge.hedges, 0)
+
+
+def test_hedge_return_result_of_faster_call():
+    """
+    Hedge should return the result of the hedge when the primary is slow
+    """
+    hedge = Hedge(delay=0.01)
+    service = Service((0.5, 'primary'), (0, 'hedge'))
+    fn = tolerate('substitute', hedge=hedge)(service)
+    eq_(fn(), 'hedge')
+    eq_((hedge.hedges, hedge.wins), (1, 1))
+
+
+def test_hedge_wait_for_the_other_when_one_fails():
+    """
+    Hedge should return the result of the other call when one fails
+    """
+    hedge = Hedge(delay=0.01)
+    service = Service((0.05, 'primary'), (0, IOError))
+    fn = tolerate('substitute', hedge=hedge)(service)
+    eq_(fn(), 'primary')
+    eq_(hedge.wins, 0)
+
+
+def test_hedge_use_substitute_when_both_fail():
+    """
+    Hedge should use the substitute when both calls fail
+    """
+    hedge = Hedge(delay=0.01)
+    service = Service((0.05, IOError), (0, IOError))
+    fn = tolerate('substitute', hedge=hedge)(service)
+    eq_(fn(), 'substitute')
+    eq_(hedge.hedges, 1)
+
+
+def test_hedge_raise_exceptions_which_are_not_ignored():
+    """
+    Hedge should raise the exception of the primary when both fail
+    """
+    hedge = Hedge(delay=0.01)
+    service = Service((0.05, KeyError), (0, IOError))
+    fn = tolerate('substitute', exceptions=[IOError], hedge=hedge)(service)
+    assert_raises(KeyError, fn)
+
+
+def test_hedge_cap_hedges_in_flight():
+    """
+    Hedge should not start hedges more than max_in_flight
+    """
+    hedge = Hedge(delay=0.01, max_in_flight=1)
+    ok_(hedge.acquire())
+    service = Service((0.05, 'primary'), (0, 'hedge'))
+    fn = tolerate('substitute', hedge=hedge)(service)
+    eq_(fn(), 'primary')
+    eq_((hedge.hedges, hedge.capped), (1, 1))
+    hedge.release()
+    eq_(hedge.in_flight, 0)
+
+
+def test_hedge_release_hedges_when_finished():
+    """
+    Hedge should count hedges in flight until they finish
+    """
+    hedge = Hedge(delay=0.01, max_workers=2)
+    service = Service((0.05, 'primary'), (0.2, 'hedge'))
+    fn = tolerate('substitute', hedge=hedge)(service)
+    eq_(fn(), 'primary')
+    eq_(hedge.in_flight, 1)
+    hedge.executor.shutdown(wait=True)
+    eq_(hedge.in_flight, 0)
+
+
+def test_hedge_use_percentile_of_latencies():
+    """
+    Hedge should use the percentile of recorded latencies as the delay
+    """
+    hedge = Hedge(percentile=90, window=100, minimum=10)
+    eq_(hedge.get_delay(), None)
+    for latency in range(100):
+        hedge.record(latency)
+    eq_(hedge.get_delay(), 89)
+    for i in range(20):
+        hedge.record(1000)
+    eq_(hedge.get_delay(), 1000)
+
+
+def test_hedge_call_directly_without_delay():
+    """
+    Hedge should call the function in the caller thread until latencies are
+    recorded
+    """
+    hedge = Hedge(percentile=99, minimum=2)
+    service = Service((0, 'primary'), (0, 'primary'), (0, 'primary'))
+    fn = tolerate('substitute', hedge=hedge)(service)
+    fn()
+    fn()
+    fn()
+    eq_(service.threads[:2], [threading.current_thread()] * 2)
+    ok_(service.threads[2] is not threading.current_thread())
+
+
+@raises(ValueError)
+def test_hedge_raise_value_error_without_delay_and_percentile():
+    """
+    Hedge should raise ValueError when delay nor percentile is specified
+    """
+    Hedge()
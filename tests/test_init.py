@@ -0,0 +1,105 @@
+#!/usr/bin/env nosetests -v
+# coding=utf-8
+"""
+A unit test module of ``tolerance``
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import os
+import sys
+import subprocess
+from nose.tools import *
+import tolerance
+
+
+def _imported_modules(statement):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(sys.path)
+    code = '%s; import sys; print(" ".join(sys.modules))' % statement
+    process = subprocess.Popen([sys.executable, '-c', code],
+                               stdout=subprocess.PIPE, env=env)
+    return process.communicate()[0].decode('utf-8').split()
+
+def test_import_does_not_import_heavy_modules():
+    """
+    import tolerance does not import heavy modules
+    """
+    if sys.version_info < (3, 7):
+        return
+    modules = _imported_modules('import tolerance')
+    ok_('tolerance' in modules)
+    ok_('pkg_resources' not in modules)
+    ok_('tolerance.decorators' not in modules)
+
+def test_import_wrappers_does_not_import_heavy_modules():
+    """
+    import tolerance.wrappers does not import heavy modules
+    """
+    if sys.version_info < (3, 7):
+        return
+    modules = _imported_modules('import tolerance.wrappers')
+    ok_('tolerance.wrappers' in modules)
+    ok_('inspect' not in modules)
+    ok_('fnmatch' not in modules)
+
+def _find_python2():
+    # return a command of Python 2 or None if it is not available
+    if sys.version_info < (3,):
+        return sys.executable
+    for command in ('python2.7', 'python2.6', 'python2'):
+        try:
+            process = subprocess.Popen(
+                [command, '-c', 'import sys; sys.exit(sys.version_info[0])'],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError:
+            continue
+        process.communicate()
+        if process.returncode == 2:
+            return command
+    return None
+
+def test_import_in_python2():
+    """
+    tolerance can be imported in Python 2 (if it is available)
+    """
+    command = _find_python2()
+    if command is None:
+        return
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.path.dirname(os.path.dirname(tolerance.__file__))
+    code = ('from tolerance import tolerate, tolerate_all; '
+            'tolerate.slotted()(int); '
+            'import tolerance.wrappers')
+    process = subprocess.Popen([command, '-c', code], env=env,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr = process.communicate()[1].decode('utf-8')
+    eq_(process.returncode, 0, stderr)
+
+def test_shortcuts():
+    """
+    tolerance provides shortcuts
+    """
+    from tolerance.decorators import tolerate
+    from tolerance.utils import argument_switch_generator
+    ok_(tolerance.tolerate is tolerate)
+    ok_(tolerance.argument_switch_generator is argument_switch_generator)
+
+def test_submodules():
+    """
+    tolerance provides submodules
+    """
+    import tolerance.utils
+    ok_(tolerance.utils is sys.modules['tolerance.utils'])
+
+def test_version():
+    """
+    tolerance provides version information
+    """
+    ok_(isinstance(tolerance.__version__, str))
+    ok_(isinstance(tolerance.VERSION, tuple))
+
+@raises(AttributeError)
+def test_unknown_attribute():
+    """
+    tolerance raise AttributeError for unknown attribute
+    """
+    tolerance.unknown_attribute
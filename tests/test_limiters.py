@@ -0,0 +1,144 @@
+#!/usr/bin/env nosetests -v
+# coding=utf-8
+"""
+A unit test module of ``tolerance.limiters``
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import threading
+from nose.tools import *
+from tolerance.decorators import tolerate
+from tolerance.breakers import CircuitBreaker
+from tolerance.caches import StaleCache
+from tolerance.limiters import TokenBucket
+from tolerance.limiters import RateLimited
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def build(bucket, **kwargs):
+    calls = []
+
+    def fn(x=None):
+        calls.append(x)
+        return x
+    return tolerate('substitute', rate_limit=bucket, **kwargs)(fn), calls
+
+
+def test_token_bucket_allow_burst_and_reject_overflow():
+    """
+    TokenBucket should allow burst calls at once and reject the rest
+    """
+    clock = Clock()
+    bucket = TokenBucket(rate=1, burst=3, clock=clock)
+    fn, calls = build(bucket)
+    eq_([fn(i) for i in range(5)], [0, 1, 2, 'substitute', 'substitute'])
+    eq_(calls, [0, 1, 2])
+    eq_(bucket.rejected, 2)
+
+
+def test_token_bucket_refill_lazily():
+    """
+    TokenBucket should refill tokens from the elapsed time
+    """
+    clock = Clock()
+    bucket = TokenBucket(rate=10, burst=1, clock=clock)
+    fn, calls = build(bucket)
+    eq_(fn(0), 0)
+    eq_(fn(1), 'substitute')
+    clock.now = 0.05
+    eq_(fn(2), 'substitute')
+    clock.now = 0.1
+    eq_(fn(3), 3)
+    # tokens never exceed the burst
+    clock.now = 100
+    eq_(bucket.tokens, 1)
+    eq_(fn(4), 4)
+    eq_(fn(5), 'substitute')
+
+
+def test_token_bucket_accept_number():
+    """
+    tolerate should accept a number of calls per second as rate_limit
+    """
+    fn, calls = build(2)
+    eq_([fn(i) for i in range(3)], [0, 1, 'substitute'])
+
+
+def test_token_bucket_use_substitute_of_rate_limited_when_listed():
+    """
+    tolerate should use the substitute of RateLimited listed in exceptions
+    """
+    fn, calls = build(TokenBucket(rate=1, clock=Clock()),
+                      exceptions={RateLimited: 'slow down'})
+    eq_(fn(0), 0)
+    eq_(fn(1), 'slow down')
+    # non-tolerant calls are not limited
+    eq_(fn(2, fail_silently=False), 2)
+
+
+def test_token_bucket_with_stale_cache():
+    """
+    StaleCache should return the last result for rate limited calls
+    """
+    fn, calls = build(TokenBucket(rate=1, clock=Clock()), stale=StaleCache())
+    eq_(fn(0), 0)
+    eq_(fn(0), 0)
+    eq_(fn(1), 'substitute')
+    eq_(calls, [0])
+
+
+def test_token_bucket_release_breaker_probe():
+    """
+    TokenBucket should not keep probes of the circuit breaker
+    """
+    clock = Clock()
+    breaker = CircuitBreaker(threshold=1, cooldown=10, clock=clock)
+    bucket = TokenBucket(rate=1, burst=1, clock=clock)
+
+    @tolerate('substitute', breaker=breaker, rate_limit=bucket)
+    def fn(fail):
+        if fail:
+            raise IOError
+        return 'done'
+    eq_(fn(True), 'substitute')
+    eq_(breaker.state, 'open')
+    clock.now = 10
+    eq_(fn(False), 'done')
+    eq_(breaker.state, 'closed')
+    eq_(fn(False), 'substitute')
+    eq_(bucket.rejected, 1)
+
+
+def test_token_bucket_is_safe_between_threads():
+    """
+    TokenBucket should never allow more calls than the tokens
+    """
+    bucket = TokenBucket(rate=100, burst=100, clock=Clock())
+    fn, calls = build(bucket)
+    results = []
+
+    def worker():
+        for i in range(100):
+            results.append(fn(i))
+    threads = [threading.Thread(target=worker) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    eq_(len(calls), 100)
+    eq_(results.count('substitute'), 700)
+    eq_(bucket.rejected, 700)
+
+
+@raises(ValueError)
+def test_token_bucket_raise_value_error_for_invalid_rate():
+    """
+    TokenBucket should raise ValueError when rate is not positive
+    """
+    TokenBucket(rate=0)
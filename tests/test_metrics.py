@@ -0,0 +1,205 @@
+#!/usr/bin/env nosetests -v
+# coding=utf-8
+"""
+A unit test module of ``tolerance.metrics``
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import threading
+from nose.tools import *
+from tolerance.decorators import tolerate
+from tolerance.breakers import CircuitBreaker
+from tolerance.breakers import CircuitOpen
+from tolerance.metrics import BUCKETS
+from tolerance.metrics import Metrics
+from tolerance.metrics import Registry
+from tolerance.metrics import REGISTRY
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def parse(x):
+    if x is None:
+        raise KeyError
+    return int(x)
+
+
+def test_metrics_count_outcomes():
+    """
+    Metrics should count calls, successes, substitutions, and errors
+    """
+    metrics = Metrics()
+    fn = tolerate(exceptions=[ValueError, KeyError], metrics=metrics)(parse)
+    fn('0')
+    fn('zero')
+    fn('zero')
+    fn(None)
+    assert_raises(TypeError, fn, object())
+    snapshot = metrics.snapshot()
+    eq_(snapshot['calls'], 5)
+    eq_(snapshot['successes'], 1)
+    eq_(snapshot['substitutions'], {'ValueError': 2, 'KeyError': 1})
+    eq_(snapshot['errors'], 1)
+    eq_(snapshot['bypassed'], 0)
+
+
+def test_metrics_count_bypassed_calls():
+    """
+    Metrics should count calls which are not tolerant
+    """
+    metrics = Metrics()
+    fn = tolerate(metrics=metrics)(parse)
+    fn('0', fail_silently=False)
+    tolerate.disabled = True
+    try:
+        fn('0')
+    finally:
+        tolerate.disabled = False
+    snapshot = metrics.snapshot()
+    eq_(snapshot['calls'], 2)
+    eq_(snapshot['bypassed'], 2)
+    eq_(snapshot['successes'], 0)
+
+
+def test_metrics_count_rejections_as_substitutions():
+    """
+    Metrics should count calls rejected by policies as substitutions
+    """
+    metrics = Metrics()
+    fn = tolerate(breaker=CircuitBreaker(threshold=1),
+                  metrics=metrics)(parse)
+    fn('zero')
+    fn('zero')
+    eq_(metrics.snapshot()['substitutions'], {
+        'ValueError': 1,
+        '%s.%s' % (CircuitOpen.__module__, CircuitOpen.__name__): 1,
+    })
+
+
+def test_metrics_record_latency_of_sampled_calls():
+    """
+    Metrics should record latencies of every n-th call in log buckets
+    """
+    clock = Clock()
+    metrics = Metrics(sample=0.5, clock=clock)
+    calls = []
+
+    @tolerate(metrics=metrics)
+    def fn():
+        calls.append(None)
+        clock.now += 0.003 * len(calls)
+    for i in range(4):
+        fn()
+    latency = metrics.snapshot()['latency']
+    eq_(len(latency), len(BUCKETS))
+    eq_(sum(latency), 2)
+    # 0.006 and 0.012 seconds
+    eq_(latency[13], 1)
+    eq_(latency[14], 1)
+    ok_(BUCKETS[12] < 0.006 < BUCKETS[13])
+    ok_(BUCKETS[13] < 0.012 < BUCKETS[14])
+
+
+def test_metrics_do_not_record_latency_without_sample():
+    """
+    Metrics should not time calls when the sample rate is 0
+    """
+    metrics = Metrics(sample=0)
+    fn = tolerate(metrics=metrics)(parse)
+    for i in range(100):
+        fn('0')
+    eq_(sum(metrics.snapshot()['latency']), 0)
+
+
+def test_metrics_aggregate_threads():
+    """
+    Metrics should aggregate counters of threads including finished ones
+    """
+    metrics = Metrics()
+    fn = tolerate(metrics=metrics)(parse)
+
+    def worker():
+        for i in range(1000):
+            fn('0' if i % 2 else 'zero')
+    threads = [threading.Thread(target=worker) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    fn('0')
+    snapshot = metrics.snapshot()
+    eq_(snapshot['calls'], 8001)
+    eq_(snapshot['successes'], 4001)
+    eq_(snapshot['substitutions'], {'ValueError': 4000})
+    eq_(sum(snapshot['latency']), 800)
+    # finished threads are folded
+    eq_(len(metrics._counters), 1)
+
+
+def test_metrics_reset():
+    """
+    Metrics.reset should reset all counters
+    """
+    metrics = Metrics()
+    fn = tolerate(metrics=metrics)(parse)
+    fn('zero')
+    metrics.reset()
+    eq_(metrics.snapshot()['calls'], 0)
+    fn('0')
+    eq_(metrics.snapshot()['successes'], 1)
+
+
+def test_registry_register_metrics_by_name():
+    """
+    Registry should register metrics with the dotted name of the function
+    """
+    registry = Registry(sample=1)
+    fn = tolerate(metrics=registry)(parse)
+    fn('zero')
+    name = '%s.parse' % __name__
+    eq_(list(registry), [name])
+    ok_(name in registry)
+    eq_(registry[name].sample, 1)
+    eq_(registry.snapshot()[name]['substitutions'], {'ValueError': 1})
+    registry.reset()
+    eq_(registry.snapshot()[name]['calls'], 0)
+
+
+def test_registry_share_metrics_of_same_name():
+    """
+    Registry should share metrics between functions of the same name
+    """
+    registry = Registry()
+    fn1 = tolerate(metrics=registry)(parse)
+    fn2 = tolerate(metrics=registry)(parse)
+    fn1('0')
+    fn2('0')
+    eq_(len(registry), 1)
+    eq_(registry.get('%s.parse' % __name__).snapshot()['calls'], 2)
+
+
+def test_tolerate_use_default_registry():
+    """
+    tolerate should register metrics to the default registry with True
+    """
+    def default_registry_function():
+        return 0
+    fn = tolerate(metrics=True)(default_registry_function)
+    fn()
+    name = '%s.%s' % (__name__, getattr(default_registry_function,
+                                        '__qualname__',
+                                        'default_registry_function'))
+    eq_(REGISTRY[name].snapshot()['successes'], 1)
+
+
+@raises(ValueError)
+def test_metrics_raise_value_error_for_invalid_sample():
+    """
+    Metrics should raise ValueError when sample is not in [0, 1]
+    """
+    Metrics(sample=2)
@@ -0,0 +1,174 @@
+#!/usr/bin/env nosetests -v
+# coding=utf-8
+"""
+A unit test module of ``tolerance.policies``
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+from nose.tools import *
+from tolerance.policies import Policy
+from tolerance.policies import Rejection
+from tolerance.policies import Fallback
+from tolerance.policies import build_policy_caller
+from tolerance.policies import build_bypass_hook
+
+
+class Recorder(Policy):
+    def __init__(self, name, log, reject=False):
+        self.name = name
+        self.log = log
+        self.reject = reject
+
+    def before(self, args, kwargs):
+        self.log.append((self.name, 'before'))
+        if self.reject:
+            return Rejection(KeyError)
+        return self.name
+
+    def success(self, token, result):
+        self.log.append((token, 'success', result))
+
+    def failure(self, token, exc_type):
+        self.log.append((token, 'failure', exc_type))
+
+    def release(self, token):
+        self.log.append((token, 'release'))
+
+
+def resolve(cls):
+    if issubclass(cls, LookupError):
+        return lambda x: 'lookup'
+    return None
+
+
+def default(x):
+    return 'default'
+
+
+def test_build_policy_caller_inform_success():
+    """
+    build_policy_caller should inform policies of success
+    """
+    log = []
+    call = build_policy_caller(lambda x: x, [Recorder('a', log),
+                                             Recorder('b', log)],
+                               resolve, default)
+    eq_(call((1,), {}), 1)
+    eq_(log, [('a', 'before'), ('b', 'before'),
+              ('a', 'success', 1), ('b', 'success', 1)])
+
+
+def test_build_policy_caller_inform_failure():
+    """
+    build_policy_caller should inform policies of ignored failures
+    """
+    log = []
+
+    def fn(x):
+        raise KeyError
+    call = build_policy_caller(fn, [Recorder('a', log)], resolve, default)
+    eq_(call((1,), {}), 'lookup')
+    eq_(log, [('a', 'before'), ('a', 'failure', KeyError)])
+
+
+def test_build_policy_caller_release_when_raised():
+    """
+    build_policy_caller should release policies when the exception is raised
+    """
+    log = []
+
+    def fn(x):
+        raise ValueError
+    call = build_policy_caller(fn, [Recorder('a', log), Recorder('b', log)],
+                               resolve, default)
+    assert_raises(ValueError, call, (1,), {})
+    eq_(log, [('a', 'before'), ('b', 'before'),
+              ('b', 'release'), ('a', 'release')])
+
+
+def test_build_policy_caller_release_when_rejected():
+    """
+    build_policy_caller should release preceding policies when rejected
+    """
+    log = []
+    calls = []
+    call = build_policy_caller(calls.append,
+                               [Recorder('a', log),
+                                Recorder('b', log, reject=True),
+                                Recorder('c', log)],
+                               resolve, default)
+    eq_(call((1,), {}), 'lookup')
+    eq_(calls, [])
+    eq_(log, [('a', 'before'), ('b', 'before'), ('a', 'release')])
+
+
+def test_build_policy_caller_use_default_for_unresolved_rejection():
+    """
+    build_policy_caller should use the default substitute for rejections
+    which are not resolved
+    """
+    call = build_policy_caller(lambda x: x, [Recorder('a', [], reject=True)],
+                               lambda cls: None, default)
+    eq_(call((1,), {}), 'default')
+
+
+def test_build_policy_caller_inform_rejection():
+    """
+    build_policy_caller should inform preceding policies of the rejection
+    """
+    log = []
+
+    class Counter(Recorder):
+        def rejected(self, token, exc_type):
+            self.log.append((self.name, 'rejected', exc_type))
+    call = build_policy_caller(lambda x: x,
+                               [Counter('a', log),
+                                Recorder('b', log, reject=True)],
+                               resolve, default)
+    eq_(call((1,), {}), 'lookup')
+    eq_(log, [('a', 'before'), ('b', 'before'), ('a', 'rejected', KeyError)])
+
+
+def test_build_bypass_hook():
+    """
+    build_bypass_hook should call overridden bypassed of the policies
+    """
+    log = []
+
+    class Bypassed(Policy):
+        def __init__(self, name):
+            self.name = name
+
+        def bypassed(self):
+            log.append(self.name)
+    eq_(build_bypass_hook([Policy()]), None)
+    build_bypass_hook([Bypassed('a'), Policy()])()
+    build_bypass_hook([Bypassed('b'), Policy(), Bypassed('c')])()
+    eq_(log, ['a', 'b', 'c'])
+
+
+def test_build_policy_caller_use_fallback():
+    """
+    build_policy_caller should use the first fallback instead of the
+    substitute and inform following policies
+    """
+    log = []
+
+    class Stale(Recorder):
+        def failure(self, token, exc_type):
+            Recorder.failure(self, token, exc_type)
+            return Fallback(self.name)
+        rejected = failure
+
+    def fn(x):
+        raise KeyError
+    call = build_policy_caller(fn, [Stale('a', log), Stale('b', log)],
+                               resolve, default)
+    eq_(call((1,), {}), 'a')
+    eq_(log, [('a', 'before'), ('b', 'before'),
+              ('a', 'failure', KeyError), ('b', 'failure', KeyError)])
+    call = build_policy_caller(fn, [Stale('a', []),
+                                    Recorder('b', [], reject=True)],
+                               resolve, default)
+    eq_(call((1,), {}), 'a')
+    call = build_policy_caller(fn, [Stale('a', [])], resolve, default)
+    eq_(call((1,), {}), 'a')
@@ -0,0 +1,249 @@
+#!/usr/bin/env nosetests -v
+# coding=utf-8
+"""
+A unit test module of ``tolerance.registries``
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import os
+import json
+import shutil
+import socket
+import tempfile
+from nose import SkipTest
+from nose.tools import *
+from tolerance.decorators import tolerate
+from tolerance.breakers import CircuitBreaker
+from tolerance.registries import REGISTRY
+from tolerance.registries import PolicyConfig
+from tolerance.registries import PolicyRegistry
+from tolerance.registries import load_policies
+from tolerance.registries import tomllib
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class Files(object):
+    def __init__(self):
+        self.directory = tempfile.mkdtemp()
+        self.mtime = 1000000000
+
+    def write(self, name, content):
+        filename = os.path.join(self.directory, name)
+        with open(filename, 'w') as fo:
+            if isinstance(content, dict):
+                json.dump(content, fo)
+            else:
+                fo.write(content)
+        # the resolution of mtime may be coarse
+        self.mtime += 10
+        os.utime(filename, (self.mtime, self.mtime))
+        return filename
+
+    def cleanup(self):
+        shutil.rmtree(self.directory)
+
+
+files = Files()
+
+
+def teardown_module():
+    files.cleanup()
+
+
+def lookup(x):
+    return {'a': 1}[x]
+
+
+def test_policy_by_name_use_default_registry():
+    """
+    tolerate should resolve a name of a policy from the default registry
+    """
+    REGISTRY.register('tests.registries.lookup', substitute='missing')
+    fn = tolerate(policy='tests.registries.lookup')(lookup)
+    eq_(fn('a'), 1)
+    eq_(fn('b'), 'missing')
+    assert_raises(KeyError, fn, 'b', fail_silently=False)
+    ok_('tests.registries.lookup' in REGISTRY)
+
+
+def test_policy_of_unknown_name_ignore_all_exceptions():
+    """
+    PolicyRegistry.get should make a policy which ignore all exceptions
+    """
+    registry = PolicyRegistry()
+    fn = tolerate(policy=registry.get('unknown'))(lookup)
+    eq_(fn('b'), None)
+    eq_(list(registry), ['unknown'])
+
+
+@raises(ValueError)
+def test_policy_raise_value_error_with_substitute():
+    """
+    tolerate should raise ValueError when policy is used with substitute
+    """
+    tolerate('substitute', policy='tests.registries.lookup')
+
+
+def test_registry_reload_modified_file():
+    """
+    PolicyRegistry should reload the file on failures after the interval
+    """
+    clock = Clock()
+    filename = files.write('reload.json', {'lookup': {'substitute': 'old'}})
+    registry = PolicyRegistry(filename, interval=5, clock=clock)
+    fn = tolerate(policy=registry.get('lookup'))(lookup)
+    eq_(fn('b'), 'old')
+    config = registry['lookup'].config
+    files.write('reload.json', {'lookup': {'substitute': 'new'}})
+    # the interval has not passed yet
+    clock.now = 4
+    eq_(fn('b'), 'old')
+    clock.now = 5
+    eq_(fn('b'), 'new')
+    ok_(registry['lookup'].config is not config)
+    # not modified
+    config = registry['lookup'].config
+    clock.now = 10
+    eq_(fn('b'), 'new')
+    ok_(registry['lookup'].config is config)
+
+
+def test_registry_override_registered_options():
+    """
+    PolicyRegistry should override registered options by the file
+    """
+    filename = files.write('override.json', {
+        'lookup': {'exceptions': ['ValueError']},
+    })
+    registry = PolicyRegistry(filename, interval=0)
+    registry.register('lookup', substitute='missing',
+                      exceptions=['KeyError'])
+    fn = tolerate(policy=registry.get('lookup'))(lookup)
+    parse = tolerate(policy=registry.get('lookup'))(int)
+    assert_raises(KeyError, fn, 'b')
+    eq_(parse('zero'), 'missing')
+    files.write('override.json', {})
+    eq_(fn('b'), 'missing')
+    assert_raises(ValueError, parse, 'zero')
+
+
+def test_registry_disable_policy():
+    """
+    PolicyRegistry should raise exceptions of disabled policies
+    """
+    filename = files.write('disable.json', {'lookup': {'enabled': False}})
+    registry = PolicyRegistry(filename, interval=0)
+    registry.register('lookup', substitute='missing')
+    fn = tolerate(policy=registry.get('lookup'))(lookup)
+    assert_raises(KeyError, fn, 'b')
+    files.write('disable.json', {'lookup': {'enabled': True}})
+    eq_(fn('b'), 'missing')
+
+
+def test_registry_keep_configuration_of_invalid_file():
+    """
+    PolicyRegistry should keep the configuration when the file is invalid
+    """
+    filename = files.write('invalid.json', {'lookup': {'substitute': 1}})
+    registry = PolicyRegistry(filename, interval=0)
+    registry.register('other')
+    fn = tolerate(policy=registry.get('lookup'))(lookup)
+    eq_(fn('b'), 1)
+    files.write('invalid.json', {'lookup': {'substitute': 2},
+                                 'other': {'match': 'unknown'}})
+    eq_(fn('b'), 1)
+    ok_(isinstance(registry.error, ValueError))
+    assert_raises(ValueError, registry.reload)
+    files.write('invalid.json', '{"lookup": ')
+    eq_(fn('b'), 1)
+    ok_(registry.error is not None)
+    files.write('invalid.json', {'lookup': {'substitute': 3}})
+    eq_(fn('b'), 3)
+    eq_(registry.error, None)
+    os.remove(filename)
+    eq_(fn('b'), 3)
+
+
+def test_registry_load_toml():
+    """
+    PolicyRegistry should load policies from TOML files
+    """
+    if tomllib is None:
+        raise SkipTest('tomllib or tomli is not available')
+    filename = files.write('policies.toml', '\n'.join([
+        '["payments.lookup"]',
+        'substitute = "unavailable"',
+        'exceptions = ["KeyError", "socket.timeout"]',
+        '',
+        '[payments.refund]',
+        'enabled = false',
+    ]))
+    policies = load_policies(filename)
+    eq_(sorted(policies), ['payments.lookup', 'payments.refund'])
+    eq_(policies['payments.lookup']['substitute'], 'unavailable')
+    eq_(policies['payments.refund'], {'enabled': False})
+
+
+def test_registry_load_ini():
+    """
+    PolicyRegistry should load policies from INI files
+    """
+    filename = files.write('policies.ini', '\n'.join([
+        '[payments.lookup]',
+        'substitute = -1',
+        'exceptions = KeyError, socket.timeout',
+        'match = subclass',
+        'enabled = yes',
+        '',
+        '[payments.refund]',
+        'substitute = unavailable',
+    ]))
+    registry = PolicyRegistry()
+    eq_(registry.load(filename), True)
+    config = registry.get('payments.lookup').config
+    eq_(config.substitute, -1)
+    eq_(config.exceptions, [KeyError, socket.timeout])
+    eq_(config.match, 'subclass')
+    eq_(config.enabled, True)
+    eq_(registry.get('payments.refund').config.substitute, 'unavailable')
+    assert_raises(ValueError, load_policies, 'policies.yaml')
+
+
+def test_policy_config_resolve_exceptions():
+    """
+    PolicyConfig should resolve names of exceptions
+    """
+    config = PolicyConfig(exceptions={'KeyError': 'missing',
+                                      'socket.timeout': 'timeout'})
+    eq_(config.resolve(KeyError)(), 'missing')
+    eq_(config.resolve(socket.timeout)(), 'timeout')
+    assert_raises(ValueError, PolicyConfig, exceptions=['NoSuchError'])
+    assert_raises(ValueError, PolicyConfig, exceptions=['os.path'])
+    assert_raises(AttributeError, setattr, config, 'enabled', False)
+
+
+def test_policy_with_other_policies():
+    """
+    Named policies should provide substitutes to policies like breaker
+    """
+    filename = files.write('breaker.json', {'fetch': {'substitute': 'old'}})
+    registry = PolicyRegistry(filename, interval=0)
+    breaker = CircuitBreaker(threshold=1, cooldown=60)
+
+    @tolerate(policy=registry.get('fetch'), breaker=breaker)
+    def fetch():
+        raise IOError
+    eq_(fetch(), 'old')
+    eq_(fetch(), 'old')     # rejected by the breaker
+    files.write('breaker.json', {'fetch': {'substitute': 'new'}})
+    eq_(fetch(), 'new')
+    files.write('breaker.json', {'fetch': {
+        'exceptions': {'tolerance.breakers.CircuitOpen': 'open'},
+    }})
+    eq_(fetch(), 'open')
@@ -0,0 +1,143 @@
+#!/usr/bin/env nosetests -v
+# coding=utf-8
+"""
+A unit test module of ``tolerance.retries``
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+from nose.tools import *
+from tolerance.decorators import tolerate
+from tolerance.retries import Retry
+from tolerance.breakers import CircuitBreaker
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, delay):
+        self.now += delay
+
+
+class Service(object):
+    # functools.wraps requires __name__ in Python 2
+    __name__ = 'service'
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        response = self.responses.pop(0)
+        if isinstance(response, type):
+            raise response
+        return response
+
+
+def test_retry_return_result_of_retried_call():
+    """
+    Retry should return the result when a retry succeeds
+    """
+    delays = []
+    service = Service(IOError, IOError, 'ok')
+    retry = Retry(attempts=3, backoff=0.5, jitter=0, sleep=delays.append)
+    fn = tolerate('substitute', retry=retry)(service)
+    eq_(fn(), 'ok')
+    eq_(service.calls, 3)
+    eq_(delays, [0.5, 1.0])
+    eq_(retry.retries, 2)
+
+
+def test_retry_use_substitute_when_exhausted():
+    """
+    Retry should use the substitute when retries are exhausted
+    """
+    delays = []
+    service = Service(IOError, IOError, IOError, 'ok')
+    retry = Retry(attempts=3, backoff=0.5, jitter=0, sleep=delays.append)
+    fn = tolerate('substitute', retry=retry)(service)
+    eq_(fn(), 'substitute')
+    eq_(service.calls, 3)
+
+
+def test_retry_use_exceptions_filter():
+    """
+    Retry should not retry exceptions which are not ignored
+    """
+    delays = []
+    service = Service(KeyError, 'ok')
+    retry = Retry(sleep=delays.append)
+    fn = tolerate('substitute', exceptions=[IOError], retry=retry)(service)
+    assert_raises(KeyError, fn)
+    eq_(service.calls, 1)
+    eq_(delays, [])
+
+
+def test_retry_cap_delay_by_maximum():
+    """
+    Retry should cap the delay by maximum
+    """
+    retry = Retry(backoff=1, multiplier=10, maximum=50, jitter=0)
+    eq_([retry.compute_delay(n) for n in (1, 2, 3)], [1, 10, 50])
+
+
+def test_retry_randomize_delay_by_jitter():
+    """
+    Retry should subtract a random fraction of jitter from the delay
+    """
+    retry = Retry(backoff=1, jitter=0.5, random=lambda: 1.0)
+    eq_(retry.compute_delay(1), 0.5)
+    retry = Retry(backoff=1, jitter=1.0, random=lambda: 0.25)
+    eq_(retry.compute_delay(1), 0.75)
+
+
+def test_retry_give_up_at_deadline():
+    """
+    Retry should not retry when the delay would exceed the deadline
+    """
+    clock = Clock()
+    service = Service(IOError, IOError, IOError, 'ok')
+    retry = Retry(attempts=4, backoff=1, jitter=0, deadline=2.5,
+                  sleep=clock.sleep, clock=clock)
+    fn = tolerate('substitute', retry=retry)(service)
+    eq_(fn(), 'substitute')
+    # 1 + 2 > 2.5 so the third call is not made
+    eq_(service.calls, 2)
+    eq_(clock.now, 1)
+
+
+def test_retry_is_not_used_when_switch_is_off():
+    """
+    Retry should not be used when the tolerance is turned off
+    """
+    service = Service(IOError, 'ok')
+    retry = Retry(sleep=lambda x: None)
+    fn = tolerate('substitute', retry=retry)(service)
+    assert_raises(IOError, fn, fail_silently=False)
+    eq_(service.calls, 1)
+
+
+def test_retry_count_as_single_failure_of_breaker():
+    """
+    Retry should be applied inside the other policies
+    """
+    breaker = CircuitBreaker(threshold=2)
+    service = Service(*([IOError] * 6))
+    retry = Retry(attempts=3, sleep=lambda x: None)
+    fn = tolerate('substitute', breaker=breaker, retry=retry)(service)
+    eq_(fn(), 'substitute')
+    eq_(breaker.state, 'closed')
+    eq_(fn(), 'substitute')
+    eq_(breaker.state, 'open')
+    eq_(service.calls, 6)
+
+
+@raises(ValueError)
+def test_retry_raise_value_error_for_invalid_attempts():
+    """
+    Retry should raise ValueError when attempts is not positive
+    """
+    Retry(attempts=0)
@@ -0,0 +1,168 @@
+#!/usr/bin/env nosetests -v
+# coding=utf-8
+"""
+A unit test module of ``tolerance.scopes``
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import threading
+from nose.tools import *
+from tolerance.decorators import tolerate
+from tolerance.decorators import get_scope
+from tolerance.scopes import Scope
+
+
+def parse(x):
+    return int(x)
+
+
+def test_tolerate_provide_scope():
+    """
+    tolerate provides scope
+    """
+    eq_(tolerate.scope, Scope)
+
+
+def test_scope_disable_tolerance():
+    """
+    Scope should disable tolerant functions in the with statement
+    """
+    fn = tolerate()(parse)
+    with tolerate.scope(disabled=True) as scope:
+        eq_(get_scope(), scope)
+        assert_raises(ValueError, fn, 'zero')
+    eq_(get_scope(), tolerate)
+    eq_(fn('zero'), None)
+
+
+def test_scope_override_global_switch():
+    """
+    Scope should enable tolerant functions even tolerate.disabled is True
+    """
+    fn = tolerate()(parse)
+    tolerate.disabled = True
+    try:
+        with tolerate.scope(disabled=False):
+            eq_(fn('zero'), None)
+        assert_raises(ValueError, fn, 'zero')
+    finally:
+        tolerate.disabled = False
+
+
+def test_scope_can_be_nested():
+    """
+    Scope should use the innermost scope and restore the outer one
+    """
+    fn = tolerate()(parse)
+    scope = tolerate.scope(disabled=True)
+    with scope:
+        with tolerate.scope(disabled=False):
+            eq_(fn('zero'), None)
+            with scope:
+                assert_raises(ValueError, fn, 'zero')
+            eq_(fn('zero'), None)
+        assert_raises(ValueError, fn, 'zero')
+    eq_(fn('zero'), None)
+
+
+def test_scope_restore_when_raised():
+    """
+    Scope should restore the outer scope when an exception is raised
+    """
+    try:
+        with tolerate.scope(disabled=True):
+            raise KeyError
+    except KeyError:
+        pass
+    eq_(get_scope(), tolerate)
+
+
+def test_scope_as_decorator():
+    """
+    Scope should disable tolerant functions in calls of decorated functions
+    """
+    fn = tolerate()(parse)
+
+    @tolerate.scope(disabled=True)
+    def strict(x):
+        return fn(x)
+    assert_raises(ValueError, strict, 'zero')
+    eq_(strict('0'), 0)
+    eq_(fn('zero'), None)
+    # the configuration of fn is not copied so the scope is not skipped
+    strict = tolerate.scope(disabled=True)(tolerate('inner')(parse))
+    ok_('__tolerance__' not in strict.__dict__)
+    eq_(tolerate.map(strict, ['zero']), [None])
+
+
+def test_scope_does_not_affect_other_threads():
+    """
+    Scope should not affect threads which run concurrently
+    """
+    fn = tolerate()(parse)
+    entered = threading.Event()
+    checked = threading.Event()
+    results = []
+
+    def worker():
+        entered.wait()
+        results.append(fn('zero'))
+        checked.set()
+    thread = threading.Thread(target=worker)
+    thread.start()
+    with tolerate.scope(disabled=True):
+        entered.set()
+        checked.wait()
+        assert_raises(ValueError, fn, 'zero')
+    thread.join()
+    eq_(results, [None])
+
+
+def test_scope_can_be_entered_from_threads_concurrently():
+    """
+    Scope should be entered and exited from threads in any order
+    """
+    fn = tolerate()(parse)
+    scope = tolerate.scope(disabled=True)
+    first_entered = threading.Event()
+    second_entered = threading.Event()
+    first_exited = threading.Event()
+    results = []
+
+    def first():
+        try:
+            with scope:
+                first_entered.set()
+                second_entered.wait()
+            first_exited.set()
+            results.append(('first', get_scope() is tolerate, fn('zero')))
+        except Exception as e:
+            first_exited.set()
+            results.append(('first', e))
+
+    def second():
+        try:
+            first_entered.wait()
+            with scope:
+                second_entered.set()
+                first_exited.wait()
+                assert_raises(ValueError, fn, 'zero')
+            results.append(('second', get_scope() is tolerate, fn('zero')))
+        except Exception as e:
+            results.append(('second', e))
+    threads = [threading.Thread(target=first),
+               threading.Thread(target=second)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    eq_(sorted(results), [('first', True, None), ('second', True, None)])
+
+
+def test_scope_affect_configuration():
+    """
+    Scope should be used by batch APIs as well
+    """
+    fn = tolerate()(parse)
+    with tolerate.scope(disabled=True):
+        assert_raises(ValueError, tolerate.map, fn, ['0', 'zero'])
+    eq_(tolerate.map(fn, ['0', 'zero']), [0, None])
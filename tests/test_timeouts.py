@@ -0,0 +1,141 @@
+#!/usr/bin/env nosetests -v
+# coding=utf-8
+"""
+A unit test module of ``tolerance.timeouts``
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import threading
+from nose import SkipTest
+from nose.tools import *
+from tolerance.decorators import tolerate
+from tolerance.timeouts import Timeout
+from tolerance.timeouts import TimedOut
+try:
+    # futures package is required in Python 2
+    __import__('concurrent.futures')
+except ImportError:
+    raise SkipTest('concurrent.futures is not available')
+
+
+def build_blocking(timeout, **kwargs):
+    event = threading.Event()
+
+    def fn(block=True):
+        if block:
+            event.wait(5)
+        return 'done'
+    return tolerate('substitute', timeout=timeout, **kwargs)(fn), event
+
+
+def test_timeout_return_result_in_time():
+    """
+    Timeout should return the result when the call finishes in time
+    """
+    timeout = Timeout(1)
+    fn, event = build_blocking(timeout)
+    eq_(fn(block=False), 'done')
+    eq_(timeout.timeouts, 0)
+
+
+def test_timeout_return_substitute_when_exceeded():
+    """
+    Timeout should return the substitute and count abandoned threads
+    """
+    timeout = Timeout(0.01, max_workers=2)
+    fn, event = build_blocking(timeout)
+    eq_(fn(), 'substitute')
+    eq_(timeout.timeouts, 1)
+    eq_(timeout.abandoned, 1)
+    event.set()
+    timeout.executor.shutdown(wait=True)
+    eq_(timeout.abandoned, 0)
+
+
+def test_timeout_accept_number():
+    """
+    tolerate should accept a number of seconds as timeout
+    """
+    fn, event = build_blocking(0.01)
+    try:
+        eq_(fn(), 'substitute')
+    finally:
+        event.set()
+
+
+def test_timeout_use_substitute_even_if_exceptions_is_specified():
+    """
+    Timeout should use the substitute unless TimedOut is listed
+    """
+    fn, event = build_blocking(0.01, exceptions=[KeyError])
+    try:
+        eq_(fn(), 'substitute')
+        fn = tolerate(exceptions={TimedOut: 'timed out'}, timeout=0.01)(
+            lambda: event.wait(5))
+        eq_(fn(), 'timed out')
+    finally:
+        event.set()
+
+
+def test_timeout_raise_exceptions_of_the_call():
+    """
+    Timeout should raise exceptions of the call which are not ignored
+    """
+    timeout = Timeout(1)
+
+    @tolerate(exceptions=[KeyError], timeout=timeout)
+    def fn():
+        raise TypeError
+    assert_raises(TypeError, fn)
+    eq_(timeout.timeouts, 0)
+
+
+def test_timeout_distinguish_timeout_error_of_the_call():
+    """
+    Timeout should not count TimeoutError raised in the call
+    """
+    timeout = Timeout(1)
+
+    @tolerate(exceptions=[KeyError], timeout=timeout)
+    def fn():
+        raise TimeoutError
+    assert_raises(TimeoutError, fn)
+    eq_(timeout.timeouts, 0)
+
+
+def test_timeout_cancel_queued_calls():
+    """
+    Timeout should not count calls which have not been started
+    """
+    timeout = Timeout(0.05, max_workers=1)
+    fn, event = build_blocking(timeout)
+    try:
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(fn()))
+                   for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        eq_(results, ['substitute', 'substitute'])
+        eq_(timeout.timeouts, 2)
+        eq_(timeout.abandoned, 1)
+    finally:
+        event.set()
+
+
+def test_timeout_is_not_used_when_switch_is_off():
+    """
+    Timeout should not be used when the tolerance is turned off
+    """
+    timeout = Timeout(0.01)
+    fn = tolerate(timeout=timeout)(threading.current_thread)
+    eq_(fn(fail_silently=False), threading.current_thread())
+    ok_(fn() is not threading.current_thread())
+
+
+@raises(ValueError)
+def test_timeout_raise_value_error_for_invalid_seconds():
+    """
+    Timeout should raise ValueError when seconds is not positive
+    """
+    Timeout(0)
@@ -5,8 +5,15 @@ A unit test module of ``tolerance.utils``
 """
 __author__ = 'Alisue <lambdalisue@hashnote.net>'
 import inspect
+import threading
 from nose.tools import *
 from tolerance.utils import argument_switch_generator
+from tolerance.utils import is_argument_switch
+from tolerance.utils import ExceptionDispatcher
+from tolerance.utils import _ThreadLocalVar
+from tolerance.utils import signature_switch_generator
+from tolerance.utils import is_signature_switch
+from tolerance.utils import bind_switch
 
 
 def test_argument_switch_generator_specification():
@@ -137,3 +144,122 @@ def test_argument_swith_generators_fn_does_not_treat_kwargs():
     status, args, kwargs2 = fn(**kwargs1)
 
     eq_(kwargs1, kwargs2)
+
+def test_argument_swith_generators_fn_expose_parameters():
+    """
+    argument_switch_generator's fn expose specified parameters
+    """
+    fn = argument_switch_generator('quiet', False, True, True)
+    eq_(fn.argument_name, 'quiet')
+    eq_(fn.default, False)
+    eq_(fn.reverse, True)
+    eq_(fn.keep, True)
+    ok_(is_argument_switch(fn))
+    ok_(not is_argument_switch(lambda *args, **kwargs: (True, args, kwargs)))
+
+def test_exception_dispatcher_cache_resolved_substitute():
+    """
+    ExceptionDispatcher cache resolved substitute
+    """
+    dispatch = ExceptionDispatcher([LookupError], 'foo', 'subclass')
+    ok_(KeyError not in dispatch)
+    substitute = dispatch[KeyError]
+    eq_(substitute(), 'foo')
+    ok_(dispatch[KeyError] is substitute)
+    ok_(KeyError in dispatch)
+    ok_(dispatch[ValueError] is None)
+    ok_(ValueError in dispatch)
+
+def test_exception_dispatcher_is_bounded():
+    """
+    ExceptionDispatcher is bounded by maxsize
+    """
+    dispatch = ExceptionDispatcher([Exception], 'foo', 'subclass', maxsize=2)
+    for cls in (KeyError, IndexError, ValueError, TypeError):
+        eq_(dispatch[cls](), 'foo')
+        ok_(len(dispatch) <= 2)
+
+def test_thread_local_var():
+    """
+    _ThreadLocalVar is a fallback of ContextVar scoped to threads
+    """
+    var = _ThreadLocalVar('foo', default='default')
+    eq_(var.get(), 'default')
+    token = var.set('outer')
+    inner = var.set('inner')
+    eq_(var.get(), 'inner')
+    values = []
+    thread = threading.Thread(target=lambda: values.append(var.get()))
+    thread.start()
+    thread.join()
+    eq_(values, ['default'])
+    var.reset(inner)
+    eq_(var.get(), 'outer')
+    var.reset(token)
+    eq_(var.get(), 'default')
+
+def test_signature_switch_generator_positional_argument():
+    """
+    signature_switch_generator find the argument positionally or by keyword
+    """
+    def fn(x, fail_silently=False):
+        pass
+    switch = bind_switch(signature_switch_generator(), fn)
+    ok_(is_signature_switch(switch))
+    eq_(switch.position, 1)
+    # the default value of the parameter is used
+    eq_(switch(0), (False, (0,), {}))
+    eq_(switch(0, True), (True, (0, True), {}))
+    eq_(switch(0, fail_silently=True), (True, (0,), {'fail_silently': True}))
+
+
+def test_signature_switch_generator_reverse():
+    """
+    signature_switch_generator reverse the status of the argument
+    """
+    def fn(x, aggressive=False):
+        pass
+    switch = bind_switch(signature_switch_generator('aggressive',
+                                                    reverse=True), fn)
+    eq_(switch(0)[0], True)
+    eq_(switch(0, True)[0], False)
+    eq_(switch(0, aggressive=False)[0], True)
+
+
+def test_signature_switch_generator_parameter_without_default():
+    """
+    signature_switch_generator use default for the parameter without default
+    """
+    def fn(fail_silently):
+        pass
+    switch = bind_switch(signature_switch_generator(default=False), fn)
+    eq_(switch.default, False)
+    eq_(switch()[0], False)
+    eq_(switch(True)[0], True)
+
+
+def test_signature_switch_generator_method():
+    """
+    signature_switch_generator count self of methods
+    """
+    class Foo(object):
+        def fn(self, x, fail_silently=True):
+            pass
+    generator = signature_switch_generator()
+    eq_(bind_switch(generator, Foo.fn).position, 2)
+    eq_(bind_switch(generator, Foo().fn).position, 1)
+
+
+def test_signature_switch_generator_fallback():
+    """
+    signature_switch_generator work as argument_switch_generator when the
+    function does not have the parameter
+    """
+    def fn(x):
+        pass
+    generator = signature_switch_generator()
+    for target in (fn, int):
+        switch = bind_switch(generator, target)
+        ok_(is_argument_switch(switch))
+        ok_(not is_signature_switch(switch))
+        eq_(switch(0, fail_silently=False), (False, (0,), {}))
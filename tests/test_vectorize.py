@@ -0,0 +1,123 @@
+#!/usr/bin/env nosetests -v
+# coding=utf-8
+"""
+A unit test module of ``tolerance.vectorize``
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+from nose import SkipTest
+from nose.tools import *
+from tolerance.decorators import tolerate
+from tolerance.vectorize import tolerant_vectorize
+try:
+    import numpy as np
+except ImportError:
+    raise SkipTest('numpy is not installed')
+
+
+def to_int(x):
+    return x.astype(int)
+
+def test_tolerate_provide_vectorize():
+    """
+    tolerate provide vectorize
+    """
+    ok_(tolerate.vectorize is tolerant_vectorize)
+
+def test_tolerant_vectorize_call_fn_once_if_success():
+    """
+    tolerant_vectorize call fn once if success
+    """
+    calls = []
+    def fn(x):
+        calls.append(len(x))
+        return x.astype(int)
+    result = tolerant_vectorize(tolerate()(fn), np.array(['0', '1', '2']))
+    eq_(result.tolist(), [0, 1, 2])
+    eq_(result.dtype, np.array([0]).dtype)
+    eq_(calls, [3])
+
+def test_tolerant_vectorize_use_constant_substitute():
+    """
+    tolerant_vectorize use constant substitute for failing elements
+    """
+    array = np.array([str(i) for i in range(1000)])
+    array[[3, 500, 999]] = 'x'
+    result, indexes = tolerant_vectorize(tolerate(-1)(to_int), array,
+                                         failures='index')
+    expected = list(range(1000))
+    for i in (3, 500, 999):
+        expected[i] = -1
+    eq_(result.tolist(), expected)
+    eq_(indexes.tolist(), [3, 500, 999])
+
+def test_tolerant_vectorize_promote_dtype_for_substitute():
+    """
+    tolerant_vectorize promote dtype for substitute
+    """
+    result = tolerant_vectorize(tolerate(float('nan'))(to_int),
+                                ['0', 'x', '2'])
+    eq_(result.dtype, np.dtype(float))
+    eq_(result[0], 0)
+    ok_(np.isnan(result[1]))
+
+def test_tolerant_vectorize_call_substitute_function():
+    """
+    tolerant_vectorize call substitute function with failing elements
+    """
+    fn = tolerate(lambda x: 'bad:%s' % x)(to_int)
+    result, mask = tolerant_vectorize(fn, np.array([['0', 'x'], ['y', '3']]),
+                                      failures='mask')
+    eq_(result.shape, (2, 2))
+    eq_(result.dtype, np.dtype(object))
+    eq_(result.tolist(), [[0, 'bad:x'], ['bad:y', 3]])
+    eq_(mask.tolist(), [[False, True], [True, False]])
+
+def test_tolerant_vectorize_all_elements_fail():
+    """
+    tolerant_vectorize all elements fail
+    """
+    result = tolerant_vectorize(tolerate(-1)(to_int), ['x', 'y'])
+    eq_(result.tolist(), [-1, -1])
+
+@raises(ValueError)
+def test_tolerant_vectorize_raise_if_exception_is_not_found():
+    """
+    tolerant_vectorize raise if exception is not found in exceptions
+    """
+    fn = tolerate(exceptions=[KeyError])(to_int)
+    tolerant_vectorize(fn, ['0', 'x'])
+
+@raises(ValueError)
+def test_tolerant_vectorize_raise_if_switch_fail():
+    """
+    tolerant_vectorize raise if switch fail
+    """
+    fn = tolerate(switch={'default': False})(to_int)
+    tolerant_vectorize(fn, ['0', 'x'])
+
+def test_tolerant_vectorize_use_elementwise():
+    """
+    tolerant_vectorize use elementwise for dense failures
+    """
+    calls = []
+    def elementwise(x):
+        calls.append(x)
+        return int(x)
+    array = np.array([str(i) if i % 3 else 'x' for i in range(3000)])
+    result, indexes = tolerant_vectorize(tolerate(-1)(to_int), array,
+                                         failures='index',
+                                         elementwise=elementwise)
+    eq_(result.tolist(), [i if i % 3 else -1 for i in range(3000)])
+    eq_(indexes.tolist(), list(range(0, 3000, 3)))
+    ok_(calls)
+
+def test_tolerant_vectorize_elementwise_return_none():
+    """
+    tolerant_vectorize keep None returned from elementwise
+    """
+    fn = tolerate('bad')(lambda x: np.array([None if v == 'n' else int(v)
+                                             for v in x]))
+    result = tolerant_vectorize(fn, ['n', 'x', 'n'],
+                                elementwise=lambda v: None if v == 'n'
+                                else int(v))
+    eq_(result.tolist(), [None, 'bad', None])
@@ -0,0 +1,318 @@
+#!/usr/bin/env nosetests -v
+# coding=utf-8
+"""
+A unit test module of ``tolerance.wrappers``
+"""
+__author__ = 'Alisue <lambdalisue@hashnote.net>'
+import re
+import types
+import os.path
+import inspect
+from nose.tools import *
+from tolerance.decorators import tolerate
+from tolerance.wrappers import Settings
+from tolerance.wrappers import TolerantFunction
+from tolerance.wrappers import tolerate_all
+
+
+def parse(x):
+    """Parse x"""
+    return int(x)
+
+
+def test_tolerate_provide_slotted():
+    """
+    tolerate.slotted should return settings which make tolerant functions
+    """
+    fn = tolerate.slotted('substitute')(parse)
+    ok_(isinstance(fn, TolerantFunction))
+    eq_(fn('0'), 0)
+    eq_(fn('zero'), 'substitute')
+
+
+def test_tolerant_function_has_no_dict():
+    """
+    TolerantFunction should not have __dict__
+    """
+    fn = tolerate.slotted()(parse)
+    ok_(not hasattr(fn, '__dict__') or fn.__dict__ is parse.__dict__)
+    assert_raises(AttributeError, setattr, fn, 'foo', 'bar')
+
+
+def test_tolerant_function_expose_function_attributes():
+    """
+    TolerantFunction should read attributes of the function
+    """
+    parse.foo = 'bar'
+    try:
+        fn = tolerate.slotted()(parse)
+        eq_(fn.__name__, 'parse')
+        eq_(fn.__doc__, 'Parse x')
+        eq_(fn.__wrapped__, parse)
+        eq_(fn.foo, 'bar')
+        if hasattr(inspect, 'signature'):
+            # inspect.signature was introduced from Python 3.3
+            eq_(list(inspect.signature(fn).parameters), ['x'])
+        ok_(TolerantFunction.__doc__.strip().startswith('A slotted'))
+    finally:
+        del parse.foo
+
+
+def test_tolerant_function_expose_configuration():
+    """
+    TolerantFunction should expose the configuration as attributes
+    """
+    fn = tolerate.slotted('substitute', exceptions=[ValueError],
+                          match='subclass')(parse)
+    eq_(fn.fn, parse)
+    eq_(fn.substitute, 'substitute')
+    eq_(fn.exceptions, [ValueError])
+    eq_(fn.match, 'subclass')
+    eq_(fn.switch.argument_name, 'fail_silently')
+
+
+def test_tolerant_function_reconfigure():
+    """
+    TolerantFunction should be reconfigured by assigning attributes
+    """
+    settings = tolerate.slotted('substitute')
+    fn = settings(parse)
+    other = settings(parse)
+    fn.substitute = 'foo'
+    eq_(fn('zero'), 'foo')
+    eq_(other('zero'), 'substitute')
+    fn.exceptions = [KeyError]
+    assert_raises(ValueError, fn, 'zero')
+    fn.switch = None
+    eq_(fn.switch, None)
+    fn.exceptions = None
+    eq_(fn('zero'), 'foo')
+
+
+def test_tolerant_function_switch():
+    """
+    TolerantFunction should respect the switch
+    """
+    fn = tolerate.slotted()(parse)
+    eq_(fn('zero'), None)
+    assert_raises(ValueError, fn, 'zero', fail_silently=False)
+    fn = tolerate.slotted(switch={'default': False})(parse)
+    assert_raises(ValueError, fn, 'zero')
+    eq_(fn('zero', fail_silently=True), None)
+    fn = tolerate.slotted(
+        switch=lambda *args, **kwargs: (args[0] != 'strict', args, kwargs)
+    )(parse)
+    eq_(fn('zero'), None)
+    assert_raises(ValueError, fn, 'strict')
+
+
+def test_tolerant_function_signature_switch():
+    """
+    TolerantFunction should bind signature switches to the function
+    """
+    from tolerance.utils import signature_switch_generator
+
+    def parse_switch(x, fail_silently=True):
+        return int(x)
+    settings = tolerate.slotted(switch=signature_switch_generator())
+    fn = settings(parse_switch)
+    ok_(fn.settings is not settings)
+    eq_(fn('zero'), None)
+    assert_raises(ValueError, fn, 'zero', False)
+
+
+@with_setup(teardown=lambda: setattr(tolerate, 'disabled', False))
+def test_tolerant_function_respect_disabled():
+    """
+    TolerantFunction should call the function normally when disabled
+    """
+    fn = tolerate.slotted()(parse)
+    tolerate.disabled = True
+    assert_raises(ValueError, fn, 'zero')
+    tolerate.disabled = False
+    with tolerate.scope(disabled=True):
+        assert_raises(ValueError, fn, 'zero')
+
+
+class Model(object):
+    def __init__(self, base):
+        self.base = base
+
+    @tolerate.slotted(-1)
+    def parse(self, x):
+        return int(x, self.base)
+
+
+def test_tolerant_function_as_method():
+    """
+    TolerantFunction should be bound to instances like functions
+    """
+    model = Model(16)
+    eq_(model.parse('ff'), 255)
+    eq_(model.parse('zz'), -1)
+    ok_(isinstance(Model.__dict__['parse'], TolerantFunction))
+    ok_(Model.parse is Model.__dict__['parse'])
+    eq_(Model.parse(model, 'zz'), -1)
+
+
+def test_tolerant_function_is_used_by_batch_apis():
+    """
+    tolerate.map should use the configuration of TolerantFunction
+    """
+    fn = tolerate.slotted('substitute')(parse)
+    eq_(tolerate.map(fn, ['0', 'zero']), [0, 'substitute'])
+
+
+def test_settings_is_immutable_and_shared():
+    """
+    Settings should be immutable and shared by tolerant functions
+    """
+    settings = Settings(substitute=-1)
+    fns = [settings(parse), settings(int)]
+    ok_(all(fn.settings is settings for fn in fns))
+    assert_raises(AttributeError, setattr, settings, 'substitute', 0)
+    replaced = settings.replace(substitute=0)
+    eq_(replaced.substitute, 0)
+    eq_(settings.substitute, -1)
+
+
+@raises(ValueError)
+def test_settings_raise_value_error_for_unknown_match():
+    """
+    Settings should raise ValueError when match is unknown
+    """
+    Settings(match='unknown')
+
+
+class Service(object):
+    def get_value(self, x):
+        return int(x)
+
+    def get_other(self, x):
+        return int(x)
+
+    def put_value(self, x):
+        return int(x)
+
+    @staticmethod
+    def get_static(x):
+        return int(x)
+
+    @classmethod
+    def get_class(cls, x):
+        return cls, int(x)
+
+    @property
+    def get_property(self):
+        raise KeyError
+
+    @get_property.setter
+    def get_property(self, value):
+        raise KeyError
+
+    def __len__(self):
+        raise KeyError
+
+
+def test_tolerate_all_provided():
+    """
+    tolerate should provide tolerate_all as tolerate.all
+    """
+    import tolerance
+    eq_(tolerate.all.__name__, 'tolerate_all')
+    with tolerate.all(Service, 'put_value') as application:
+        eq_(application.names, ['put_value'])
+    eq_(tolerance.tolerate_all, tolerate_all)
+
+
+def test_tolerate_all_class():
+    """
+    tolerate_all should replace matching functions, static methods, class
+    methods, and properties with one shared settings
+    """
+    originals = dict(vars(Service))
+    settings = Settings(substitute=-1)
+    application = tolerate_all(Service, 'get_*', settings)
+    try:
+        eq_(sorted(application.names), ['get_class', 'get_other',
+                                        'get_property', 'get_static',
+                                        'get_value'])
+        service = Service()
+        eq_(service.get_value('zero'), -1)
+        eq_(service.get_static('zero'), -1)
+        eq_(Service.get_static('zero'), -1)
+        eq_(Service.get_class('0'), (Service, 0))
+        eq_(Service.get_class('zero'), -1)
+        eq_(service.get_property, -1)
+        service.get_property = 'foo'
+        assert_raises(ValueError, service.put_value, 'zero')
+        assert_raises(KeyError, len, service)
+        functions = [vars(Service)['get_value'],
+                     vars(Service)['get_static'].__func__,
+                     vars(Service)['get_property'].fget]
+        ok_(all(x.settings is settings for x in functions))
+        # one place to change them
+        application.reconfigure(settings.replace(substitute=-2))
+        eq_(service.get_value('zero'), -2)
+        eq_(service.get_property, -2)
+    finally:
+        application.undo()
+    for name, value in originals.items():
+        ok_(vars(Service)[name] is value, name)
+    eq_(application.names, [])
+
+
+def test_tolerate_all_name_filters():
+    """
+    tolerate_all should accept globs, regular expressions, and predicates
+    """
+    def names(filter):
+        with tolerate_all(Service, filter) as application:
+            return sorted(application.names)
+    eq_(names(['put_*', 'get_v*']), ['get_value', 'put_value'])
+    eq_(names(re.compile(r'_value$')), ['get_value', 'put_value'])
+    eq_(names(lambda name: name == 'get_other'), ['get_other'])
+    ok_(isinstance(vars(Service)['get_value'], types.FunctionType))
+
+
+def test_tolerate_all_undo_keep_later_replacement():
+    """
+    Application.undo should not restore attributes replaced by others
+    """
+    application = tolerate_all(Service, 'put_value')
+    original = application._entries[0][1]
+
+    def other(self, x):
+        return x
+    Service.put_value = other
+    try:
+        application.undo()
+        ok_(vars(Service)['put_value'] is other)
+    finally:
+        Service.put_value = original
+
+
+SAMPLE = """
+from os.path import join
+
+def parse(x):
+    return int(x)
+
+class Parser(object):
+    pass
+"""
+
+
+def test_tolerate_all_module():
+    """
+    tolerate_all should replace functions defined in the module only
+    """
+    module = types.ModuleType('sample')
+    exec(SAMPLE, vars(module))
+    parser = module.Parser
+    with tolerate_all(module) as application:
+        eq_(application.names, ['parse'])
+        eq_(module.parse('zero'), None)
+        ok_(module.Parser is parser)
+        ok_(module.join is os.path.join)
+    assert_raises(ValueError, module.parse, 'zero')